@@ -0,0 +1,85 @@
+"""Shared helpers for the benchmark scripts."""
+
+import json
+import math
+import os
+import platform
+import resource
+import socket
+import subprocess
+import time
+from typing import Any, Dict, Iterable, Optional
+
+BENCH_TOKEN = "123456789:bench-token-AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA"
+
+
+def percentiles(values: Iterable[float]) -> Dict[str, float]:
+    """Return count, mean and p50/p95/p99/max of the values (nearest-rank)."""
+    data = sorted(values)
+    if not data:
+        return {"count": 0, "mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+
+    def rank(p: float) -> float:
+        return data[min(len(data) - 1, max(0, math.ceil(p / 100 * len(data)) - 1))]
+
+    return {
+        "count": len(data),
+        "mean": sum(data) / len(data),
+        "p50": rank(50),
+        "p95": rank(95),
+        "p99": rank(99),
+        "max": data[-1],
+    }
+
+
+def format_ms(stats: Dict[str, float]) -> str:
+    """Render latency percentiles given in seconds as a one-line millisecond summary."""
+    return " ".join(
+        f"{k}={stats[k] * 1000:.2f}ms" for k in ("mean", "p50", "p95", "p99", "max")
+    ) + f" n={stats['count']}"
+
+
+def free_port(host: str = "127.0.0.1") -> int:
+    """Return a TCP port that is currently free, for servers whose URL must be known up front."""
+    with socket.socket() as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+def memory_mb() -> Dict[str, float]:
+    """Return the current and peak resident set size of this process in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    try:
+        with open("/proc/self/statm", encoding="ascii") as f:
+            current = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except OSError:
+        current = peak
+    return {"rss_mb": round(current, 1), "peak_rss_mb": round(peak, 1)}
+
+
+def git_revision() -> Optional[str]:
+    """Return the current commit hash, if the benchmark runs inside a git checkout."""
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True, timeout=5
+        )
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def write_report(path: str, name: str, results: Any, params: Dict[str, Any]) -> None:
+    """Write benchmark results as JSON with enough context to compare commits."""
+    report = {
+        "benchmark": name,
+        "commit": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "host": platform.node(),
+        "cpus": os.cpu_count(),
+        "params": params,
+        "results": results,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Report written to {path}")
@@ -0,0 +1,130 @@
+"""Local stand-in for the Telegram Bot API.
+
+Serves the methods the bot uses with plausible results, supports long-polled
+`getUpdates` fed from `push_update`, and can inject latency and flood-control
+(429) responses to exercise the sender.
+"""
+
+import asyncio
+import itertools
+import random
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+from bench.common import BENCH_TOKEN
+
+
+class FakeTelegram:
+    """In-process fake Bot API server.
+
+    Args:
+        token: Bot token the routes are registered for.
+        latency: Seconds added to every API call.
+        flood_rate: Probability that a send request is answered with 429.
+        retry_after: `retry_after` value reported with 429 responses.
+    """
+
+    def __init__(
+        self,
+        token: str = BENCH_TOKEN,
+        *,
+        latency: float = 0.0,
+        flood_rate: float = 0.0,
+        retry_after: int = 1,
+    ) -> None:
+        self.token = token
+        self.latency = latency
+        self.flood_rate = flood_rate
+        self.retry_after = retry_after
+        self.calls: Counter = Counter()
+        self.sent: List[Dict[str, Any]] = []
+        self._updates: List[Dict[str, Any]] = []
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._new_update = asyncio.Event()
+        self._runner: Optional[web.AppRunner] = None
+        self.base_url = ""
+
+    def push_update(self, update: Dict[str, Any]) -> int:
+        """Queue an update for getUpdates, assigning its update_id."""
+        update = dict(update)
+        update["update_id"] = next(self._update_ids)
+        self._updates.append(update)
+        self._new_update.set()
+        return update["update_id"]
+
+    def _message(self, chat_id: Any, text: Any, message_id: Optional[int] = None) -> Dict[str, Any]:
+        return {
+            "message_id": message_id or next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": int(chat_id or 0), "type": "private"},
+            "from": {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"},
+            "text": str(text or ""),
+        }
+
+    async def _get_updates(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        offset = int(params.get("offset") or 0)
+        timeout = float(params.get("timeout") or 0)
+        limit = int(params.get("limit") or 100)
+        self._updates = [u for u in self._updates if u["update_id"] >= offset]
+        if not self._updates and timeout > 0:
+            self._new_update.clear()
+            try:
+                await asyncio.wait_for(self._new_update.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self._updates[:limit]
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        self.calls[method] += 1
+        params: Dict[str, Any] = dict(await request.post()) if request.can_read_body else {}
+        params.update(request.query)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if method in ("sendMessage", "editMessageText") and self.flood_rate and random.random() < self.flood_rate:
+            return web.json_response(
+                {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": f"Too Many Requests: retry after {self.retry_after}",
+                    "parameters": {"retry_after": self.retry_after},
+                }
+            )
+
+        result: Any = True
+        if method == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+        elif method == "getUpdates":
+            result = await self._get_updates(params)
+        elif method == "sendMessage":
+            result = self._message(params.get("chat_id"), params.get("text"))
+            self.sent.append({"chat_id": result["chat"]["id"], "text": result["text"], "at": time.monotonic()})
+        elif method == "editMessageText":
+            mid = params.get("message_id")
+            result = self._message(params.get("chat_id"), params.get("text"), int(mid) if mid else None)
+        elif method == "getWebhookInfo":
+            result = {"url": "", "has_custom_certificate": False, "pending_update_count": 0}
+        return web.json_response({"ok": True, "result": result})
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Start serving and return the base URL for `TelegramAPIServer.from_base`."""
+        app = web.Application()
+        app.router.add_route("*", "/bot{token}/{method}", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound = self._runner.addresses[0]
+        self.base_url = f"http://{bound[0]}:{bound[1]}"
+        return self.base_url
+
+    async def stop(self) -> None:
+        self._new_update.set()
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
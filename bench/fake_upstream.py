@@ -0,0 +1,142 @@
+"""Local stand-in for the three interruptions.energy.cn.ua endpoints.
+
+Answers `info_disable`, `number_queue` and `info_schedule_part` with payloads
+shaped like the real API. Latency, the share of failed requests (HTTP 503)
+and how often a queue's schedule changes between polls are configurable.
+Point the bot at it with `UPSTREAM_BASE_URL`.
+"""
+
+import asyncio
+import random
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+STATES = {
+    "1": {"name": "Світло є"},
+    "2": {"name": "Можливе відключення"},
+    "3": {"name": "Відключення"},
+}
+
+
+def queue_for_account(person_accnt: Any, queues: int) -> str:
+    """Map an account number onto one of `queues` bench queue codes."""
+    try:
+        n = int(person_accnt)
+    except (TypeError, ValueError):
+        n = 0
+    return f"bench-{n % max(1, queues) + 1}"
+
+
+def make_schedule(queue: str, version: int) -> List[Dict[str, str]]:
+    """Return 48 half-hour slots with outages placed by queue and version."""
+    rnd = random.Random(f"{queue}:{version}")
+    start = rnd.randrange(0, 40)
+    length = rnd.randrange(2, 9)
+    slots = []
+    for i in range(48):
+        state = "3" if start <= i < start + length else "1"
+        slots.append({
+            "time_from": f"{i // 2:02d}:{30 * (i % 2):02d}",
+            "time_to": f"{(i + 1) // 2 % 24:02d}:{30 * ((i + 1) % 2):02d}",
+            "queue": state,
+        })
+    return slots
+
+
+class FakeUpstream:
+    """In-process fake of the energy provider API.
+
+    Args:
+        latency: Mean seconds added to every request.
+        jitter: Relative spread of the latency (0.2 = ±20%).
+        failure_rate: Probability that a request is answered with HTTP 503.
+        change_rate: Probability that a queue's schedule differs from the previous poll.
+        queues: Number of distinct queues accounts are spread over.
+    """
+
+    def __init__(
+        self,
+        *,
+        latency: float = 0.0,
+        jitter: float = 0.2,
+        failure_rate: float = 0.0,
+        change_rate: float = 0.0,
+        queues: int = 60,
+    ) -> None:
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.change_rate = change_rate
+        self.queues = queues
+        self.calls: Counter = Counter()
+        self.failures = 0
+        self._versions: Dict[str, int] = {}
+        self._runner: Optional[web.AppRunner] = None
+        self.base_url = ""
+
+    async def _delay(self) -> bool:
+        """Sleep the configured latency; return True if this request should fail."""
+        if self.latency:
+            await asyncio.sleep(self.latency * random.uniform(1 - self.jitter, 1 + self.jitter))
+        if self.failure_rate and random.random() < self.failure_rate:
+            self.failures += 1
+            return True
+        return False
+
+    async def _info_disable(self, request: web.Request) -> web.Response:
+        self.calls["info_disable"] += 1
+        if await self._delay():
+            raise web.HTTPServiceUnavailable()
+        body = await request.json()
+        accnt = body.get("person_accnt")
+        rows = []
+        if int(accnt or 0) % 3 == 0:
+            rows.append({
+                "cause": "Аварійне відключення",
+                "acc_begin": "2025-01-01 10:00",
+                "accend_plan": "2025-01-01 14:00",
+            })
+        return web.json_response({"status": "ok", "aData": rows})
+
+    async def _number_queue(self, request: web.Request) -> web.Response:
+        self.calls["number_queue"] += 1
+        if await self._delay():
+            raise web.HTTPServiceUnavailable()
+        body = await request.json()
+        accnt = body.get("search_param")
+        return web.json_response({
+            "status": "ok",
+            "list_grp": [[{"adr_to": f"вул. Бенчмаркова, {accnt}", "queues": queue_for_account(accnt, self.queues)}]],
+        })
+
+    async def _info_schedule_part(self, request: web.Request) -> web.Response:
+        self.calls["info_schedule_part"] += 1
+        if await self._delay():
+            raise web.HTTPServiceUnavailable()
+        body = await request.json()
+        queue = str(body.get("queue"))
+        version = self._versions.get(queue, 0)
+        if self.change_rate and random.random() < self.change_rate:
+            version += 1
+        self._versions[queue] = version
+        return web.json_response({"status": "ok", "aData": make_schedule(queue, version), "aState": STATES})
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Start serving and return the base URL for `UPSTREAM_BASE_URL`."""
+        app = web.Application()
+        app.router.add_post("/api/info_disable", self._info_disable)
+        app.router.add_post("/api/number_queue/", self._number_queue)
+        app.router.add_post("/api/info_schedule_part", self._info_schedule_part)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        bound = self._runner.addresses[0]
+        self.base_url = f"http://{bound[0]}:{bound[1]}"
+        return self.base_url
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,331 @@
+"""Load test of the interactive handlers through the real Dispatcher.
+
+Feeds synthetic Message and CallbackQuery updates for seeded users into the
+bot's own Dispatcher (all four routers, FSM included) at a target rate. Bot
+API calls are answered in-process by a mocked session; provider API calls go
+to `bench/fake_upstream.py`; the database is the local Postgres from `.env`.
+Reports handler latency percentiles and DB round-trips per update type, and
+exits with status 1 when an update needs more round-trips than its budget
+in `QUERY_BUDGET` (the subscription index is running, as in the bot).
+
+Seeds `bench` users and subscriptions and removes them afterwards.
+
+Usage:
+    python -m bench.handlers --users 200 --updates 5000 --rate 300
+"""
+
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from aiogram import Bot, types
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import TelegramMethod
+
+from bench.common import BENCH_TOKEN, free_port, percentiles, format_ms, write_report
+from bench.fake_upstream import FakeUpstream
+
+BENCH_CHAT_BASE = 940_000_000_000
+BENCH_ACCOUNT_BASE = 940_000_000
+
+# Update type -> relative weight in the generated stream
+MIX = {
+    "start": 1,
+    "menu:my_data": 6,
+    "menu:check": 3,
+    "menu:now": 3,
+    "menu:unknown": 1,
+    "add_flow": 2,
+    "add_known": 2,
+    "cb:sub": 6,
+    "cb:toggle": 3,
+    "cb:check": 3,
+    "cb:back_subs": 3,
+    "cb:menu": 1,
+    "cb:del": 1,
+}
+
+# Maximum DB round-trips per update type; reads are served by the subscription index
+QUERY_BUDGET = {
+    "cb:sub": 0,
+    "cb:back_subs": 0,
+    "cb:menu": 0,
+    "cb:toggle": 1,
+    "cb:del": 1,
+    # The quota check, plus storing the fetched payload off the response path
+    "cb:check": 2,
+    # Second message of adding an account already in the directory
+    "add_known:2": 1,
+}
+
+
+class MockedSession(BaseSession):
+    """Bot session answering every API method in-process.
+
+    Args:
+        latency: Seconds added to every API call, to mimic the network.
+    """
+
+    def __init__(self, latency: float = 0.0) -> None:
+        super().__init__()
+        self.latency = latency
+        self.calls: Counter = Counter()
+        self._message_ids = itertools.count(1)
+
+    async def make_request(self, bot: Bot, method: TelegramMethod[Any], timeout: Optional[int] = None) -> Any:
+        self.calls[type(method).__name__] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if method.__returning__ is bool:
+            return True
+        return types.Message(
+            message_id=next(self._message_ids),
+            date=datetime.now(timezone.utc),
+            chat=types.Chat(id=int(getattr(method, "chat_id", 0) or 0), type="private"),
+            text=getattr(method, "text", None),
+        )
+
+    async def stream_content(self, *args: Any, **kwargs: Any):
+        raise NotImplementedError
+        yield b""
+
+    async def close(self) -> None:
+        pass
+
+
+class UpdateFactory:
+    """Build raw updates for the seeded users."""
+
+    def __init__(self, subs: Dict[int, List[int]]) -> None:
+        self.subs = subs
+        self.chats = list(subs)
+        self._ids = itertools.count(1)
+
+    def _user(self, chat_id: int) -> Dict[str, Any]:
+        return {"id": chat_id, "is_bot": False, "first_name": "Bench", "language_code": "uk"}
+
+    def message(self, chat_id: int, text: str) -> Dict[str, Any]:
+        return {
+            "update_id": next(self._ids),
+            "message": {
+                "message_id": next(self._ids),
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "from": self._user(chat_id),
+                "text": text,
+            },
+        }
+
+    def callback(self, chat_id: int, data: str) -> Dict[str, Any]:
+        return {
+            "update_id": next(self._ids),
+            "callback_query": {
+                "id": str(next(self._ids)),
+                "from": self._user(chat_id),
+                "chat_instance": str(chat_id),
+                "data": data,
+                "message": {
+                    "message_id": next(self._ids),
+                    "date": int(time.time()),
+                    "chat": {"id": chat_id, "type": "private"},
+                    "from": {"id": 1, "is_bot": True, "first_name": "Bench"},
+                    "text": "Підписки:",
+                },
+            },
+        }
+
+    def make(self, kind: str, step: int) -> List[Dict[str, Any]]:
+        """Return the updates of one user action (the add flow sends two messages)."""
+        chat_id = random.choice(self.chats)
+        sub_id = random.choice(self.subs[chat_id])
+        if kind == "start":
+            return [self.message(chat_id, "/start")]
+        if kind == "menu:my_data":
+            return [self.message(chat_id, "Мої дані")]
+        if kind == "menu:check":
+            return [self.message(chat_id, "Перевірити зараз")]
+        if kind == "menu:now":
+            return [self.message(chat_id, "Світло зараз є?")]
+        if kind == "menu:unknown":
+            return [self.message(chat_id, "щось інше")]
+        if kind == "add_flow":
+            # A fresh chat per flow, so concurrent actions never share its FSM state
+            new_chat = BENCH_CHAT_BASE + 50_000_000 + step
+            accnt = BENCH_ACCOUNT_BASE + 500_000 + step
+            return [self.message(new_chat, "Додати адресу"), self.message(new_chat, str(accnt))]
+        if kind == "add_known":
+            # A fresh chat adding an account another chat already registered
+            new_chat = BENCH_CHAT_BASE + 60_000_000 + step
+            accnt = BENCH_ACCOUNT_BASE + (chat_id - BENCH_CHAT_BASE) * 10 + 1
+            return [self.message(new_chat, "Додати адресу"), self.message(new_chat, str(accnt))]
+        if kind == "cb:menu":
+            return [self.callback(chat_id, "menu")]
+        if kind == "cb:back_subs":
+            return [self.callback(chat_id, "back_subs")]
+        action = kind.split(":", 1)[1]
+        return [self.callback(chat_id, f"{action}:{sub_id}")]
+
+
+async def _seed(conn, users: int, per_user: int) -> Dict[int, List[int]]:
+    await conn.execute(
+        """
+        INSERT INTO users (chat_id, first_name)
+        SELECT $1 + u, 'Bench' FROM generate_series(1, $2) AS u
+        ON CONFLICT (chat_id) DO NOTHING
+        """,
+        BENCH_CHAT_BASE,
+        users,
+    )
+    rows = await conn.fetch(
+        """
+        INSERT INTO subscriptions (street, chat_id, person_accnt, queue_code)
+        SELECT 'bench', $1 + u, $2 + u * 10 + k, 'bench-' || (k + 1)
+        FROM generate_series(1, $3) AS u, generate_series(1, $4) AS k
+        ON CONFLICT DO NOTHING
+        RETURNING id, chat_id
+        """,
+        BENCH_CHAT_BASE,
+        BENCH_ACCOUNT_BASE,
+        users,
+        per_user,
+    )
+    await conn.execute(
+        """
+        INSERT INTO accounts (person_accnt, street, queue_code)
+        SELECT person_accnt, street, queue_code
+        FROM subscriptions
+        WHERE chat_id > $1 AND chat_id < $1 + 100000000
+        ON CONFLICT (person_accnt) DO NOTHING
+        """,
+        BENCH_CHAT_BASE,
+    )
+    subs: Dict[int, List[int]] = defaultdict(list)
+    for r in rows:
+        subs[r["chat_id"]].append(r["id"])
+    return dict(subs)
+
+
+async def _cleanup(conn) -> None:
+    await conn.execute("DELETE FROM subscriptions WHERE chat_id > $1 AND chat_id < $1 + 100000000", BENCH_CHAT_BASE)
+    await conn.execute("DELETE FROM users WHERE chat_id > $1 AND chat_id < $1 + 100000000", BENCH_CHAT_BASE)
+    await conn.execute(
+        "DELETE FROM accounts WHERE person_accnt > $1 AND person_accnt < $1 + 100000000", BENCH_ACCOUNT_BASE
+    )
+
+
+async def run(args) -> Dict[str, Any]:
+    upstream = FakeUpstream(latency=args.upstream_latency)
+    await upstream.start(port=args.upstream_port)
+
+    # Project modules read the upstream URL from the environment on import
+    from bot import dp
+    from database import init_db, init_pool, close_pool, get_pool, count_queries, subscription_index, run_subscription_index
+    from utils.client import init_http, close_http
+
+    await init_db()
+    await init_pool()
+    await init_http()
+    session = MockedSession(latency=args.telegram_latency)
+    bot = Bot(BENCH_TOKEN, session=session)
+
+    index_task = asyncio.create_task(run_subscription_index())
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    queries: Dict[str, List[int]] = defaultdict(list)
+    errors: Counter = Counter()
+
+    async def feed(kind: str, raw: List[Dict[str, Any]]) -> None:
+        # One user action; the add flow is two messages handled in order
+        for i, data in enumerate(raw):
+            label = kind if len(raw) == 1 else f"{kind}:{i + 1}"
+            update = types.Update.model_validate(data, context={"bot": bot})
+            with count_queries() as tally:
+                started = time.perf_counter()
+                try:
+                    await dp.feed_update(bot, update)
+                except Exception as ex:
+                    errors[f"{label}:{type(ex).__name__}"] += 1
+                latencies[label].append(time.perf_counter() - started)
+                await asyncio.sleep(0)  # flush asyncpg query loggers
+            queries[label].append(tally[0])
+
+    try:
+        async with get_pool().acquire() as conn:
+            await _cleanup(conn)
+            subs = await _seed(conn, args.users, args.subs_per_user)
+        while not subscription_index.ready:
+            await asyncio.sleep(0.05)
+        factory = UpdateFactory(subs)
+        kinds = random.choices(list(MIX), weights=list(MIX.values()), k=args.updates)
+
+        tasks = []
+        started = time.perf_counter()
+        for step, kind in enumerate(kinds):
+            delay = started + step / args.rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(feed(kind, factory.make(kind, step))))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+    finally:
+        index_task.cancel()
+        async with get_pool().acquire() as conn:
+            await _cleanup(conn)
+        await close_http()
+        await close_pool()
+        await upstream.stop()
+
+    results: Dict[str, Any] = {"elapsed_sec": round(elapsed, 3), "updates_per_sec": round(len(kinds) / elapsed, 1)}
+    per_type = {}
+    for label in sorted(latencies):
+        counts = queries[label]
+        per_type[label] = {
+            "latency": percentiles(latencies[label]),
+            "db_queries_mean": round(sum(counts) / len(counts), 2),
+            "db_queries_max": max(counts),
+        }
+        print(f"{label:<16} queries={per_type[label]['db_queries_mean']:<6} {format_ms(per_type[label]['latency'])}")
+    results["types"] = per_type
+    results["budget_violations"] = {
+        label: per_type[label]["db_queries_max"]
+        for label, budget in QUERY_BUDGET.items()
+        if label in per_type and per_type[label]["db_queries_max"] > budget
+    }
+    for label, used in results["budget_violations"].items():
+        print(f"OVER BUDGET {label}: {used} queries (budget {QUERY_BUDGET[label]})")
+    results["bot_api_calls"] = dict(session.calls)
+    results["errors"] = dict(errors)
+    print(f"{len(kinds)} actions in {elapsed:.1f}s ({results['updates_per_sec']}/s), errors: {dict(errors) or 'none'}")
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--subs-per-user", type=int, default=3)
+    parser.add_argument("--updates", type=int, default=5000, help="user actions to generate")
+    parser.add_argument("--rate", type=float, default=300.0, help="user actions per second")
+    parser.add_argument("--upstream-latency", type=float, default=0.05)
+    parser.add_argument("--telegram-latency", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="", help="optional JSON report path")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    args.upstream_port = free_port()
+    os.environ["UPSTREAM_BASE_URL"] = f"http://127.0.0.1:{args.upstream_port}"
+    results = asyncio.run(run(args))
+    if args.output:
+        write_report(args.output, "handlers", results, vars(args))
+    if results["budget_violations"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
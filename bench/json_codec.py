@@ -0,0 +1,74 @@
+"""Micro-benchmark of JSON handling for realistic schedule payloads.
+
+Compares the former path (stdlib `json.dumps` to text on write, text returned
+from Postgres and `json.loads` again on read) with the orjson codec that now
+backs the asyncpg pool and upstream response decoding. No database needed.
+
+Usage:
+    python -m bench.json_codec --rounds 20000
+"""
+
+import argparse
+import json
+import timeit
+
+import orjson
+
+
+def sample_schedule(queue: str = "3.1") -> dict:
+    """Build a schedule payload shaped like info_schedule_part responses."""
+    rows = []
+    for slot in range(48):
+        hh, mm = divmod(slot * 30, 60)
+        end_hh, end_mm = divmod(slot * 30 + 30, 60)
+        rows.append(
+            {
+                "time_from": f"{hh:02d}:{mm:02d}",
+                "time_to": f"{end_hh:02d}:{end_mm:02d}",
+                "queue": str(1 + (slot // 6) % 3),
+                "queue_code": queue,
+                "curr_dt": "2026-01-15",
+                "comment": "Графік погодинних відключень",
+            }
+        )
+    return {
+        "status": "ok",
+        "aData": rows,
+        "aState": {
+            "1": {"name": "Електроенергія є", "color": "#00ff00"},
+            "2": {"name": "Можливе відключення", "color": "#ffff00"},
+            "3": {"name": "Відключення", "color": "#ff0000"},
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=20_000)
+    args = parser.parse_args()
+
+    payload = sample_schedule()
+    text = json.dumps(payload, ensure_ascii=False)
+    raw = orjson.dumps(payload)
+    print(f"payload: {len(raw)} bytes, {len(payload['aData'])} intervals, {args.rounds} rounds")
+
+    cases = {
+        "encode  json.dumps": lambda: json.dumps(payload, ensure_ascii=False),
+        "encode  orjson.dumps": lambda: orjson.dumps(payload).decode("utf-8"),
+        "decode  json.loads": lambda: json.loads(text),
+        "decode  orjson.loads": lambda: orjson.loads(raw),
+        "round-trip json": lambda: json.loads(json.dumps(payload, ensure_ascii=False)),
+        "round-trip orjson": lambda: orjson.loads(orjson.dumps(payload)),
+    }
+    results = {}
+    for name, fn in cases.items():
+        best = min(timeit.repeat(fn, number=args.rounds, repeat=3))
+        results[name] = best / args.rounds * 1e6
+        print(f"{name:<24} {results[name]:8.2f} us/op")
+
+    speedup = results["round-trip json"] / results["round-trip orjson"]
+    print(f"round-trip speedup: {speedup:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""End-to-end poll and delivery benchmark at several scales, fully offline.
+
+Starts the fake provider API and the fake Telegram Bot API, seeds a local
+Postgres with N queues and M subscriptions, then for every scale:
+
+1. runs poll ticks until every queue has been polled once (cold round, every
+   schedule is new and notifies all subscribers);
+2. makes every queue due again and repeats with the configured change rate
+   (warm round);
+3. drains the outbox through the real sender workers.
+
+Reports tick wall time, DB queries per tick, notifications enqueued,
+messages/s delivered and process memory. Seeds `bench-*` queues and `bench`
+subscriptions and removes them afterwards; run it against a development
+database without a bot polling at the same time.
+
+Usage:
+    python -m bench.poll_cycle --scales 20x1000,60x10000 --latency 0.05 --output poll.json
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from typing import Any, Dict, List, Tuple
+
+from bench.common import BENCH_TOKEN, free_port, memory_mb, percentiles, format_ms, write_report
+from bench.fake_telegram import FakeTelegram
+from bench.fake_upstream import FakeUpstream
+
+BENCH_CHAT_BASE = 930_000_000_000
+
+
+def parse_scales(value: str) -> List[Tuple[int, int]]:
+    """Parse "20x1000,60x10000" into [(queues, subscriptions), ...]."""
+    scales = []
+    for part in value.split(","):
+        queues, subs = part.lower().split("x")
+        scales.append((int(queues), int(subs)))
+    return scales
+
+
+async def _seed(conn, queues: int, subs: int) -> None:
+    await conn.execute(
+        """
+        INSERT INTO subscriptions (street, chat_id, person_accnt, queue_code)
+        SELECT 'bench', $1 + g, g, 'bench-' || (g % $2 + 1)
+        FROM generate_series(1, $3) AS g
+        ON CONFLICT DO NOTHING
+        """,
+        BENCH_CHAT_BASE,
+        queues,
+        subs,
+    )
+
+
+async def _cleanup(conn) -> None:
+    await conn.execute(
+        """
+        DELETE FROM outbox
+        WHERE message_id IN (SELECT id FROM outbox_messages WHERE queue_code LIKE 'bench-%')
+        """
+    )
+    await conn.execute("DELETE FROM outbox_messages WHERE queue_code LIKE 'bench-%'")
+    await conn.execute("DELETE FROM outage_reminders WHERE queue_code LIKE 'bench-%'")
+    await conn.execute("DELETE FROM queue_schedule WHERE queue_code LIKE 'bench-%'")
+    await conn.execute("DELETE FROM poll_queue WHERE queue_code LIKE 'bench-%'")
+    await conn.execute("DELETE FROM subscriptions WHERE street = 'bench' AND chat_id > $1", BENCH_CHAT_BASE)
+
+
+async def _poll_round(scheduler, limit: int) -> Dict[str, Any]:
+    from database import pool_stats
+    from utils.updates import poll_tick
+
+    ticks: List[float] = []
+    queries: List[int] = []
+    polled = 0
+    started = time.perf_counter()
+    while True:
+        before = pool_stats().queries
+        tick_started = time.perf_counter()
+        claimed = await poll_tick(scheduler, scheduler.now(), owner="bench", limit=limit)
+        await asyncio.sleep(0)  # let asyncpg's query loggers run
+        if not claimed:
+            break
+        ticks.append(time.perf_counter() - tick_started)
+        queries.append(pool_stats().queries - before)
+        polled += claimed
+    return {
+        "queues_polled": polled,
+        "ticks": len(ticks),
+        "round_sec": round(time.perf_counter() - started, 3),
+        "tick": percentiles(ticks),
+        "queries_per_tick": round(sum(queries) / len(queries), 2) if queries else 0,
+    }
+
+
+async def _drain_outbox(bot, fake: FakeTelegram, args) -> Dict[str, Any]:
+    from database import outbox_depth
+    from utils.broadcast import Broadcaster
+    from utils.outbox import outbox_loop
+
+    pending = await outbox_depth()
+    sent_before = len(fake.sent)
+    broadcaster = Broadcaster(bot, rate=args.send_rate, chat_rate=max(1.0, args.send_rate))
+    started = time.perf_counter()
+    task = asyncio.create_task(outbox_loop(bot, broadcaster))
+    try:
+        while await outbox_depth() > 0:
+            await asyncio.sleep(0.2)
+    finally:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    elapsed = time.perf_counter() - started
+    sent = len(fake.sent) - sent_before
+    return {
+        "enqueued": pending,
+        "sent": sent,
+        "drain_sec": round(elapsed, 3),
+        "messages_per_sec": round(sent / elapsed, 1) if elapsed > 0 else 0.0,
+    }
+
+
+async def run_scale(queues: int, subs: int, bot, fake: FakeTelegram, upstream: FakeUpstream, args) -> Dict[str, Any]:
+    from zoneinfo import ZoneInfo
+
+    from database import get_pool
+    from utils.scheduler import PollScheduler
+
+    async with get_pool().acquire() as conn:
+        await _cleanup(conn)
+        await _seed(conn, queues, subs)
+
+    scheduler = PollScheduler(ZoneInfo("Europe/Kyiv"), jitter=0.0)
+    upstream.change_rate = 0.0
+    cold = await _poll_round(scheduler, args.claim_limit)
+    cold_delivery = await _drain_outbox(bot, fake, args)
+
+    async with get_pool().acquire() as conn:
+        await conn.execute("UPDATE poll_queue SET next_due_at = NOW() WHERE queue_code LIKE 'bench-%'")
+    upstream.change_rate = args.change_rate
+    warm = await _poll_round(scheduler, args.claim_limit)
+    warm_delivery = await _drain_outbox(bot, fake, args)
+
+    async with get_pool().acquire() as conn:
+        await _cleanup(conn)
+
+    return {
+        "queues": queues,
+        "subscriptions": subs,
+        "cold": {**cold, "delivery": cold_delivery},
+        "warm": {**warm, "delivery": warm_delivery},
+        "upstream_calls": dict(upstream.calls),
+        "memory": memory_mb(),
+    }
+
+
+async def run(args) -> List[Dict[str, Any]]:
+    upstream = FakeUpstream(latency=args.latency, failure_rate=args.failure_rate)
+    await upstream.start(port=args.upstream_port)
+    fake = FakeTelegram(latency=args.telegram_latency)
+    base = await fake.start()
+
+    # Project modules read the upstream URL from the environment on import
+    from aiogram import Bot
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+
+    from database import init_db, init_pool, close_pool
+    from utils.client import init_http, close_http
+
+    await init_db()
+    await init_pool()
+    await init_http()
+    bot = Bot(BENCH_TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(base)))
+    results = []
+    try:
+        for queues, subs in parse_scales(args.scales):
+            upstream.queues = queues
+            upstream.calls.clear()
+            res = await run_scale(queues, subs, bot, fake, upstream, args)
+            results.append(res)
+            for phase in ("cold", "warm"):
+                r = res[phase]
+                print(
+                    f"{queues:>5}q {subs:>7}s {phase:<4} ticks={r['ticks']:<4} "
+                    f"queries/tick={r['queries_per_tick']:<6} enqueued={r['delivery']['enqueued']:<7} "
+                    f"msg/s={r['delivery']['messages_per_sec']:<7} tick {format_ms(r['tick'])}"
+                )
+            print(f"{'':>14} memory rss={res['memory']['rss_mb']}MiB peak={res['memory']['peak_rss_mb']}MiB")
+    finally:
+        await bot.session.close()
+        await close_http()
+        await close_pool()
+        await fake.stop()
+        await upstream.stop()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", default="20x1000,60x10000", help="comma-separated QUEUESxSUBSCRIPTIONS")
+    parser.add_argument("--latency", type=float, default=0.05, help="fake provider API latency in seconds")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="share of provider requests answered with 503")
+    parser.add_argument("--change-rate", type=float, default=0.2, help="share of schedules changed in the warm round")
+    parser.add_argument("--telegram-latency", type=float, default=0.0)
+    parser.add_argument("--send-rate", type=float, default=1000.0, help="broadcaster messages per second")
+    parser.add_argument("--claim-limit", type=int, default=16)
+    parser.add_argument("--output", default="", help="optional JSON report path")
+    args = parser.parse_args()
+
+    args.upstream_port = free_port()
+    os.environ["UPSTREAM_BASE_URL"] = f"http://127.0.0.1:{args.upstream_port}"
+    results = asyncio.run(run(args))
+    if args.output:
+        write_report(args.output, "poll_cycle", results, vars(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Concurrent stress test of the per-account hourly limit.
+
+Fires many simultaneous manual checks for one subscription and counts how
+many were allowed to reach the upstream API. The former read-decide-write
+sequence (two round-trips) is run side by side with the atomic
+`consume_fetch_quota` statement (one round-trip).
+
+Seeds one `bench` subscription and removes it afterwards.
+
+Usage:
+    python -m bench.rate_limit --concurrency 50 --limit 10
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+from bench.common import write_report
+
+BENCH_CHAT_ID = 920_000_000_001
+BENCH_ACCOUNT = 920_000_001
+
+
+async def _reset(conn) -> int:
+    await conn.execute("DELETE FROM subscriptions WHERE chat_id = $1", BENCH_CHAT_ID)
+    return await conn.fetchval(
+        """
+        INSERT INTO subscriptions (street, chat_id, person_accnt, queue_code, hour_count, hour_reset_at)
+        VALUES ('bench', $1, $2, 'bench', 0, NOW() + INTERVAL '1 hour')
+        RETURNING id
+        """,
+        BENCH_CHAT_ID,
+        BENCH_ACCOUNT,
+    )
+
+
+async def legacy_check(pool, limit: int) -> bool:
+    """The former read-decide-write flow of try_fetch_with_limits."""
+    async with pool.acquire() as conn:
+        sub = await conn.fetchrow(
+            "SELECT * FROM subscriptions WHERE chat_id = $1 AND person_accnt = $2",
+            BENCH_CHAT_ID,
+            BENCH_ACCOUNT,
+        )
+    now = datetime.now(timezone.utc)
+    count, reset_at = sub["hour_count"], sub["hour_reset_at"]
+    if reset_at is None or now >= reset_at:
+        count, reset_at = 0, now + timedelta(hours=1)
+    if count >= limit:
+        return False
+    await asyncio.sleep(0.005)  # the upstream call happens between read and write
+    async with pool.acquire() as conn:
+        await conn.execute(
+            "UPDATE subscriptions SET hour_count = $1, hour_reset_at = $2 WHERE id = $3",
+            count + 1,
+            reset_at,
+            sub["id"],
+        )
+    return True
+
+
+async def atomic_check(limit: int) -> bool:
+    from database import consume_fetch_quota
+
+    quota = await consume_fetch_quota(BENCH_CHAT_ID, BENCH_ACCOUNT, limit, 0)
+    return bool(quota and quota["allowed"])
+
+
+async def run(concurrency: int, limit: int, output: str) -> None:
+    from database import init_db, init_pool, close_pool, get_pool
+
+    await init_db()
+    await init_pool()
+    results = {}
+    try:
+        pool = get_pool()
+        for name, check, round_trips in (
+            ("read-decide-write", lambda: legacy_check(pool, limit), 2),
+            ("atomic", lambda: atomic_check(limit), 1),
+        ):
+            async with pool.acquire() as conn:
+                await _reset(conn)
+            started = time.perf_counter()
+            allowed = sum(await asyncio.gather(*(check() for _ in range(concurrency))))
+            elapsed = time.perf_counter() - started
+            results[name] = {
+                "allowed": allowed,
+                "limit": limit,
+                "overrun": max(0, allowed - limit),
+                "round_trips_per_check": round_trips,
+                "elapsed_ms": elapsed * 1000,
+            }
+            print(f"{name:<18} allowed={allowed}/{limit} round-trips/check={round_trips} {elapsed * 1000:.1f}ms")
+        async with pool.acquire() as conn:
+            await conn.execute("DELETE FROM subscriptions WHERE chat_id = $1", BENCH_CHAT_ID)
+    finally:
+        await close_pool()
+    if output:
+        write_report(output, "rate_limit", results, {"concurrency": concurrency, "limit": limit})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--output", default="")
+    args = parser.parse_args()
+    asyncio.run(run(args.concurrency, args.limit, args.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""Multi-process check of queue leasing between bot replicas.
+
+Starts N worker processes that claim queues from `poll_queue` exactly like
+`poll_loop` does, with a simulated fetch instead of the upstream call. One
+worker is killed while holding leases to measure how fast the others take
+its queues over. Reports duplicate polls (the same queue handled by two
+replicas within one interval) and takeover delay.
+
+Seeds `bench-*` queues and subscriptions and removes them afterwards; run it
+against a development database without a bot polling at the same time.
+
+Usage:
+    python -m bench.replicas --workers 4 --queues 200 --duration 30
+"""
+
+import argparse
+import asyncio
+import multiprocessing as mp
+import os
+import random
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+
+from bench.common import write_report
+
+BENCH_CHAT_BASE = 910_000_000_000
+
+
+async def _worker(idx: int, args, results, die_at: float) -> None:
+    from database import init_pool, close_pool, claim_due_queues, complete_queues
+
+    owner = f"bench-{idx}-{os.getpid()}"
+    await init_pool()
+    today = date.today()
+    deadline = time.time() + args.duration
+    try:
+        while time.time() < deadline:
+            rows = await claim_due_queues(owner, [today], args.claim_limit, args.lease)
+            claimed_at = time.time()
+            for row in rows:
+                results.put((row["queue_code"], owner, claimed_at))
+            if die_at and claimed_at >= die_at and rows:
+                # Simulate a crash while holding leases
+                os._exit(1)
+
+            await asyncio.sleep(random.uniform(0.05, 0.3))
+            now = datetime.now(timezone.utc)
+            await complete_queues(
+                owner,
+                today,
+                [(r["queue_code"], args.interval, now + timedelta(seconds=args.interval)) for r in rows],
+            )
+            await asyncio.sleep(args.tick)
+    finally:
+        await close_pool()
+
+
+def _run_worker(idx: int, args, results, die_at: float) -> None:
+    asyncio.run(_worker(idx, args, results, die_at))
+
+
+async def _seed(queues: int) -> None:
+    from database import init_db, init_pool, close_pool, get_pool
+
+    await init_db()
+    await init_pool()
+    try:
+        async with get_pool().acquire() as conn:
+            await conn.execute(
+                """
+                INSERT INTO subscriptions (street, chat_id, person_accnt, queue_code)
+                SELECT 'bench', $1 + g, g, 'bench-' || g
+                FROM generate_series(1, $2) AS g
+                ON CONFLICT DO NOTHING
+                """,
+                BENCH_CHAT_BASE,
+                queues,
+            )
+    finally:
+        await close_pool()
+
+
+async def _cleanup() -> None:
+    from database import init_pool, close_pool, get_pool
+
+    await init_pool()
+    try:
+        async with get_pool().acquire() as conn:
+            await conn.execute("DELETE FROM subscriptions WHERE chat_id > $1 AND street = 'bench'", BENCH_CHAT_BASE)
+            await conn.execute("DELETE FROM poll_queue WHERE queue_code LIKE 'bench-%'")
+    finally:
+        await close_pool()
+
+
+def analyze(claims, interval: float, victim: str, died_at: float) -> dict:
+    by_queue = defaultdict(list)
+    for queue_code, owner, at in claims:
+        if queue_code.startswith("bench-"):
+            by_queue[queue_code].append((at, owner))
+
+    duplicates = 0
+    takeovers = []
+    for events in by_queue.values():
+        events.sort()
+        for (t1, o1), (t2, o2) in zip(events, events[1:]):
+            if t2 - t1 < interval * 0.5:
+                duplicates += 1
+            if victim and o1.startswith(victim) and o2 != o1 and t1 <= died_at:
+                takeovers.append(t2 - died_at)
+
+    return {
+        "queues": len(by_queue),
+        "claims": sum(len(v) for v in by_queue.values()),
+        "owners": len({o for v in by_queue.values() for _, o in v}),
+        "duplicates": duplicates,
+        "takeover_max_sec": max(takeovers) if takeovers else None,
+        "takeover_queues": len(takeovers),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--queues", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--interval", type=float, default=5.0, help="seconds until a polled queue is due again")
+    parser.add_argument("--lease", type=float, default=3.0)
+    parser.add_argument("--tick", type=float, default=0.5)
+    parser.add_argument("--claim-limit", type=int, default=16)
+    parser.add_argument("--kill-after", type=float, default=10.0, help="seconds until worker 0 crashes (0 = never)")
+    parser.add_argument("--output", default="")
+    args = parser.parse_args()
+
+    asyncio.run(_seed(args.queues))
+    results: mp.Queue = mp.Queue()
+    started = time.time()
+    die_at = started + args.kill_after if args.kill_after else 0.0
+    procs = [
+        mp.Process(target=_run_worker, args=(i, args, results, die_at if i == 0 else 0.0))
+        for i in range(args.workers)
+    ]
+    for p in procs:
+        p.start()
+
+    claims = []
+    while any(p.is_alive() for p in procs) or not results.empty():
+        try:
+            claims.append(results.get(timeout=0.5))
+        except Exception:
+            pass
+    for p in procs:
+        p.join()
+
+    victim = "bench-0-" if args.kill_after else ""
+    died_at = max((at for q, o, at in claims if o.startswith("bench-0-")), default=0.0)
+    report = analyze(claims, args.interval, victim, died_at)
+    asyncio.run(_cleanup())
+
+    for key, value in report.items():
+        print(f"{key:<18} {value}")
+    if args.output:
+        write_report(args.output, "replicas", report, vars(args))
+
+
+if __name__ == "__main__":
+    main()
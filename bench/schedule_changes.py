@@ -0,0 +1,138 @@
+"""Check which schedule changes are announced, against a local Postgres.
+
+Stores three successive schedules of one `bench-` queue through the real
+`upsert_fetch_schedule` and `_change_message` path and checks the outbox:
+
+1. the first schedule is sent in full;
+2. a schedule with a longer outage is sent as a "Зміни в графіку" diff;
+3. a schedule whose outage minutes are the same (only its state names
+   differ) is stored but enqueues nothing.
+
+Seeds one `bench` subscription and removes everything afterwards; run it
+against a development database. Exits non-zero if a check fails.
+
+Usage:
+    python -m bench.schedule_changes
+"""
+
+import argparse
+import asyncio
+import sys
+from datetime import date
+from typing import Any, Dict, List, Tuple
+
+BENCH_QUEUE = "bench-changes"
+BENCH_CHAT = 940_000_000_001
+
+
+def make_payload(outage: Tuple[int, int], light_name: str = "Світло є") -> Dict[str, Any]:
+    """Return a schedule with outage ("3") slots for half-hours [start, end)."""
+    slots = []
+    for i in range(48):
+        slots.append({
+            "time_from": f"{i // 2:02d}:{30 * (i % 2):02d}",
+            "time_to": f"{(i + 1) // 2 % 24:02d}:{30 * ((i + 1) % 2):02d}",
+            "queue": "3" if outage[0] <= i < outage[1] else "1",
+        })
+    return {"aData": slots, "aState": {"1": {"name": light_name}, "3": {"name": "Відключення"}}}
+
+
+async def _cleanup(conn) -> None:
+    await conn.execute(
+        """
+        DELETE FROM outbox
+        WHERE message_id IN (SELECT id FROM outbox_messages WHERE queue_code = $1)
+        """,
+        BENCH_QUEUE,
+    )
+    await conn.execute("DELETE FROM outbox_messages WHERE queue_code = $1", BENCH_QUEUE)
+    await conn.execute("DELETE FROM outage_reminders WHERE queue_code = $1", BENCH_QUEUE)
+    await conn.execute("DELETE FROM queue_schedule WHERE queue_code = $1", BENCH_QUEUE)
+    await conn.execute("DELETE FROM poll_queue WHERE queue_code = $1", BENCH_QUEUE)
+    await conn.execute("DELETE FROM subscriptions WHERE queue_code = $1", BENCH_QUEUE)
+
+
+async def _store(sched_date: date, payload: Dict[str, Any]) -> Tuple[bool, List[str]]:
+    """Store one schedule and return (changed, texts of the messages it enqueued)."""
+    from database import get_pool, upsert_fetch_schedule
+    from utils import schedule_digest
+    from utils.slots import DaySchedule
+    from utils.updates import _change_message
+
+    async with get_pool().acquire() as conn:
+        before = await conn.fetchval("SELECT COALESCE(MAX(id), 0) FROM outbox_messages WHERE queue_code = $1", BENCH_QUEUE)
+    digest = schedule_digest(payload)
+    day = DaySchedule.from_payload(payload, digest)
+    changed = await upsert_fetch_schedule(
+        BENCH_QUEUE,
+        sched_date,
+        payload,
+        digest,
+        lambda previous: _change_message(BENCH_QUEUE, "bench", payload, day, previous),
+    )
+    async with get_pool().acquire() as conn:
+        rows = await conn.fetch(
+            """
+            SELECT m.text
+            FROM outbox_messages m
+            JOIN outbox o ON o.message_id = m.id
+            WHERE m.queue_code = $1 AND m.id > $2
+            ORDER BY m.id
+            """,
+            BENCH_QUEUE,
+            before,
+        )
+    return changed, [r["text"] for r in rows]
+
+
+async def run(args) -> List[str]:
+    from database import init_db, init_pool, close_pool, get_pool
+
+    await init_db()
+    await init_pool()
+    sched_date = date.fromisoformat(args.date) if args.date else date.today()
+    failures = []
+
+    def check(ok: bool, what: str) -> None:
+        print(f"{'ok  ' if ok else 'FAIL'} {what}")
+        if not ok:
+            failures.append(what)
+
+    try:
+        async with get_pool().acquire() as conn:
+            await _cleanup(conn)
+            await conn.execute(
+                """
+                INSERT INTO subscriptions (street, chat_id, person_accnt, queue_code)
+                VALUES ('bench', $1, 1, $2)
+                """,
+                BENCH_CHAT,
+                BENCH_QUEUE,
+            )
+
+        changed, texts = await _store(sched_date, make_payload((20, 24)))
+        check(changed and len(texts) == 1 and texts[0].startswith("Графік на"), "first schedule is sent in full")
+
+        changed, texts = await _store(sched_date, make_payload((20, 26)))
+        check(changed and len(texts) == 1 and texts[0].startswith("Зміни в графіку"), "longer outage is sent as a diff")
+
+        changed, texts = await _store(sched_date, make_payload((20, 26), light_name="Електроенергія є"))
+        check(changed and not texts, "outage-identical change enqueues nothing")
+    finally:
+        async with get_pool().acquire() as conn:
+            await _cleanup(conn)
+        await close_pool()
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--date", default="", help="schedule date (YYYY-MM-DD), today by default")
+    args = parser.parse_args()
+    failures = asyncio.run(run(args))
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
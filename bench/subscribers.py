@@ -0,0 +1,94 @@
+"""Benchmark enqueueing the notifications of changed queues.
+
+Times `enqueue_queue_notification` for every changed queue of a tick on
+both of its paths: chat ids taken from the loaded subscription index, and the
+INSERT ... SELECT over subscriptions used while the index is not ready (with
+and without the partial index). Rows are seeded and enqueued inside a
+transaction that is rolled back, so the benchmark can run against a
+development database.
+
+Usage:
+    python -m bench.subscribers --subs 100000 --queues 60 --changed 20
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from datetime import date
+
+import asyncpg
+
+from config import DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD
+from database.database import SUBS_SQL, OUTBOX_SQL
+from database.outbox import enqueue_queue_notification
+from database.subscription_index import INDEX_COLUMNS, subscription_index
+
+
+async def _timed(label: str, rounds: int, fn) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        await fn()
+    per_round = (time.perf_counter() - started) / rounds * 1000
+    print(f"{label:<32} {per_round:8.2f} ms/tick")
+    return per_round
+
+
+async def run(subs: int, queues: int, changed: int, rounds: int) -> None:
+    conn = await asyncpg.connect(
+        host=DB_HOST, port=DB_PORT, user=DB_USER, password=DB_PASSWORD, database=DB_NAME
+    )
+    tx = conn.transaction()
+    await tx.start()
+    try:
+        await conn.execute(SUBS_SQL)
+        await conn.execute(OUTBOX_SQL)
+        await conn.execute(
+            """
+            INSERT INTO subscriptions (street, chat_id, person_accnt, queue_code, enabled)
+            SELECT 'bench', 900000000000 + g / 3, g, ((g % $2) + 1)::text || '.b', (g % 10) <> 0
+            FROM generate_series(1, $1) AS g
+            """,
+            subs,
+            queues,
+        )
+        await conn.execute("ANALYZE subscriptions")
+        codes = [f"{i}.b" for i in random.sample(range(1, queues + 1), min(changed, queues))]
+        rows = await conn.fetch(f"SELECT {INDEX_COLUMNS} FROM subscriptions WHERE street = 'bench'")
+        print(f"{subs} subscriptions, {queues} queues, {len(codes)} changed per tick")
+
+        today = date.today()
+        version = 0
+
+        async def enqueue():
+            # A new version per tick, so every round enqueues a fresh fan-out
+            nonlocal version
+            version += 1
+            for code in codes:
+                await enqueue_queue_notification(conn, code, today, "bench", "bench", version)
+
+        subscription_index.load(rows)
+        subscription_index.ready = True
+        await _timed("index chat ids", rounds, enqueue)
+        subscription_index.ready = False
+        await _timed("insert-select, partial index", rounds, enqueue)
+
+        await conn.execute("DROP INDEX idx_subs_queue_enabled")
+        await _timed("insert-select, no index", rounds, enqueue)
+    finally:
+        await tx.rollback()
+        await conn.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subs", type=int, default=100_000)
+    parser.add_argument("--queues", type=int, default=60)
+    parser.add_argument("--changed", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(run(args.subs, args.queues, args.changed, args.rounds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Memory and lookup cost of the in-memory subscription index, fully offline.
+
+Loads N synthetic subscriptions (several per chat, spread over queues) into
+`SubscriptionIndex`, then reports memory per 100k subscriptions (traced
+allocations and the index's own estimate), load time, lookup latency of the
+three lookups and the cost of applying change notifications.
+
+Usage:
+    python -m bench.subscription_index --subs 100000,500000 --queues 60 --output index.json
+"""
+
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+from typing import Any, Dict, List
+
+from bench.common import percentiles, format_ms, write_report
+
+
+def make_rows(subs: int, queues: int, per_chat: int) -> List[Dict[str, Any]]:
+    """Return synthetic subscription rows like `SELECT INDEX_COLUMNS FROM subscriptions`."""
+    return [
+        {
+            "id": i + 1,
+            "street": f"вул. Бенчмаркова, {i % 5000}",
+            "chat_id": 900_000_000 + i // per_chat,
+            "person_accnt": 100_000_000 + i,
+            "queue_code": str(i % queues + 1),
+            "enabled": i % 10 != 0,
+        }
+        for i in range(subs)
+    ]
+
+
+def _time_lookups(fn, keys: List[Any]) -> Dict[str, float]:
+    samples = []
+    for key in keys:
+        started = time.perf_counter()
+        fn(key)
+        samples.append(time.perf_counter() - started)
+    return percentiles(samples)
+
+
+def run_size(subs: int, args) -> Dict[str, Any]:
+    from database.subscription_index import SubscriptionIndex
+
+    rows = make_rows(subs, args.queues, args.per_chat)
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    index = SubscriptionIndex()
+    index.load(rows)
+    load_sec = time.perf_counter() - started
+    traced, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    ids = [random.randint(1, subs) for _ in range(args.lookups)]
+    chats = [900_000_000 + random.randrange(subs // args.per_chat) for _ in range(args.lookups)]
+    codes = [str(random.randint(1, args.queues)) for _ in range(min(args.lookups, 2000))]
+    by_id = _time_lookups(index.get, ids)
+    by_chat = _time_lookups(index.for_chat, chats)
+    by_queue = _time_lookups(index.chats_for_queue, codes)
+
+    changes = []
+    for sub_id in ids[: args.changes]:
+        row = dict(rows[sub_id - 1])
+        row["op"] = "UPDATE"
+        row["enabled"] = not row["enabled"]
+        changes.append(row)
+    started = time.perf_counter()
+    for change in changes:
+        index.apply(change)
+    apply_us = (time.perf_counter() - started) / max(1, len(changes)) * 1e6
+
+    per_100k = 100_000 / subs
+    res = {
+        "subscriptions": subs,
+        "load_sec": round(load_sec, 3),
+        "traced_mb_per_100k": round(traced * per_100k / 1024 / 1024, 2),
+        "estimated_mb_per_100k": round(index.memory_bytes() * per_100k / 1024 / 1024, 2),
+        "get": by_id,
+        "for_chat": by_chat,
+        "chats_for_queue": by_queue,
+        "apply_us": round(apply_us, 2),
+    }
+    print(
+        f"{subs:>8} subs: {res['traced_mb_per_100k']} MiB/100k traced, "
+        f"{res['estimated_mb_per_100k']} MiB/100k estimated, load {load_sec:.2f}s, apply {apply_us:.1f}us"
+    )
+    for name in ("get", "for_chat", "chats_for_queue"):
+        print(f"{'':>10}{name:<16} {format_ms(res[name])}")
+    return res
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subs", default="100000", help="comma-separated subscription counts")
+    parser.add_argument("--queues", type=int, default=60)
+    parser.add_argument("--per-chat", type=int, default=2, help="subscriptions per chat")
+    parser.add_argument("--lookups", type=int, default=20000)
+    parser.add_argument("--changes", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="", help="optional JSON report path")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    results = [run_size(int(n), args) for n in args.subs.split(",")]
+    if args.output:
+        write_report(args.output, "subscription_index", results, vars(args))
+
+
+if __name__ == "__main__":
+    main()
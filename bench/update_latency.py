@@ -0,0 +1,153 @@
+"""Compare update delivery latency of long polling and webhook mode.
+
+Both modes run locally: long polling talks to the fake Bot API server, webhook
+mode receives updates posted to the same aiohttp application the bot uses.
+Latency is measured from the moment an update is handed to Telegram's side
+(pushed to getUpdates / POSTed to the webhook) until the handler starts.
+
+Usage:
+    python -m bench.update_latency --updates 2000 --rate 200
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Dict, List
+
+import aiohttp
+from aiogram import Bot, Dispatcher, Router, types
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiohttp import web
+
+from bench.common import BENCH_TOKEN, percentiles, format_ms, write_report
+from bench.fake_telegram import FakeTelegram
+from config import WEBHOOK_PATH
+from utils.webhook import build_webhook_app
+
+
+def make_update(i: int) -> Dict:
+    return {
+        "message": {
+            "message_id": i,
+            "date": int(time.time()),
+            "chat": {"id": 1000 + i % 50, "type": "private"},
+            "from": {"id": 1000 + i % 50, "is_bot": False, "first_name": "Bench"},
+            "text": f"bench {i}",
+        }
+    }
+
+
+def make_dispatcher(sent_at: Dict[str, float], latencies: List[float], done: asyncio.Event, total: int) -> Dispatcher:
+    router = Router(name="bench")
+
+    @router.message()
+    async def on_message(message: types.Message) -> None:
+        started = sent_at.pop(message.text or "", None)
+        if started is not None:
+            latencies.append(time.perf_counter() - started)
+        if len(latencies) >= total:
+            done.set()
+
+    dp = Dispatcher()
+    dp.include_router(router)
+    return dp
+
+
+async def _pace(total: int, rate: float, send) -> None:
+    started = time.perf_counter()
+    for i in range(total):
+        delay = started + i / rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await send(i)
+
+
+async def bench_polling(total: int, rate: float) -> Dict[str, float]:
+    fake = FakeTelegram()
+    base = await fake.start()
+    bot = Bot(BENCH_TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(base)))
+    sent_at: Dict[str, float] = {}
+    latencies: List[float] = []
+    done = asyncio.Event()
+    dp = make_dispatcher(sent_at, latencies, done, total)
+    polling = asyncio.create_task(dp.start_polling(bot, handle_signals=False, polling_timeout=10))
+    await asyncio.sleep(0.5)
+
+    async def send(i: int) -> None:
+        update = make_update(i)
+        sent_at[update["message"]["text"]] = time.perf_counter()
+        fake.push_update(update)
+
+    try:
+        await _pace(total, rate, send)
+        await asyncio.wait_for(done.wait(), 30)
+    finally:
+        await dp.stop_polling()
+        await polling
+        await bot.session.close()
+        await fake.stop()
+    return percentiles(latencies)
+
+
+async def bench_webhook(total: int, rate: float) -> Dict[str, float]:
+    fake = FakeTelegram()
+    base = await fake.start()
+    bot = Bot(BENCH_TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(base)))
+    sent_at: Dict[str, float] = {}
+    latencies: List[float] = []
+    done = asyncio.Event()
+    dp = make_dispatcher(sent_at, latencies, done, total)
+
+    runner = web.AppRunner(build_webhook_app(dp, bot, secret="bench"))
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    host, port = runner.addresses[0][:2]
+    url = f"http://{host}:{port}{WEBHOOK_PATH}"
+
+    async with aiohttp.ClientSession(headers={"X-Telegram-Bot-Api-Secret-Token": "bench"}) as client:
+        pending: List[asyncio.Task] = []
+
+        async def post(update: Dict) -> None:
+            async with client.post(url, json=update) as resp:
+                await resp.read()
+
+        async def send(i: int) -> None:
+            update = make_update(i)
+            update["update_id"] = i + 1
+            sent_at[update["message"]["text"]] = time.perf_counter()
+            pending.append(asyncio.create_task(post(update)))
+
+        try:
+            await _pace(total, rate, send)
+            await asyncio.gather(*pending)
+            await asyncio.wait_for(done.wait(), 30)
+        finally:
+            await runner.cleanup()
+            await bot.session.close()
+            await fake.stop()
+    return percentiles(latencies)
+
+
+async def run(total: int, rate: float, output: str) -> None:
+    results = {}
+    for name, fn in (("polling", bench_polling), ("webhook", bench_webhook)):
+        stats = await fn(total, rate)
+        results[name] = stats
+        print(f"{name:<8} {format_ms(stats)}")
+    if output:
+        write_report(output, "update_latency", results, {"updates": total, "rate": rate})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=200.0, help="updates per second")
+    parser.add_argument("--output", default="", help="optional JSON report path")
+    args = parser.parse_args()
+    asyncio.run(run(args.updates, args.rate, args.output))
+
+
+if __name__ == "__main__":
+    main()
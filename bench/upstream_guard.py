@@ -0,0 +1,128 @@
+"""Caller latency and upstream load against a degrading simulated provider API.
+
+The simulated upstream slows down as concurrent requests exceed its
+capacity, then goes down completely for a while and recovers. The same
+stream of requests is run without protection (every caller waits for its
+own timeout) and through `UpstreamGuard`. Reports caller latency, peak
+concurrent upstream requests and how many calls failed fast.
+
+Does not touch the network or the database.
+
+Usage:
+    python -m bench.upstream_guard --rps 40 --duration 30
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from bench.common import percentiles, format_ms, write_report
+
+
+class SimulatedUpstream:
+    """Latency grows with concurrency above `capacity`; fails during the outage window."""
+
+    def __init__(self, capacity: int, base_latency: float, timeout: float, outage: tuple[float, float]) -> None:
+        self.capacity = capacity
+        self.base_latency = base_latency
+        self.timeout = timeout
+        self.outage = outage
+        self.inflight = 0
+        self.peak = 0
+        self.requests = 0
+        self.started = time.monotonic()
+
+    async def call(self) -> str:
+        self.requests += 1
+        self.inflight += 1
+        self.peak = max(self.peak, self.inflight)
+        try:
+            elapsed = time.monotonic() - self.started
+            if self.outage[0] <= elapsed < self.outage[1]:
+                latency = self.timeout * 2  # hangs until the client gives up
+            else:
+                latency = self.base_latency * max(1.0, self.inflight / self.capacity) * random.uniform(0.8, 1.2)
+            await asyncio.wait_for(asyncio.sleep(latency), self.timeout)
+            return "ok"
+        finally:
+            self.inflight -= 1
+
+
+async def _run(mode: str, args) -> dict:
+    from utils.guard import UpstreamGuard, UpstreamError
+
+    upstream = SimulatedUpstream(
+        args.capacity,
+        args.latency,
+        args.timeout,
+        (args.duration * 0.4, args.duration * 0.6),
+    )
+    guard = UpstreamGuard(
+        max_concurrency=args.max_concurrency,
+        latency_target=args.latency * 3,
+        deadline=args.timeout,
+        cooldown=args.duration * 0.05,
+    )
+    latencies = []
+    outcomes = {"ok": 0, "failed": 0}
+
+    async def one() -> None:
+        started = time.perf_counter()
+        try:
+            if mode == "guarded":
+                await guard.call(upstream.call)
+            else:
+                await upstream.call()
+            outcomes["ok"] += 1
+        except (UpstreamError, asyncio.TimeoutError):
+            outcomes["failed"] += 1
+        latencies.append(time.perf_counter() - started)
+
+    tasks = []
+    deadline = time.monotonic() + args.duration
+    while time.monotonic() < deadline:
+        tasks.append(asyncio.create_task(one()))
+        await asyncio.sleep(random.expovariate(args.rps))
+    await asyncio.gather(*tasks)
+
+    result = {
+        "calls": len(latencies),
+        **outcomes,
+        "upstream_requests": upstream.requests,
+        "upstream_peak_inflight": upstream.peak,
+        "latency": percentiles(latencies),
+    }
+    if mode == "guarded":
+        result["guard"] = vars(guard.state())
+    return result
+
+
+async def run(args) -> dict:
+    results = {}
+    for mode in ("unguarded", "guarded"):
+        results[mode] = res = await _run(mode, args)
+        print(
+            f"{mode:<10} ok={res['ok']} failed={res['failed']} upstream={res['upstream_requests']} "
+            f"peak={res['upstream_peak_inflight']} {format_ms(res['latency'])}"
+        )
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rps", type=float, default=40.0)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--capacity", type=int, default=8, help="concurrent requests the upstream handles at base latency")
+    parser.add_argument("--latency", type=float, default=0.2, help="base upstream latency in seconds")
+    parser.add_argument("--timeout", type=float, default=15.0)
+    parser.add_argument("--max-concurrency", type=int, default=20)
+    parser.add_argument("--output", default="")
+    args = parser.parse_args()
+    results = asyncio.run(run(args))
+    if args.output:
+        write_report(args.output, "upstream_guard", results, vars(args))
+
+
+if __name__ == "__main__":
+    main()
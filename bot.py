@@ -4,14 +4,17 @@ import logging
 import asyncio
 
 from utils import setup_logger
-from utils import poll_loop
+from utils import poll_loop, outbox_loop, reminder_loop
+from utils import init_http, close_http
+from utils import instrument_router, start_metrics_server
 from callback import callback_router
 from command import command_router
 from states import states_router
 from handler import handler_router
-from config import API_TOKEN
+from utils.webhook import start_webhook
+from config import API_TOKEN, WEBHOOK_URL
 from aiogram import Bot, Dispatcher, types
-from database import init_db, init_pool, close_pool
+from database import init_db, init_pool, close_pool, run_subscription_index
 
 logger = setup_logger(log_level=logging.INFO)
 
@@ -21,12 +24,15 @@ dp.include_router(callback_router)
 dp.include_router(command_router)
 dp.include_router(states_router)
 dp.include_router(handler_router)
+for _router in (callback_router, command_router, states_router, handler_router):
+    instrument_router(_router)
 
 
 async def main(bot: Bot):
-    """Initialize DB, register bot commands, and start polling + background loop."""
+    """Initialize DB and upstream HTTP client, register bot commands, and start update delivery + background loop."""
     await init_db()
     await init_pool()
+    await init_http()
     try:
         await bot.set_my_commands([
             types.BotCommand(command="start", description="Start the bot"),
@@ -34,12 +40,42 @@ async def main(bot: Bot):
     except Exception:
         pass
 
-    polling = asyncio.create_task(dp.start_polling(bot))
-    bg = asyncio.create_task(poll_loop(bot))
+    runner = None
+    metrics_runner = None
+    try:
+        metrics_runner = await start_metrics_server()
+    except OSError as ex:
+        logger.warning("Metrics endpoint disabled: %s", ex)
+    tasks = [
+        asyncio.create_task(poll_loop()),
+        asyncio.create_task(outbox_loop(bot)),
+        asyncio.create_task(reminder_loop()),
+        asyncio.create_task(run_subscription_index()),
+    ]
+    if WEBHOOK_URL:
+        runner = await start_webhook(dp, bot)
+        logger.info("Receiving updates via webhook at %s", WEBHOOK_URL)
+    else:
+        try:
+            await bot.delete_webhook()
+        except Exception:
+            pass
+        tasks.append(asyncio.create_task(dp.start_polling(bot)))
 
     try:
-        await asyncio.gather(polling, bg)
+        await asyncio.gather(*tasks)
     finally:
+        for r in (runner, metrics_runner):
+            if r is None:
+                continue
+            try:
+                await r.cleanup()
+            except Exception:
+                pass
+        try:
+            await close_http()
+        except Exception:
+            pass
         try:
             await close_pool()
         except Exception:
@@ -1,17 +1,17 @@
 """Callback query handlers for aiogram bot."""
 
-import aiohttp
 from aiogram import types, F, Router, Bot
+from aiogram.fsm.context import FSMContext
 from typing import cast
 
-from keyboards import subs_inline, sub_actions_inline, main_menu
+from keyboards import CHECK_PAGE_PREFIX, subs_inline, sub_actions_inline, main_menu, pages_inline
 from utils import try_fetch_with_limits
 from utils import format_entries, cb_chat_id
 from database import (
     list_subscriptions,
-    set_subscription_enabled,
-    remove_subscription,
-    get_subscription_by_id,
+    get_chat_subscription,
+    toggle_subscription,
+    remove_subscription_and_list,
 )
 
 callback_router = Router(name="callback")
@@ -37,32 +37,27 @@ async def cb_toggle(call: types.CallbackQuery):
     
     chat_id = cb_chat_id(call)
     sub_id = int(call.data.split(":")[1])
-    s = await get_subscription_by_id(sub_id)
+    sub = await toggle_subscription(chat_id, sub_id)
 
-    if not s:
+    if not sub:
         await call.answer("Не знайдено")
         return
     
-    new_state = not bool(s.get("enabled"))
-    ok = await set_subscription_enabled(chat_id, sub_id, new_state)
-    await call.answer("Увімкнено" if new_state else "Вимкнено", show_alert=False)
-
-    if ok and call.message:
-        subs = await list_subscriptions(chat_id)
-        sub = next((x for x in subs if x["id"] == sub_id), None)
-        if sub:
-            header = f"Налаштування:\n\nО/р {sub['person_accnt']}, {sub.get('street','')}"
+    await call.answer("Увімкнено" if sub["enabled"] else "Вимкнено", show_alert=False)
+
+    if call.message:
+        header = f"Налаштування:\n\nО/р {sub['person_accnt']}, {sub.get('street','')}"
+        try:
+            msg = cast(types.Message, call.message)
+            await msg.edit_text(header, reply_markup=sub_actions_inline(sub))
+        except Exception:
+                
             try:
                 msg = cast(types.Message, call.message)
-                await msg.edit_text(header, reply_markup=sub_actions_inline(sub))
+                await msg.delete()
             except Exception:
-                    
-                try:
-                    msg = cast(types.Message, call.message)
-                    await msg.delete()
-                except Exception:
-                    pass
-                await cast(types.Message, call.message).answer(header, reply_markup=sub_actions_inline(sub))
+                pass
+            await cast(types.Message, call.message).answer(header, reply_markup=sub_actions_inline(sub))
 
 
 @callback_router.callback_query(F.data.startswith("check:"))
@@ -73,14 +68,13 @@ async def cb_check(call: types.CallbackQuery):
     
     chat_id = cb_chat_id(call)
     sub_id = int(call.data.split(":")[1])
-    s = await get_subscription_by_id(sub_id)
+    s = await get_chat_subscription(chat_id, sub_id)
 
     if not s:
         await call.answer("Не знайдено")
         return
 
-    async with aiohttp.ClientSession() as session:
-        data, limit_msg = await try_fetch_with_limits(session, chat_id, s["person_accnt"], is_poll=False)
+    data, limit_msg = await try_fetch_with_limits(chat_id, s["person_accnt"], is_poll=False)
 
     if limit_msg:
         await call.answer("Ліміт вичерпано", show_alert=True)
@@ -118,13 +112,12 @@ async def cb_delete(call: types.CallbackQuery):
     
     chat_id = cb_chat_id(call)
     sub_id = int(call.data.split(":")[1])
-    s = await remove_subscription(chat_id, sub_id)
+    deleted, subs = await remove_subscription_and_list(chat_id, sub_id)
 
-    if not s:
+    if not deleted:
         await call.answer("Не вдалося видалити")
         return
 
-    subs = await list_subscriptions(chat_id)
     if call.message:
         try:
             msg = cast(types.Message, call.message)
@@ -146,8 +139,7 @@ async def cb_open_sub(call: types.CallbackQuery):
     
     sub_id = int(call.data.split(":")[1])
     chat_id = cb_chat_id(call)
-    subs = await list_subscriptions(chat_id)
-    s = next((x for x in subs if x["id"] == sub_id), None)
+    s = await get_chat_subscription(chat_id, sub_id)
 
     if not s:
         await call.answer("Не знайдено")
@@ -184,4 +176,28 @@ async def cb_back_subs(call: types.CallbackQuery):
             except Exception:
                 pass
             await cast(types.Message, call.message).answer("Підписки:", reply_markup=subs_inline(subs))
-    await call.answer()
\ No newline at end of file
+    await call.answer()
+
+@callback_router.callback_query(F.data.startswith(f"{CHECK_PAGE_PREFIX}:"))
+async def cb_check_page(call: types.CallbackQuery, state: FSMContext):
+    if not call.data or not call.message:
+        await call.answer()
+        return
+
+    page = int(call.data.split(":")[1])
+    pages = (await state.get_data()).get("check_pages") or []
+    if not 0 <= page < len(pages):
+        await call.answer("Сторінка недоступна, перевірте ще раз")
+        return
+
+    try:
+        msg = cast(types.Message, call.message)
+        await msg.edit_text(pages[page], reply_markup=pages_inline(page, len(pages), CHECK_PAGE_PREFIX))
+    except Exception:
+        pass
+    await call.answer()
+
+
+@callback_router.callback_query(F.data.startswith("noop:"))
+async def cb_noop(call: types.CallbackQuery):
+    await call.answer()
@@ -34,6 +34,34 @@ def _require_env(name: str) -> str:
     return value
 
 
+def _env_int(name: str, default: int) -> int:
+    """Return an optional integer environment variable or its default.
+
+    Args:
+        name: Environment variable name.
+        default: Value used when the variable is missing or empty.
+
+    Returns:
+        The parsed integer value.
+    """
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def _env_float(name: str, default: float) -> float:
+    """Return an optional float environment variable or its default.
+
+    Args:
+        name: Environment variable name.
+        default: Value used when the variable is missing or empty.
+
+    Returns:
+        The parsed float value.
+    """
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
 API_TOKEN: str = _require_env("API_TOKEN")
 
 DB_HOST: str = _require_env("DB_HOST")
@@ -42,4 +70,69 @@ DB_NAME: str = _require_env("DB_NAME")
 DB_USER: str = _require_env("DB_USER")
 DB_PASSWORD: str = _require_env("DB_PASSWORD")
 
-CACHE_SEC: int = int(_require_env("CACHE_SEC"))
\ No newline at end of file
+CACHE_SEC: int = int(_require_env("CACHE_SEC"))
+CACHE_MAX_ENTRIES: int = _env_int("CACHE_MAX_ENTRIES", 10_000)
+CACHE_MAX_BYTES: int = _env_int("CACHE_MAX_BYTES", 16 * 1024 * 1024)
+HOURLY_CHECK_LIMIT: int = _env_int("HOURLY_CHECK_LIMIT", 10)
+# Days an account's street/queue in the shared directory is reused without asking upstream
+ACCOUNT_MAX_AGE_DAYS: int = _env_int("ACCOUNT_MAX_AGE_DAYS", 30)
+# Accounts of one "Перевірити зараз" press checked in parallel
+CHECK_CONCURRENCY: int = _env_int("CHECK_CONCURRENCY", 3)
+
+# Outgoing message fan-out (Telegram allows ~30 msg/s per bot, ~1 msg/s per chat)
+BROADCAST_RATE: float = _env_float("BROADCAST_RATE", 25.0)
+BROADCAST_CHAT_RATE: float = _env_float("BROADCAST_CHAT_RATE", 1.0)
+BROADCAST_CONCURRENCY: int = _env_int("BROADCAST_CONCURRENCY", 20)
+BROADCAST_RETRIES: int = _env_int("BROADCAST_RETRIES", 3)
+
+# Number of queue schedules fetched from the upstream API in parallel per poll tick
+POLL_FETCH_CONCURRENCY: int = _env_int("POLL_FETCH_CONCURRENCY", 8)
+
+# Shared upstream HTTP client (interruptions.energy.cn.ua)
+UPSTREAM_BASE_URL: str = (os.getenv("UPSTREAM_BASE_URL") or "https://interruptions.energy.cn.ua").rstrip("/")
+UPSTREAM_POOL_SIZE: int = _env_int("UPSTREAM_POOL_SIZE", 20)
+UPSTREAM_TIMEOUT: float = _env_float("UPSTREAM_TIMEOUT", 15.0)
+UPSTREAM_CONNECT_TIMEOUT: float = _env_float("UPSTREAM_CONNECT_TIMEOUT", 5.0)
+UPSTREAM_LATENCY_TARGET: float = _env_float("UPSTREAM_LATENCY_TARGET", 2.0)
+UPSTREAM_RETRIES: int = _env_int("UPSTREAM_RETRIES", 2)
+UPSTREAM_BREAKER_FAILURES: int = _env_int("UPSTREAM_BREAKER_FAILURES", 5)
+UPSTREAM_BREAKER_COOLDOWN: float = _env_float("UPSTREAM_BREAKER_COOLDOWN", 30.0)
+
+# Adaptive poll scheduling (seconds); hot hours are Kyiv time, "start-end" end exclusive
+POLL_TICK_SEC: float = _env_float("POLL_TICK_SEC", 15.0)
+POLL_BASE_SEC: float = _env_float("POLL_BASE_SEC", 600.0)
+POLL_MIN_SEC: float = _env_float("POLL_MIN_SEC", 300.0)
+POLL_MAX_SEC: float = _env_float("POLL_MAX_SEC", 2400.0)
+POLL_HOT_HOURS: str = os.getenv("POLL_HOT_HOURS") or "16-23"
+POLL_JITTER: float = _env_float("POLL_JITTER", 0.1)
+# Days after today whose schedules are polled along with today's
+POLL_DAYS_AHEAD: int = _env_int("POLL_DAYS_AHEAD", 1)
+# Seconds a parsed schedule is answered from memory before being reloaded from the database
+SLOT_INDEX_TTL: float = _env_float("SLOT_INDEX_TTL", 60.0)
+
+# Pre-outage reminders; REMINDER_LEAD_MIN=0 disables them
+REMINDER_LEAD_MIN: int = _env_int("REMINDER_LEAD_MIN", 30)
+REMINDER_REFRESH_SEC: float = _env_float("REMINDER_REFRESH_SEC", 300.0)
+
+# Webhook delivery; long polling is used when WEBHOOK_URL is empty
+WEBHOOK_URL: str = os.getenv("WEBHOOK_URL") or ""
+WEBHOOK_PATH: str = os.getenv("WEBHOOK_PATH") or "/webhook"
+WEBHOOK_HOST: str = os.getenv("WEBHOOK_HOST") or "0.0.0.0"
+WEBHOOK_PORT: int = _env_int("WEBHOOK_PORT", 8080)
+WEBHOOK_SECRET: str = os.getenv("WEBHOOK_SECRET") or ""
+
+# Queue leases shared between bot replicas
+POLL_CLAIM_LIMIT: int = _env_int("POLL_CLAIM_LIMIT", 16)
+POLL_LEASE_SEC: float = _env_float("POLL_LEASE_SEC", 60.0)
+
+# Durable notification outbox
+OUTBOX_WORKERS: int = _env_int("OUTBOX_WORKERS", 4)
+OUTBOX_BATCH: int = _env_int("OUTBOX_BATCH", 25)
+OUTBOX_LEASE_SEC: float = _env_float("OUTBOX_LEASE_SEC", 120.0)
+OUTBOX_MAX_ATTEMPTS: int = _env_int("OUTBOX_MAX_ATTEMPTS", 5)
+OUTBOX_RETRY_SEC: float = _env_float("OUTBOX_RETRY_SEC", 60.0)
+OUTBOX_KEEP_DAYS: int = _env_int("OUTBOX_KEEP_DAYS", 7)
+
+# Prometheus-style /metrics endpoint; METRICS_PORT=0 disables it
+METRICS_HOST: str = os.getenv("METRICS_HOST") or "0.0.0.0"
+METRICS_PORT: int = _env_int("METRICS_PORT", 9100)
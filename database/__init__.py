@@ -4,23 +4,56 @@ from .database import (
 	close_pool,
 	get_pool,
     _pool,
+    pool_stats,
+    PoolStats,
+    count_queries,
 
 )
+from .subscription_index import (
+    SubscriptionIndex,
+    subscription_index,
+    run_subscription_index,
+)
 from .subscriptions import (
-    add_subscription,
-    remove_subscription,
     list_subscriptions,
-    set_subscription_enabled,
-    get_subscription_by_id,
-    get_subscription_by_details,
+    get_chat_subscription,
+    toggle_subscription,
+    remove_subscription_and_list,
+    consume_fetch_quota,
     update_subscription_payload,
-    list_chat_ids_by_queue,
 )
 from .users import (
     add_user,
-    check_subscription_limit,
+)
+from .accounts import (
+    ADDED,
+    EXISTS,
+    LIMIT,
+    UNKNOWN,
+    add_known_account_subscription,
+    add_account_subscription,
 )
 from .queue_schedule import (
-    list_queues_with_payload_for_date,
     upsert_fetch_schedule,
+    set_schedule_digest,
+    get_queue_schedules,
+)
+from .poll_queue import (
+    claim_due_queues,
+    complete_queues,
+)
+from .outbox import (
+    DELIVERED,
+    REJECTED,
+    RETRY,
+    claim_outbox_batch,
+    complete_outbox_batch,
+    outbox_depth,
+    purge_outbox,
+)
+from .reminders import (
+    replace_outage_reminders,
+    pending_reminders,
+    fire_outage_reminder,
+    purge_outage_reminders,
 )
\ No newline at end of file
@@ -0,0 +1,148 @@
+from typing import Optional
+from database import get_pool
+from .subscription_index import INDEX_COLUMNS, subscription_index
+
+# Outcomes of `add_known_account_subscription` and `add_account_subscription`
+ADDED = "added"
+EXISTS = "exists"
+LIMIT = "limit"
+UNKNOWN = "unknown"
+
+
+async def add_known_account_subscription(
+    chat_id: int,
+    person_accnt: int,
+    max_age_days: int,
+    username: Optional[str] = None,
+    first_name: Optional[str] = None,
+    last_name: Optional[str] = None,
+    language_code: Optional[str] = None,
+    is_bot: Optional[bool] = None,
+) -> tuple[str, Optional[dict]]:
+    """Register the user and subscribe to an account from the directory in one statement.
+
+    The user row is upserted, an existing subscription to the account and then
+    the subscription limit are checked and, when the account was verified
+    within `max_age_days`, the subscription is inserted with the stored street
+    and queue, so no upstream request is needed.
+
+    Returns:
+        A tuple of (ADDED | EXISTS | LIMIT | UNKNOWN, the new subscription when ADDED).
+        UNKNOWN means the account is missing from the directory or stale.
+    """
+    async with get_pool().acquire() as conn:
+        row = await conn.fetchrow(
+            f"""
+            WITH u AS (
+                INSERT INTO users (chat_id, username, first_name, last_name, language_code, is_bot, updated_at)
+                VALUES ($1, $3, $4, $5, $6, $7, (NOW() AT TIME ZONE 'Europe/Kyiv'))
+                ON CONFLICT(chat_id)
+                DO UPDATE SET
+                    username = EXCLUDED.username,
+                    first_name = EXCLUDED.first_name,
+                    last_name = EXCLUDED.last_name,
+                    language_code = EXCLUDED.language_code,
+                    is_bot = COALESCE(EXCLUDED.is_bot, users.is_bot),
+                    updated_at = EXCLUDED.updated_at
+                RETURNING max_street_subscriptions
+            ),
+            cnt AS (
+                SELECT COUNT(*) AS n,
+                       COALESCE(BOOL_OR(person_accnt = $2), FALSE) AS subscribed
+                FROM subscriptions
+                WHERE chat_id = $1
+            ),
+            a AS (
+                SELECT street, queue_code
+                FROM accounts
+                WHERE person_accnt = $2 AND verified_at > NOW() - make_interval(days => $8)
+            ),
+            ins AS (
+                INSERT INTO subscriptions (street, chat_id, person_accnt, queue_code)
+                SELECT a.street, $1, $2, a.queue_code
+                FROM a, u, cnt
+                WHERE NOT cnt.subscribed AND cnt.n < u.max_street_subscriptions
+                ON CONFLICT DO NOTHING
+                RETURNING {INDEX_COLUMNS}
+            )
+            SELECT (SELECT subscribed FROM cnt) AS subscribed,
+                   (SELECT cnt.n < u.max_street_subscriptions FROM u, cnt) AS allowed,
+                   EXISTS (SELECT 1 FROM a) AS known,
+                   (SELECT to_jsonb(ins) FROM ins) AS sub
+            """,
+            chat_id,
+            person_accnt,
+            username,
+            first_name,
+            last_name,
+            language_code,
+            is_bot,
+            int(max_age_days),
+        )
+    if row["subscribed"]:
+        return EXISTS, None
+    if not row["allowed"]:
+        return LIMIT, None
+    if not row["known"]:
+        return UNKNOWN, None
+    if row["sub"] is None:
+        return EXISTS, None
+    subscription_index.upsert(row["sub"])
+    return ADDED, row["sub"]
+
+
+async def add_account_subscription(
+    street: str,
+    chat_id: int,
+    person_accnt: int,
+    queue_code: str,
+) -> tuple[str, Optional[dict]]:
+    """Record a freshly verified account in the directory and subscribe the chat to it.
+
+    Both writes happen in one statement; the directory entry is refreshed even
+    if the chat is already subscribed. The subscription limit is checked again
+    by the insert itself, since the upstream lookup before it may take a while.
+
+    Returns:
+        A tuple of (ADDED | EXISTS | LIMIT, the new subscription when ADDED).
+    """
+    async with get_pool().acquire() as conn:
+        row = await conn.fetchrow(
+            f"""
+            WITH acc AS (
+                INSERT INTO accounts (person_accnt, street, queue_code, verified_at)
+                VALUES ($3, $1, $4, NOW())
+                ON CONFLICT (person_accnt)
+                DO UPDATE SET street = EXCLUDED.street, queue_code = EXCLUDED.queue_code, verified_at = NOW()
+            ),
+            cnt AS (
+                SELECT COUNT(*) AS n,
+                       COALESCE(BOOL_OR(person_accnt = $3), FALSE) AS subscribed
+                FROM subscriptions
+                WHERE chat_id = $2
+            ),
+            ins AS (
+                INSERT INTO subscriptions (street, chat_id, person_accnt, queue_code)
+                SELECT $1, $2, $3, $4
+                FROM users u, cnt
+                WHERE u.chat_id = $2 AND NOT cnt.subscribed AND cnt.n < u.max_street_subscriptions
+                ON CONFLICT DO NOTHING
+                RETURNING {INDEX_COLUMNS}
+            )
+            SELECT (SELECT subscribed FROM cnt) AS subscribed,
+                   (SELECT cnt.n < u.max_street_subscriptions FROM users u, cnt WHERE u.chat_id = $2) AS allowed,
+                   (SELECT to_jsonb(ins) FROM ins) AS sub
+            """,
+            street,
+            chat_id,
+            person_accnt,
+            queue_code,
+        )
+    if row["subscribed"]:
+        return EXISTS, None
+    if not row["allowed"]:
+        return LIMIT, None
+    if row["sub"] is None:
+        return EXISTS, None
+    subscription_index.upsert(row["sub"])
+    return ADDED, row["sub"]
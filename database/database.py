@@ -1,5 +1,10 @@
 import asyncpg
-from typing import Optional
+import orjson
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Iterator, Optional
 from config import DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD
 
 USERS_SQL = """
@@ -33,6 +38,7 @@ CREATE TABLE IF NOT EXISTS subscriptions (
 );
 CREATE INDEX IF NOT EXISTS idx_subs_chat ON subscriptions(chat_id);
 CREATE INDEX IF NOT EXISTS idx_subs_enabled ON subscriptions(enabled);
+CREATE INDEX IF NOT EXISTS idx_subs_queue_enabled ON subscriptions(queue_code, chat_id) WHERE enabled;
 """
 
 QUEUE_SCHEDULE_SQL = """
@@ -40,16 +46,154 @@ CREATE TABLE IF NOT EXISTS queue_schedule (
     queue_code TEXT NOT NULL,
     sched_date DATE NOT NULL,
     payload JSONB NOT NULL,
+    digest TEXT,
     updated_at TIMESTAMPTZ DEFAULT (NOW() AT TIME ZONE 'Europe/Kyiv') NOT NULL,
     PRIMARY KEY (queue_code, sched_date)
 );
+ALTER TABLE queue_schedule ADD COLUMN IF NOT EXISTS digest TEXT;
+ALTER TABLE queue_schedule ADD COLUMN IF NOT EXISTS version BIGINT NOT NULL DEFAULT 0;
 """
 
+POLL_QUEUE_SQL = """
+CREATE TABLE IF NOT EXISTS poll_queue (
+    queue_code TEXT PRIMARY KEY,
+    sched_date DATE,
+    interval_sec DOUBLE PRECISION,
+    next_due_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    lease_owner TEXT,
+    lease_until TIMESTAMPTZ
+);
+CREATE INDEX IF NOT EXISTS idx_poll_queue_due ON poll_queue(next_due_at);
+
+-- Queues are registered when subscriptions are written, not by every poll tick
+CREATE OR REPLACE FUNCTION register_poll_queue() RETURNS trigger AS $$
+BEGIN
+    IF NEW.queue_code IS NOT NULL AND LENGTH(NEW.queue_code) > 0 THEN
+        INSERT INTO poll_queue (queue_code) VALUES (NEW.queue_code)
+        ON CONFLICT (queue_code) DO NOTHING;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+-- Created once; recreating it on every startup locks subscriptions for nothing
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_trigger
+        WHERE tgname = 'trg_subscriptions_poll_queue' AND tgrelid = 'subscriptions'::regclass
+    ) THEN
+        CREATE TRIGGER trg_subscriptions_poll_queue
+        AFTER INSERT OR UPDATE OF queue_code ON subscriptions
+        FOR EACH ROW EXECUTE FUNCTION register_poll_queue();
+    END IF;
+END;
+$$;
+INSERT INTO poll_queue (queue_code)
+SELECT DISTINCT queue_code
+FROM subscriptions
+WHERE queue_code IS NOT NULL AND LENGTH(queue_code) > 0
+ON CONFLICT (queue_code) DO NOTHING;
+"""
+
+OUTBOX_SQL = """
+CREATE TABLE IF NOT EXISTS outbox_messages (
+    id BIGSERIAL PRIMARY KEY,
+    queue_code TEXT NOT NULL,
+    sched_date DATE NOT NULL,
+    digest TEXT NOT NULL,
+    version BIGINT NOT NULL DEFAULT 0,
+    text TEXT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+-- Messages are keyed on the schedule change (its version), not on the content alone
+ALTER TABLE outbox_messages ADD COLUMN IF NOT EXISTS version BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE outbox_messages DROP CONSTRAINT IF EXISTS uniq_outbox_message;
+CREATE UNIQUE INDEX IF NOT EXISTS uniq_outbox_message_version
+    ON outbox_messages(queue_code, sched_date, digest, version);
+CREATE TABLE IF NOT EXISTS outbox (
+    id BIGSERIAL PRIMARY KEY,
+    message_id BIGINT NOT NULL REFERENCES outbox_messages(id) ON DELETE CASCADE,
+    chat_id BIGINT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    claimed_by TEXT,
+    claimed_until TIMESTAMPTZ,
+    delivered_at TIMESTAMPTZ,
+    failed BOOLEAN NOT NULL DEFAULT FALSE,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    CONSTRAINT uniq_outbox_delivery UNIQUE (message_id, chat_id)
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_pending ON outbox(id) WHERE delivered_at IS NULL;
+CREATE INDEX IF NOT EXISTS idx_outbox_delivered ON outbox(delivered_at) WHERE delivered_at IS NOT NULL;
+"""
+
+# person_accnt -> street/queue as last verified upstream, shared by all chats
+ACCOUNTS_SQL = """
+CREATE TABLE IF NOT EXISTS accounts (
+    person_accnt BIGINT PRIMARY KEY,
+    street TEXT NOT NULL,
+    queue_code TEXT,
+    verified_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+INSERT INTO accounts (person_accnt, street, queue_code, verified_at)
+SELECT DISTINCT ON (person_accnt) person_accnt, street, queue_code, COALESCE(updated_at, NOW())
+FROM subscriptions
+WHERE queue_code IS NOT NULL
+ORDER BY person_accnt, id DESC
+ON CONFLICT (person_accnt) DO NOTHING;
+"""
+
+# Every change of an indexed subscription column is sent to the in-process indexes
+SUBS_NOTIFY_SQL = """
+CREATE OR REPLACE FUNCTION notify_subscription_change() RETURNS trigger AS $$
+DECLARE
+    r subscriptions%ROWTYPE;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        r := OLD;
+    ELSE
+        r := NEW;
+    END IF;
+    PERFORM pg_notify('subscriptions_changed', json_build_object(
+        'op', TG_OP,
+        'id', r.id,
+        'street', r.street,
+        'chat_id', r.chat_id,
+        'person_accnt', r.person_accnt,
+        'queue_code', r.queue_code,
+        'enabled', r.enabled
+    )::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+DROP TRIGGER IF EXISTS trg_subscriptions_notify ON subscriptions;
+CREATE TRIGGER trg_subscriptions_notify
+AFTER INSERT OR DELETE OR UPDATE OF street, chat_id, person_accnt, queue_code, enabled ON subscriptions
+FOR EACH ROW EXECUTE FUNCTION notify_subscription_change();
+"""
+
+REMINDERS_SQL = """
+CREATE TABLE IF NOT EXISTS outage_reminders (
+    queue_code TEXT NOT NULL,
+    starts_at TIMESTAMPTZ NOT NULL,
+    sched_date DATE NOT NULL,
+    ends_at TIMESTAMPTZ NOT NULL,
+    fire_at TIMESTAMPTZ NOT NULL,
+    fired_at TIMESTAMPTZ,
+    PRIMARY KEY (queue_code, starts_at)
+);
+CREATE INDEX IF NOT EXISTS idx_reminders_pending ON outage_reminders(fire_at) WHERE fired_at IS NULL;
+"""
+
+# Serializes schema setup of replicas starting together; their trigger DDL
+# on subscriptions would otherwise deadlock
+INIT_LOCK_KEY = 7_315_420_001
+
 
 async def init_db() -> None:
     """Initialize PostgreSQL schema based on schema.py (adapted for Postgres).
 
     This function connects, creates all tables and indexes if missing, then closes.
+    Concurrent calls from several replicas run one after another.
     """
     conn = await asyncpg.connect(
         host=DB_HOST,
@@ -60,21 +204,123 @@ async def init_db() -> None:
     )
     try:
         async with conn.transaction():
+            await conn.execute("SELECT pg_advisory_xact_lock($1)", INIT_LOCK_KEY)
             await conn.execute(USERS_SQL)
             await conn.execute(SUBS_SQL)
+            await conn.execute(SUBS_NOTIFY_SQL)
+            await conn.execute(ACCOUNTS_SQL)
             await conn.execute(QUEUE_SCHEDULE_SQL)
+            await conn.execute(POLL_QUEUE_SQL)
+            await conn.execute(OUTBOX_SQL)
+            await conn.execute(REMINDERS_SQL)
     finally:
         await conn.close()
 
 
+@dataclass
+class PoolStats:
+    """Connection pool occupancy and time callers spent waiting for a connection."""
+
+    size: int = 0
+    idle: int = 0
+    max_size: int = 0
+    waiting: int = 0
+    acquires: int = 0
+    wait_seconds: float = 0.0
+    queries: int = 0
+
+
+_STATS = PoolStats()
+
+
+class _TimedAcquire:
+    """Wrap a pool acquire context, recording how long the caller waited."""
+
+    __slots__ = ("_ctx",)
+
+    def __init__(self, ctx) -> None:
+        self._ctx = ctx
+
+    async def __aenter__(self) -> asyncpg.Connection:
+        _STATS.waiting += 1
+        started = time.perf_counter()
+        try:
+            return await self._ctx.__aenter__()
+        finally:
+            _STATS.waiting -= 1
+            _STATS.acquires += 1
+            _STATS.wait_seconds += time.perf_counter() - started
+
+    async def __aexit__(self, *exc) -> None:
+        await self._ctx.__aexit__(*exc)
+
+    def __await__(self):
+        return self._ctx.__await__()
+
+
+class _TimedPool:
+    """asyncpg pool whose `acquire()` is timed; everything else is delegated."""
+
+    def __init__(self, pool: asyncpg.Pool) -> None:
+        self._pool = pool
+
+    def acquire(self, *, timeout: Optional[float] = None) -> _TimedAcquire:
+        return _TimedAcquire(self._pool.acquire(timeout=timeout))
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._pool, name)
+
+
 # Connection pool for queries
-_POOL: Optional[asyncpg.Pool] = None
+_POOL: Optional[_TimedPool] = None
+
+
+def _json_encode(value: Any) -> str:
+    return orjson.dumps(value).decode("utf-8")
+
+
+# Per-task query tally; asyncpg runs query loggers in the context of the querying task
+_QUERY_SCOPE: ContextVar[Optional[list[int]]] = ContextVar("query_scope", default=None)
+
+
+def _count_query(record: Any) -> None:
+    _STATS.queries += 1
+    scope = _QUERY_SCOPE.get()
+    if scope is not None:
+        scope[0] += 1
+
+
+@contextmanager
+def count_queries() -> Iterator[list[int]]:
+    """Count queries run by the current task and the tasks it starts.
+
+    Yields a one-element list holding the count. Query loggers run on the next
+    loop iteration, so yield to the loop once before reading the final value.
+    """
+    scope = [0]
+    token = _QUERY_SCOPE.set(scope)
+    try:
+        yield scope
+    finally:
+        _QUERY_SCOPE.reset(token)
+
+
+async def _init_connection(conn: asyncpg.Connection) -> None:
+    """Let json/jsonb columns travel as Python objects via orjson and count queries."""
+    conn.add_query_logger(_count_query)
+    for typename in ("json", "jsonb"):
+        await conn.set_type_codec(
+            typename,
+            encoder=_json_encode,
+            decoder=orjson.loads,
+            schema="pg_catalog",
+        )
 
 
 async def init_pool() -> None:
     global _POOL
     if _POOL is None:
-        _POOL = await asyncpg.create_pool(
+        pool = await asyncpg.create_pool(
             host=DB_HOST,
             port=DB_PORT,
             user=DB_USER,
@@ -82,7 +328,9 @@ async def init_pool() -> None:
             database=DB_NAME,
             min_size=1,
             max_size=10,
+            init=_init_connection,
         )
+        _POOL = _TimedPool(pool)
 
 
 def _pool() -> asyncpg.Pool:
@@ -96,6 +344,15 @@ def get_pool() -> asyncpg.Pool:
     return _pool()
 
 
+def pool_stats() -> PoolStats:
+    """Return pool size, idle connections, executed queries and accumulated acquire wait time."""
+    if _POOL is not None:
+        _STATS.size = _POOL.get_size()
+        _STATS.idle = _POOL.get_idle_size()
+        _STATS.max_size = _POOL.get_max_size()
+    return _STATS
+
+
 async def close_pool() -> None:
     global _POOL
     if _POOL is not None:
@@ -0,0 +1,183 @@
+from .database import _pool
+from .subscription_index import subscription_index
+from typing import Iterable
+from datetime import date
+import asyncpg
+
+# Delivery outcomes reported back by the sender workers
+DELIVERED = "delivered"
+REJECTED = "rejected"
+RETRY = "retry"
+
+
+async def enqueue_queue_notification(
+    conn: asyncpg.Connection,
+    queue_code: str,
+    sched_date: date,
+    digest: str,
+    text: str,
+    version: int = 0,
+) -> int:
+    """Queue `text` for every enabled subscriber of a queue, on the caller's connection.
+
+    Meant to run inside the caller's transaction. The message is stored once
+    and referenced by one outbox row per chat; (queue_code, sched_date,
+    digest, version) is unique, so repeating the call enqueues nothing new
+    and a delivered message is never rewritten. Schedule notifications pass
+    the schedule row's version, so a schedule returning to an earlier state
+    is announced again.
+    Subscribers come from the subscription index when it is loaded, otherwise
+    from the subscriptions table in the same statement.
+
+    Returns:
+        Number of newly enqueued deliveries.
+    """
+    if subscription_index.ready:
+        result = await conn.execute(
+            """
+            WITH msg AS (
+                INSERT INTO outbox_messages (queue_code, sched_date, digest, text, version)
+                VALUES ($1, $2, $3, $4, $6)
+                ON CONFLICT (queue_code, sched_date, digest, version) DO NOTHING
+                RETURNING id
+            )
+            INSERT INTO outbox (message_id, chat_id)
+            SELECT msg.id, c.chat_id
+            FROM msg
+            CROSS JOIN unnest($5::bigint[]) AS c(chat_id)
+            ON CONFLICT (message_id, chat_id) DO NOTHING
+            """,
+            queue_code,
+            sched_date,
+            digest,
+            text,
+            list(subscription_index.chats_for_queue(queue_code)),
+            version,
+        )
+        return int(result.split()[-1])
+
+    result = await conn.execute(
+        """
+        WITH msg AS (
+            INSERT INTO outbox_messages (queue_code, sched_date, digest, text, version)
+            VALUES ($1, $2, $3, $4, $5)
+            ON CONFLICT (queue_code, sched_date, digest, version) DO NOTHING
+            RETURNING id
+        )
+        INSERT INTO outbox (message_id, chat_id)
+        SELECT msg.id, s.chat_id
+        FROM msg
+        JOIN (
+            SELECT DISTINCT chat_id
+            FROM subscriptions
+            WHERE enabled = TRUE AND queue_code = $1
+        ) s ON TRUE
+        ON CONFLICT (message_id, chat_id) DO NOTHING
+        """,
+        queue_code,
+        sched_date,
+        digest,
+        text,
+        version,
+    )
+    return int(result.split()[-1])
+
+
+async def claim_outbox_batch(owner: str, limit: int, lease_sec: float) -> list[dict]:
+    """Lease up to `limit` undelivered notifications for one sender worker.
+
+    Rows are claimed with `FOR UPDATE SKIP LOCKED`, so workers in this and
+    other replicas never get the same row; a lease that expires before the
+    result is reported (crash, restart) makes the row claimable again.
+
+    Returns:
+        Rows with 'id', 'chat_id', 'text' and 'attempts'.
+    """
+    async with _pool().acquire() as conn:
+        rows = await conn.fetch(
+            """
+            WITH claimed AS (
+                UPDATE outbox o
+                SET claimed_by = $1,
+                    claimed_until = NOW() + make_interval(secs => $3),
+                    attempts = o.attempts + 1
+                WHERE o.id IN (
+                    SELECT id
+                    FROM outbox
+                    WHERE delivered_at IS NULL
+                      AND (claimed_until IS NULL OR claimed_until < NOW())
+                    ORDER BY id
+                    LIMIT $2
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING o.id, o.chat_id, o.message_id, o.attempts
+            )
+            SELECT c.id, c.chat_id, m.text, c.attempts
+            FROM claimed c
+            JOIN outbox_messages m ON m.id = c.message_id
+            ORDER BY c.id
+            """,
+            owner,
+            limit,
+            float(lease_sec),
+        )
+        return [dict(r) for r in rows]
+
+
+async def complete_outbox_batch(results: Iterable[tuple[int, str]], retry_after_sec: float) -> None:
+    """Record delivery outcomes of claimed rows in one statement.
+
+    Args:
+        results: Tuples of (outbox id, DELIVERED | REJECTED | RETRY).
+        retry_after_sec: Delay before a RETRY row becomes claimable again.
+    """
+    items = list(results)
+    if not items:
+        return
+    async with _pool().acquire() as conn:
+        await conn.execute(
+            """
+            UPDATE outbox o
+            SET delivered_at = CASE WHEN r.status = 'retry' THEN NULL ELSE NOW() END,
+                failed = (r.status = 'rejected'),
+                claimed_by = NULL,
+                claimed_until = CASE WHEN r.status = 'retry' THEN NOW() + make_interval(secs => $3) END
+            FROM unnest($1::bigint[], $2::text[]) AS r(id, status)
+            WHERE o.id = r.id
+            """,
+            [i for i, _ in items],
+            [status for _, status in items],
+            float(retry_after_sec),
+        )
+
+
+async def outbox_depth() -> int:
+    """Return the number of notifications waiting for delivery."""
+    async with _pool().acquire() as conn:
+        return int(await conn.fetchval("SELECT COUNT(*) FROM outbox WHERE delivered_at IS NULL"))
+
+
+async def purge_outbox(keep_days: int) -> int:
+    """Delete delivered notifications and orphaned messages older than `keep_days`.
+
+    Returns:
+        Number of deleted outbox rows.
+    """
+    async with _pool().acquire() as conn:
+        async with conn.transaction():
+            result = await conn.execute(
+                """
+                DELETE FROM outbox
+                WHERE delivered_at IS NOT NULL AND delivered_at < NOW() - make_interval(days => $1)
+                """,
+                keep_days,
+            )
+            await conn.execute(
+                """
+                DELETE FROM outbox_messages m
+                WHERE m.created_at < NOW() - make_interval(days => $1)
+                  AND NOT EXISTS (SELECT 1 FROM outbox o WHERE o.message_id = m.id)
+                """,
+                keep_days,
+            )
+        return int(result.split()[-1])
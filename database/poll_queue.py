@@ -0,0 +1,102 @@
+from .database import _pool
+from typing import Optional, Sequence
+from datetime import date, datetime
+
+
+async def claim_due_queues(owner: str, sched_dates: Sequence[date], limit: int, lease_sec: float) -> list[dict]:
+    """Lease up to `limit` due queues for this replica and return their stored digests per date.
+
+    Queues are claimed with `FOR UPDATE SKIP LOCKED`, so concurrent replicas
+    never receive the same queue, and a lease that is not released in time
+    (e.g. the replica died) makes the queue claimable again. A queue is due
+    when its next poll time has passed or its window last started on another
+    date and it has an enabled subscriber (checked through the partial
+    `idx_subs_queue_enabled` index). Queues are added to `poll_queue` by a
+    trigger on subscriptions, so a new queue is due on the next claim.
+
+    Args:
+        owner: Unique identifier of the claiming replica.
+        sched_dates: Dates whose schedules are polled, the first being the start of the window.
+        limit: Maximum number of queues to claim.
+        lease_sec: Lease duration in seconds.
+    Returns:
+        One row per claimed queue and date with 'queue_code', 'sched_date',
+        'interval_sec', 'digest' and 'legacy_payload'.
+    """
+    dates = list(sched_dates)
+    async with _pool().acquire() as conn:
+        rows = await conn.fetch(
+            """
+            WITH claimed AS (
+                UPDATE poll_queue p
+                SET lease_owner = $1, lease_until = NOW() + make_interval(secs => $4)
+                WHERE p.queue_code IN (
+                    SELECT queue_code
+                    FROM poll_queue
+                    WHERE (next_due_at <= NOW() OR sched_date IS DISTINCT FROM $2)
+                      AND (lease_until IS NULL OR lease_until < NOW())
+                      AND EXISTS (
+                          SELECT 1 FROM subscriptions s
+                          WHERE s.queue_code = poll_queue.queue_code AND s.enabled
+                      )
+                    ORDER BY next_due_at
+                    LIMIT $3
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING p.queue_code, p.interval_sec, p.sched_date
+            )
+            SELECT c.queue_code,
+                   d.sched_date,
+                   CASE WHEN c.sched_date = $2 THEN c.interval_sec END AS interval_sec,
+                   qs.digest,
+                   CASE WHEN qs.digest IS NULL THEN qs.payload END AS legacy_payload
+            FROM claimed c
+            CROSS JOIN unnest($5::date[]) AS d(sched_date)
+            LEFT JOIN queue_schedule qs
+              ON qs.queue_code = c.queue_code AND qs.sched_date = d.sched_date
+            ORDER BY c.queue_code, d.sched_date
+            """,
+            owner,
+            dates[0],
+            limit,
+            float(lease_sec),
+            dates,
+        )
+        return [dict(r) for r in rows]
+
+
+async def complete_queues(
+    owner: str,
+    sched_date: date,
+    results: list[tuple[str, Optional[float], datetime]],
+) -> int:
+    """Release leases of polled queues and store when each is due again.
+
+    Args:
+        owner: Replica identifier used when claiming.
+        sched_date: First date of the polled window.
+        results: Tuples of (queue code, new interval in seconds, next due time).
+    Returns:
+        Number of queues released; leases taken over by another replica are skipped.
+    """
+    if not results:
+        return 0
+    async with _pool().acquire() as conn:
+        result = await conn.execute(
+            """
+            UPDATE poll_queue p
+            SET interval_sec = r.interval_sec,
+                next_due_at = r.next_due_at,
+                sched_date = $2,
+                lease_owner = NULL,
+                lease_until = NULL
+            FROM unnest($3::text[], $4::float8[], $5::timestamptz[]) AS r(queue_code, interval_sec, next_due_at)
+            WHERE p.queue_code = r.queue_code AND p.lease_owner = $1
+            """,
+            owner,
+            sched_date,
+            [r[0] for r in results],
+            [r[1] for r in results],
+            [r[2] for r in results],
+        )
+        return int(result.split()[-1])
@@ -1,43 +1,107 @@
 from .database import _pool
-from typing import Dict, Any
-from datetime import date
-import json
+from .outbox import enqueue_queue_notification
+from .reminders import replace_outage_reminders
+from config import REMINDER_LEAD_MIN
+from typing import Callable, Dict, Any, Iterable, Optional, Tuple
+from datetime import date, datetime
 
-async def upsert_fetch_schedule(queue_code: str, sched_date: date, payload: Dict[str, Any]) -> None:
-    """Insert or update full schedule JSON (including aData/aState) for queue/date."""
+async def upsert_fetch_schedule(
+    queue_code: str,
+    sched_date: date,
+    payload: Dict[str, Any],
+    digest: str,
+    build_notification: Optional[Callable[[Optional[Dict[str, Any]]], Optional[str]]] = None,
+    outages: Optional[Iterable[Tuple[datetime, datetime]]] = None,
+) -> bool:
+    """Insert or update full schedule JSON (including aData/aState) and its digest for queue/date.
+
+    The row is only written when the digest differs, so when replicas race on
+    the same change exactly one of them sees True. Every write bumps the row's
+    version, which keys the outbox message of that change. When the schedule changed,
+    `build_notification` is called with the previously stored payload (None for
+    a new row) and the text it returns is enqueued in the outbox for every
+    enabled subscriber within the same transaction; returning None sends nothing.
+    When `outages` is given, the pending pre-outage reminders of the queue/date
+    are replaced with one per (start, end) in the same transaction.
+
+    Returns:
+        True if the stored schedule changed.
+    """
+    async with _pool().acquire() as conn, conn.transaction():
+        # Lock the old payload in its own statement: a CTE next to the upsert
+        # skips the row the upsert modifies and would always return NULL
+        previous = await conn.fetchval(
+            """
+            SELECT payload
+            FROM queue_schedule
+            WHERE queue_code = $1 AND sched_date = $2
+            FOR UPDATE
+            """,
+            queue_code,
+            sched_date,
+        )
+        version = await conn.fetchval(
+            """
+            INSERT INTO queue_schedule (queue_code, sched_date, payload, digest, version)
+            VALUES ($1, $2, $3, $4, 1)
+            ON CONFLICT (queue_code, sched_date)
+            DO UPDATE SET payload=EXCLUDED.payload, digest=EXCLUDED.digest, version=queue_schedule.version + 1,
+                          updated_at=(NOW() AT TIME ZONE 'Europe/Kyiv')
+            WHERE queue_schedule.digest IS DISTINCT FROM EXCLUDED.digest
+            RETURNING version
+            """,
+            queue_code,
+            sched_date,
+            payload,
+            digest,
+        )
+        changed = version is not None
+        if changed and build_notification is not None:
+            text = build_notification(previous)
+            if text:
+                await enqueue_queue_notification(conn, queue_code, sched_date, digest, text, version)
+        if changed and outages is not None and REMINDER_LEAD_MIN > 0:
+            await replace_outage_reminders(conn, queue_code, sched_date, outages, REMINDER_LEAD_MIN * 60)
+        return changed
+
+
+async def set_schedule_digest(queue_code: str, sched_date: date, digest: str) -> None:
+    """Store the digest of a legacy row written before digests were kept.
+
+    Only rows without a digest are touched, so the claim stops returning
+    their full payload once the digest is known.
+    """
     async with _pool().acquire() as conn:
-        payload_json = json.dumps(payload, ensure_ascii=False)
         await conn.execute(
             """
-            INSERT INTO queue_schedule (queue_code, sched_date, payload)
-            VALUES ($1, $2, $3::jsonb)
-            ON CONFLICT (queue_code, sched_date)
-            DO UPDATE SET payload=EXCLUDED.payload, updated_at=(NOW() AT TIME ZONE 'Europe/Kyiv')
+            UPDATE queue_schedule
+            SET digest = $3
+            WHERE queue_code = $1 AND sched_date = $2 AND digest IS NULL
             """,
             queue_code,
             sched_date,
-            payload_json,
+            digest,
         )
 
-async def list_queues_with_payload_for_date(sched_date: date) -> list[dict]:
-    """Return queue codes and any existing full schedule JSON for the date."""
+
+async def get_queue_schedules(keys: Iterable[Tuple[str, date]]) -> list[dict]:
+    """Load stored schedules for several (queue_code, sched_date) pairs in one query.
+
+    Returns:
+        Rows with 'queue_code', 'sched_date', 'digest' and 'payload' for the pairs that exist.
+    """
+    items = list(keys)
+    if not items:
+        return []
     async with _pool().acquire() as conn:
         rows = await conn.fetch(
             """
-            WITH q AS (
-                SELECT DISTINCT queue_code
-                FROM subscriptions
-                WHERE queue_code IS NOT NULL AND LENGTH(queue_code) > 0
-            )
-            SELECT q.queue_code, qs.payload
-            FROM q
-            LEFT JOIN queue_schedule qs
-              ON qs.queue_code = q.queue_code AND qs.sched_date = $1
-            ORDER BY q.queue_code
+            SELECT q.queue_code, q.sched_date, q.digest, q.payload
+            FROM queue_schedule q
+            JOIN unnest($1::text[], $2::date[]) AS k(queue_code, sched_date)
+              ON q.queue_code = k.queue_code AND q.sched_date = k.sched_date
             """,
-            sched_date,
+            [code for code, _ in items],
+            [d for _, d in items],
         )
-        out: list[dict] = []
-        for r in rows:
-            out.append({"queue_code": r["queue_code"], "payload": r["payload"]})
-        return out
\ No newline at end of file
+        return [dict(r) for r in rows]
@@ -0,0 +1,122 @@
+from .database import _pool
+from .outbox import enqueue_queue_notification
+from typing import Callable, Dict, Any, Iterable, Optional, Tuple
+from datetime import date, datetime
+import asyncpg
+
+
+async def replace_outage_reminders(
+    conn: asyncpg.Connection,
+    queue_code: str,
+    sched_date: date,
+    outages: Iterable[Tuple[datetime, datetime]],
+    lead_sec: float,
+) -> None:
+    """Replace the pending reminders of a queue/date with one per outage, on the caller's connection.
+
+    Meant to run inside the transaction that stores the schedule. Reminders
+    that already fired are kept, so a changed schedule never repeats one for
+    the same outage start; pending ones whose outage disappeared are removed.
+
+    Args:
+        conn: Connection with an open transaction.
+        queue_code: Queue identifier.
+        sched_date: Date of the schedule.
+        outages: (start, end) of every outage starting on that date.
+        lead_sec: Seconds before the start at which the reminder fires.
+    """
+    items = list(outages)
+    await conn.execute(
+        """
+        DELETE FROM outage_reminders
+        WHERE queue_code = $1 AND sched_date = $2 AND fired_at IS NULL
+          AND starts_at <> ALL($3::timestamptz[])
+        """,
+        queue_code,
+        sched_date,
+        [start for start, _ in items],
+    )
+    if not items:
+        return
+    await conn.execute(
+        """
+        INSERT INTO outage_reminders (queue_code, starts_at, sched_date, ends_at, fire_at)
+        SELECT $1, o.starts_at, $2, o.ends_at, o.starts_at - make_interval(secs => $5)
+        FROM unnest($3::timestamptz[], $4::timestamptz[]) AS o(starts_at, ends_at)
+        ON CONFLICT (queue_code, starts_at)
+        DO UPDATE SET sched_date = EXCLUDED.sched_date, ends_at = EXCLUDED.ends_at, fire_at = EXCLUDED.fire_at
+        WHERE outage_reminders.fired_at IS NULL
+        """,
+        queue_code,
+        sched_date,
+        [start for start, _ in items],
+        [end for _, end in items],
+        float(lead_sec),
+    )
+
+
+async def pending_reminders(until: datetime) -> list[dict]:
+    """Return the reminders that have not fired and are due before `until`.
+
+    Returns:
+        Rows with 'queue_code', 'starts_at', 'ends_at' and 'fire_at'.
+    """
+    async with _pool().acquire() as conn:
+        rows = await conn.fetch(
+            """
+            SELECT queue_code, starts_at, ends_at, fire_at
+            FROM outage_reminders
+            WHERE fired_at IS NULL AND fire_at <= $1
+            ORDER BY fire_at
+            """,
+            until,
+        )
+        return [dict(r) for r in rows]
+
+
+async def fire_outage_reminder(
+    queue_code: str,
+    starts_at: datetime,
+    fire_at: datetime,
+    build_text: Callable[[Dict[str, Any]], Optional[str]],
+) -> int:
+    """Mark a reminder fired and enqueue it for every enabled subscriber of the queue.
+
+    The reminder is claimed only if it is still pending with the same
+    `fire_at`, so replicas racing on it, or a timer left over from an older
+    schedule, enqueue nothing. `build_text` receives the claimed row and may
+    return None to drop a reminder that is no longer useful.
+
+    Returns:
+        Number of enqueued deliveries.
+    """
+    async with _pool().acquire() as conn, conn.transaction():
+        row = await conn.fetchrow(
+            """
+            UPDATE outage_reminders
+            SET fired_at = NOW()
+            WHERE queue_code = $1 AND starts_at = $2 AND fire_at = $3 AND fired_at IS NULL
+            RETURNING queue_code, sched_date, starts_at, ends_at
+            """,
+            queue_code,
+            starts_at,
+            fire_at,
+        )
+        if row is None:
+            return 0
+        text = build_text(dict(row))
+        if not text:
+            return 0
+        digest = f"remind:{row['starts_at'].isoformat()}"
+        return await enqueue_queue_notification(conn, queue_code, row["sched_date"], digest, text)
+
+
+async def purge_outage_reminders(before: datetime) -> int:
+    """Delete reminders of outages that ended before `before`.
+
+    Returns:
+        Number of deleted rows.
+    """
+    async with _pool().acquire() as conn:
+        result = await conn.execute("DELETE FROM outage_reminders WHERE ends_at < $1", before)
+        return int(result.split()[-1])
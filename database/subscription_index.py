@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import sys
+from typing import Any, Dict, Iterable, List, Mapping, NamedTuple, Optional
+
+import asyncpg
+import orjson
+
+from config import DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD
+
+logger = logging.getLogger(__name__)
+
+# Channel the subscriptions trigger notifies on (see SUBS_NOTIFY_SQL)
+CHANNEL = "subscriptions_changed"
+RECONNECT_SEC = 5.0
+
+INDEX_COLUMNS = "id, street, chat_id, person_accnt, queue_code, enabled"
+
+
+class _Sub(NamedTuple):
+    id: int
+    street: str
+    chat_id: int
+    person_accnt: int
+    queue_code: Optional[str]
+    enabled: bool
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    # Streets and queue codes repeat across subscriptions; keep one copy of each
+    return sys.intern(value) if value is not None else None
+
+
+class SubscriptionIndex:
+    """In-process copy of the subscriptions table for lookups without the database.
+
+    Holds the columns the handlers read (`INDEX_COLUMNS`); per-request state
+    such as `last_payload` and the hourly counters stays in the database.
+    Three lookups are served: by id, by chat and, for each queue, the set of
+    chats with an enabled subscription. Rows are applied whole, so changes
+    arriving in commit order converge to the table's state.
+    """
+
+    def __init__(self) -> None:
+        self.ready = False
+        self._by_id: Dict[int, _Sub] = {}
+        self._by_chat: Dict[int, List[int]] = {}
+        self._enabled_by_queue: Dict[str, Dict[int, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def load(self, rows: Iterable[Mapping[str, Any]]) -> None:
+        """Replace the contents with a full snapshot of the table."""
+        self._by_id.clear()
+        self._by_chat.clear()
+        self._enabled_by_queue.clear()
+        for row in rows:
+            self._add(self._make(row))
+
+    @staticmethod
+    def _make(row: Mapping[str, Any]) -> _Sub:
+        return _Sub(
+            int(row["id"]),
+            _intern(row["street"]) or "",
+            int(row["chat_id"]),
+            int(row["person_accnt"]),
+            _intern(row["queue_code"]),
+            bool(row["enabled"]),
+        )
+
+    def _add(self, sub: _Sub) -> None:
+        self._by_id[sub.id] = sub
+        ids = self._by_chat.setdefault(sub.chat_id, [])
+        ids.append(sub.id)
+        if len(ids) > 1 and ids[-2] > sub.id:
+            ids.sort()
+        if sub.enabled and sub.queue_code:
+            chats = self._enabled_by_queue.setdefault(sub.queue_code, {})
+            chats[sub.chat_id] = chats.get(sub.chat_id, 0) + 1
+
+    def _remove(self, sub_id: int) -> None:
+        sub = self._by_id.pop(sub_id, None)
+        if sub is None:
+            return
+        ids = self._by_chat.get(sub.chat_id)
+        if ids is not None:
+            ids.remove(sub.id)
+            if not ids:
+                del self._by_chat[sub.chat_id]
+        if sub.enabled and sub.queue_code:
+            chats = self._enabled_by_queue[sub.queue_code]
+            chats[sub.chat_id] -= 1
+            if not chats[sub.chat_id]:
+                del chats[sub.chat_id]
+                if not chats:
+                    del self._enabled_by_queue[sub.queue_code]
+
+    def upsert(self, row: Mapping[str, Any]) -> None:
+        """Insert a row or replace the stored one with the same id."""
+        sub = self._make(row)
+        if self._by_id.get(sub.id) == sub:
+            return
+        self._remove(sub.id)
+        self._add(sub)
+
+    def delete(self, sub_id: int) -> None:
+        """Drop a row by id; unknown ids are ignored."""
+        self._remove(sub_id)
+
+    def apply(self, change: Mapping[str, Any]) -> None:
+        """Apply a change notification ({'op': 'INSERT' | 'UPDATE' | 'DELETE', ...row})."""
+        if change.get("op") == "DELETE":
+            self.delete(int(change["id"]))
+        else:
+            self.upsert(change)
+
+    def get(self, sub_id: int) -> Optional[dict]:
+        sub = self._by_id.get(sub_id)
+        return sub._asdict() if sub is not None else None
+
+    def for_chat(self, chat_id: int) -> list[dict]:
+        """Return the subscriptions of a chat ordered by id."""
+        return [self._by_id[i]._asdict() for i in self._by_chat.get(chat_id, ())]
+
+    def chats_for_queue(self, queue_code: str) -> frozenset[int]:
+        """Return the chats with at least one enabled subscription to a queue."""
+        return frozenset(self._enabled_by_queue.get(queue_code, ()))
+
+    def memory_bytes(self) -> int:
+        """Approximate memory held by the index structures (shared strings excluded)."""
+        size = sys.getsizeof(self._by_id) + sys.getsizeof(self._by_chat) + sys.getsizeof(self._enabled_by_queue)
+        size += sum(sys.getsizeof(s) for s in self._by_id.values())
+        size += sum(sys.getsizeof(ids) for ids in self._by_chat.values())
+        size += sum(sys.getsizeof(chats) for chats in self._enabled_by_queue.values())
+        return size
+
+
+subscription_index = SubscriptionIndex()
+
+
+async def run_subscription_index(index: SubscriptionIndex = subscription_index) -> None:
+    """Keep `index` loaded and current until cancelled.
+
+    Listens on CHANNEL on a dedicated connection before loading the snapshot,
+    so no change committed in between is lost. While the connection is down
+    the index is marked not ready and readers fall back to the database; it is
+    reloaded after reconnecting.
+    """
+    while True:
+        conn: Optional[asyncpg.Connection] = None
+        closed = asyncio.Event()
+        try:
+            conn = await asyncpg.connect(
+                host=DB_HOST,
+                port=DB_PORT,
+                user=DB_USER,
+                password=DB_PASSWORD,
+                database=DB_NAME,
+            )
+            conn.add_termination_listener(lambda _conn: closed.set())
+
+            def on_change(_conn, _pid, _channel, payload: str) -> None:
+                try:
+                    index.apply(orjson.loads(payload))
+                except Exception:
+                    logger.exception("Bad subscription change notification: %s", payload)
+
+            await conn.add_listener(CHANNEL, on_change)
+            rows = await conn.fetch(f"SELECT {INDEX_COLUMNS} FROM subscriptions")
+            index.load(rows)
+            index.ready = True
+            logger.info("Subscription index loaded: %d subscriptions", len(index))
+            await closed.wait()
+            logger.warning("Subscription index connection lost, reloading")
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Subscription index failed")
+        finally:
+            index.ready = False
+            if conn is not None and not conn.is_closed():
+                await conn.close()
+        await asyncio.sleep(RECONNECT_SEC)
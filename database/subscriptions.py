@@ -1,183 +1,199 @@
-from typing import Optional
-import json
-import asyncpg
-from datetime import datetime, timezone, timedelta
+from typing import Optional, Tuple
 from database import get_pool
+from .subscription_index import INDEX_COLUMNS, subscription_index
 
 
-async def add_subscription(name: str, chat_id: int, person_accnt: int, queue_code: str) -> Optional[int]:
-    """Add a new subscription for a chat and personal account.
+async def list_subscriptions(chat_id: int) -> list[dict]:
+    """List all subscriptions for a given chat.
 
-    Args:
-        name: Name of the subscription.
-        chat_id: Telegram chat ID.
-        person_accnt: Personal account identifier string.
-    Returns:
-        The ID of the newly created subscription, or None if it already exists.
-    """
-    
-    async with get_pool().acquire() as conn:
-        try:
-            result = await conn.fetchrow(
-                """
-                INSERT INTO subscriptions (street, chat_id, person_accnt, queue_code)
-                VALUES ($1, $2, $3, $4)
-                RETURNING id;
-                """,
-                name,
-                chat_id,
-                person_accnt,
-                queue_code,
-            )
-            return result["id"] if result else None
-        except asyncpg.UniqueViolationError:
-            return None
-        
-async def remove_subscription(chat_id: int, sub_id: int) -> bool:
-    """Remove a subscription for a chat and personal account.
+    Served from the subscription index once it is loaded; the index holds
+    only `INDEX_COLUMNS`.
 
     Args:
         chat_id: Telegram chat ID.
-        sub_id: Subscription ID.
     Returns:
-        True if a subscription was deleted, False otherwise.
+        List of subscription records.
     """
+    if subscription_index.ready:
+        return subscription_index.for_chat(chat_id)
     async with get_pool().acquire() as conn:
-        result = await conn.execute(
-            """
-            DELETE FROM subscriptions
-            WHERE chat_id = $1 AND id = $2;
+        result = await conn.fetch(
+            f"""
+            SELECT {INDEX_COLUMNS} FROM subscriptions
+            WHERE chat_id = $1
+            ORDER BY id;
             """,
             chat_id,
-            sub_id,
         )
-        return result.endswith("1")  # "DELETE 1" indicates one row deleted
+        return [dict(record) for record in result]
+    
 
+async def get_chat_subscription(chat_id: int, sub_id: int) -> Optional[dict]:
+    """Get a subscription by ID if it belongs to the chat.
 
-async def list_subscriptions(chat_id: int) -> list[dict]:
-    """List all subscriptions for a given chat.
+    Served from the subscription index once it is loaded.
 
     Args:
         chat_id: Telegram chat ID.
+        sub_id: Subscription ID.
     Returns:
-        List of subscription records.
+        Subscription record or None if the chat has no such subscription.
     """
+    if subscription_index.ready:
+        sub = subscription_index.get(sub_id)
+        return sub if sub is not None and sub["chat_id"] == chat_id else None
     async with get_pool().acquire() as conn:
-        result = await conn.fetch(
-            """
-            SELECT * FROM subscriptions
-            WHERE chat_id = $1;
+        result = await conn.fetchrow(
+            f"""
+            SELECT {INDEX_COLUMNS} FROM subscriptions
+            WHERE id = $1 AND chat_id = $2;
             """,
+            sub_id,
             chat_id,
         )
-        return [dict(record) for record in result]
-    
+        return dict(result) if result else None
+
 
-async def set_subscription_enabled(chat_id: int, sub_id: int, enabled: bool) -> bool:
-    """Enable or disable a subscription by ID.
+async def toggle_subscription(chat_id: int, sub_id: int) -> Optional[dict]:
+    """Flip notifications of a chat's subscription in one statement.
 
     Args:
         chat_id: Telegram chat ID.
         sub_id: Subscription ID.
-        enabled: True to enable, False to disable.
+    Returns:
+        The updated subscription, or None if the chat has no such subscription.
     """
     async with get_pool().acquire() as conn:
-        result = await conn.execute(
-            """
+        result = await conn.fetchrow(
+            f"""
             UPDATE subscriptions
-            SET enabled = $1, updated_at = (NOW() AT TIME ZONE 'Europe/Kyiv')
-            WHERE id = $2 AND chat_id = $3;
+            SET enabled = NOT enabled, updated_at = (NOW() AT TIME ZONE 'Europe/Kyiv')
+            WHERE id = $1 AND chat_id = $2
+            RETURNING {INDEX_COLUMNS};
             """,
-            enabled,
             sub_id,
             chat_id,
         )
-        return result.endswith("1")  # "UPDATE 1" indicates one row updated
+        if result is None:
+            return None
+        subscription_index.upsert(result)
+        return dict(result)
 
-async def get_subscription_by_id(sub_id: int) -> Optional[asyncpg.Record]:
-    """Get a subscription by its ID.
+
+async def remove_subscription_and_list(chat_id: int, sub_id: int) -> Tuple[bool, list[dict]]:
+    """Delete a chat's subscription and return the chat's remaining ones in one statement.
 
     Args:
+        chat_id: Telegram chat ID.
         sub_id: Subscription ID.
     Returns:
-        Subscription record or None if not found.
+        A tuple of (whether a subscription was deleted, remaining subscriptions ordered by id).
     """
     async with get_pool().acquire() as conn:
-        return await conn.fetchrow(
-            """
-            SELECT * FROM subscriptions
-            WHERE id = $1;
+        result = await conn.fetchrow(
+            f"""
+            WITH d AS (
+                DELETE FROM subscriptions
+                WHERE chat_id = $1 AND id = $2
+                RETURNING id
+            )
+            SELECT (SELECT COUNT(*) FROM d) > 0 AS deleted,
+                   COALESCE(
+                       (SELECT jsonb_agg(to_jsonb(s) ORDER BY s.id)
+                        FROM (
+                            SELECT {INDEX_COLUMNS} FROM subscriptions
+                            WHERE chat_id = $1 AND id NOT IN (SELECT id FROM d)
+                        ) s),
+                       '[]'::jsonb
+                   ) AS remaining;
             """,
+            chat_id,
             sub_id,
         )
+        if result["deleted"]:
+            subscription_index.delete(sub_id)
+        return bool(result["deleted"]), list(result["remaining"])
     
-async def get_subscription_by_details(
+async def consume_fetch_quota(
     chat_id: int,
     person_accnt: int,
+    hourly_limit: int,
+    cache_sec: int,
 ) -> Optional[dict]:
-    """Get a subscription by its details.
+    """Atomically check and consume one upstream request of the hourly quota.
+
+    In a single statement the subscription row is locked, its stored payload
+    is returned if still fresh (no quota used), otherwise one request is
+    counted when the hourly window allows it. Concurrent presses are
+    serialized by the row lock, so the limit cannot be overrun.
 
     Args:
         chat_id: Telegram chat ID.
-        person_accnt: Personal account identifier string.
+        person_accnt: Personal account identifier.
+        hourly_limit: Maximum upstream requests per hour for the subscription.
+        cache_sec: Age in seconds up to which the stored payload is served.
     Returns:
-        Subscription record or None if not found.
+        None if there is no such subscription, otherwise a dict with 'id',
+        'allowed', 'hour_reset_at' and 'last_payload' (set only when fresh).
     """
     async with get_pool().acquire() as conn:
         result = await conn.fetchrow(
             """
-            SELECT * FROM subscriptions
-            WHERE chat_id = $1 AND person_accnt = $2;
+            WITH s AS (
+                SELECT id,
+                       hour_count,
+                       hour_reset_at,
+                       last_payload,
+                       (last_payload IS NOT NULL
+                        AND updated_at > (NOW() AT TIME ZONE 'Europe/Kyiv') - make_interval(secs => $4)) AS fresh,
+                       (hour_reset_at IS NULL OR hour_reset_at <= NOW()) AS expired
+                FROM subscriptions
+                WHERE chat_id = $1 AND person_accnt = $2
+                ORDER BY id
+                LIMIT 1
+                FOR UPDATE
+            ),
+            u AS (
+                UPDATE subscriptions t
+                SET hour_count = CASE WHEN s.expired THEN 1 ELSE t.hour_count + 1 END,
+                    hour_reset_at = CASE WHEN s.expired THEN NOW() + INTERVAL '1 hour' ELSE t.hour_reset_at END
+                FROM s
+                WHERE t.id = s.id AND NOT s.fresh AND (s.expired OR s.hour_count < $3)
+                RETURNING t.id, t.hour_reset_at
+            )
+            SELECT s.id,
+                   (u.id IS NOT NULL) AS allowed,
+                   COALESCE(u.hour_reset_at, s.hour_reset_at) AS hour_reset_at,
+                   CASE WHEN s.fresh THEN s.last_payload END AS last_payload
+            FROM s
+            LEFT JOIN u ON u.id = s.id
             """,
             chat_id,
             person_accnt,
+            hourly_limit,
+            float(cache_sec),
         )
         return dict(result) if result else None
-    
+
+
 async def update_subscription_payload(
     sub_id: int,
-    hour_count: int,
-    hour_reset_at: datetime,
     payload: Optional[list[dict]],
 ) -> bool:
     """Update the last payload of a subscription.
 
     Args:
         sub_id: Subscription ID.
-        hour_count: Number of requests made in the current hour.
-        hour_reset_at: Datetime when the hourly count resets.
         payload: New payload JSON payload (full dict from API).
     """
     async with get_pool().acquire() as conn:
-        payload_str = json.dumps(payload, ensure_ascii=False)
         result = await conn.execute(
             """
             UPDATE subscriptions
-            SET last_payload = ($1::jsonb), hour_count = $2, hour_reset_at = $3, updated_at = (NOW() AT TIME ZONE 'Europe/Kyiv')
-            WHERE id = $4;
+            SET last_payload = $1, updated_at = (NOW() AT TIME ZONE 'Europe/Kyiv')
+            WHERE id = $2;
             """,
-            payload_str,
-            hour_count,
-            hour_reset_at,
+            payload,
             sub_id,
         )
         return result.endswith("1")  # "UPDATE 1" indicates one row updated
-
-async def list_chat_ids_by_queue(queue_code: str) -> list[int]:
-    """Return distinct chat IDs subscribed to a queue (enabled only)."""
-    async with get_pool().acquire() as conn:
-        rows = await conn.fetch(
-            """
-            SELECT DISTINCT chat_id
-            FROM subscriptions
-            WHERE enabled = TRUE AND queue_code = $1
-            """,
-            queue_code,
-        )
-        out: list[int] = []
-        for r in rows:
-            try:
-                out.append(int(r["chat_id"]))
-            except Exception:
-                pass
-        return out
\ No newline at end of file
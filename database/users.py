@@ -35,25 +35,3 @@ async def add_user(
             language_code,
             is_bot,
         )
-
-async def check_subscription_limit(chat_id: int) -> bool:
-    """Check if the user has reached the maximum number of street subscriptions.
-
-    Args:
-        chat_id: Telegram chat ID.
-    Returns:
-        True if the user can add more subscriptions, False if the limit is reached.
-    """
-    async with get_pool().acquire() as conn:
-        result = await conn.fetchrow(
-            "SELECT max_street_subscriptions FROM users WHERE chat_id = $1",
-            chat_id,
-        )
-        if result is None:
-            return False  # User not found, treat as limit reached
-        max_subs = result["max_street_subscriptions"]
-        count = await conn.fetchval(
-            "SELECT COUNT(*) FROM subscriptions WHERE chat_id = $1",
-            chat_id,
-        )
-        return count < max_subs
\ No newline at end of file
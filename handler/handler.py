@@ -1,18 +1,79 @@
 """Handler for main menu button presses and manual checks."""
 
-import aiohttp
 from aiogram import Router
 from aiogram import types, F
 from aiogram.filters import StateFilter
 from aiogram.fsm.context import FSMContext
 
+import asyncio
+import time
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from config import CHECK_CONCURRENCY
 from database import list_subscriptions
-from keyboards import cancel_kb, subs_inline, main_menu
+from keyboards import CHECK_PAGE_PREFIX, NOW_TEXT, cancel_kb, subs_inline, main_menu, pages_inline
 from states import AddStreet
-from utils import format_entries, try_fetch_with_limits
+from utils import format_entries, try_fetch_with_limits, queue_status, describe_status, paginate
 
 handler_router = Router(name="handler")
 
+# Pause between in-place edits of the progress message (Telegram allows ~1 per second per chat)
+PROGRESS_EDIT_SEC = 1.0
+
+
+async def _check_block(sem: asyncio.Semaphore, chat_id: int, idx: int, s: dict) -> tuple[int, str]:
+    """Check one subscription and render its part of the combined reply."""
+    header = f"О/р {s['person_accnt']},\n{s.get('street','')}"
+    async with sem:
+        data, limit_msg = await try_fetch_with_limits(chat_id, s["person_accnt"], is_poll=False)
+    if limit_msg:
+        return idx, f"{header}: {limit_msg}"
+    if not data:
+        return idx, f"{header}: не вдалося отримати дані"
+    return idx, f"{header}\n\n{format_entries(data)}"
+
+
+async def _check_all(message: types.Message, state: FSMContext, subs: list[dict]) -> None:
+    """Check all subscriptions concurrently and show the results in one message.
+
+    A progress message is sent first and edited in place as results arrive,
+    in subscription order; the final text is split into pages that fit
+    Telegram's message limit, kept in the FSM data for the page buttons.
+    """
+    progress = await message.answer(f"⏳ Перевіряю записи: 0/{len(subs)}…")
+    sem = asyncio.Semaphore(max(1, CHECK_CONCURRENCY))
+    tasks = [asyncio.create_task(_check_block(sem, message.chat.id, i, s)) for i, s in enumerate(subs)]
+    blocks: list[str | None] = [None] * len(subs)
+    last_edit = 0.0
+    try:
+        for done, fut in enumerate(asyncio.as_completed(tasks), 1):
+            idx, block = await fut
+            blocks[idx] = block
+            if done < len(subs) and time.monotonic() - last_edit >= PROGRESS_EDIT_SEC:
+                ready = [b for b in blocks if b is not None]
+                text = paginate(ready)[0]
+                footer = f"\n\n⏳ Перевірено {done}/{len(subs)}…"
+                try:
+                    await progress.edit_text(text[:4096 - len(footer)] + footer)
+                except Exception:
+                    pass
+                last_edit = time.monotonic()
+    finally:
+        for t in tasks:
+            t.cancel()
+
+    pages = paginate([b or "" for b in blocks])
+    if len(pages) > 1:
+        await state.update_data(check_pages=pages)
+        markup = pages_inline(0, len(pages), CHECK_PAGE_PREFIX)
+    else:
+        markup = None
+    try:
+        await progress.edit_text(pages[0], reply_markup=markup)
+    except Exception:
+        await message.answer(pages[0], reply_markup=markup)
+
 @handler_router.message(F.text, StateFilter(None))
 async def on_menu(message: types.Message, state: FSMContext):
     """Handle main menu button presses and manual checks."""
@@ -33,20 +94,23 @@ async def on_menu(message: types.Message, state: FSMContext):
             await message.answer("Немає записів. Натисніть 'Додати адресу'.")
             return
         
-        async with aiohttp.ClientSession() as session:
-            for s in subs:
-                data, limit_msg = await try_fetch_with_limits(session, message.chat.id, s["person_accnt"], is_poll=False)
-                header = f"О/р {s['person_accnt']},\n{s.get('street','')}"
+        await _check_all(message, state, subs)
 
-                if limit_msg:
-                    await message.answer(f"{header}: {limit_msg}")
-                    continue
-
-                if not data:
-                    await message.answer(f"{header}: не вдалося отримати дані")
-                    continue
+    elif txt == NOW_TEXT:
+        subs = await list_subscriptions(message.chat.id)
+        if not subs:
+            await message.answer("Немає записів. Натисніть 'Додати адресу'.")
+            return
 
-                await message.answer(f"{header}\n\n{format_entries(data)}"[:4000])
+        now = datetime.now(ZoneInfo("Europe/Kyiv"))
+        statuses = await queue_status((s.get("queue_code") for s in subs), now)
+        lines = []
+        for s in subs:
+            status = statuses.get(s.get("queue_code") or "")
+            text = describe_status(status, now) if status else "❓ Черга невідома"
+            lines.append(f"О/р {s['person_accnt']}, {s.get('street','')} (черга {s.get('queue_code') or '?'}):\n{text}")
+        for page in paginate(lines):
+            await message.answer(page)
 
     else:
         await message.answer("Невідома команда. Використовуйте меню.", reply_markup=main_menu())
\ No newline at end of file
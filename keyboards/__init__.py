@@ -1,7 +1,10 @@
 from .keyboards import (
 	CANCEL_TEXT,
+	NOW_TEXT,
+	CHECK_PAGE_PREFIX,
 	main_menu,
 	subs_inline,
 	cancel_kb,
 	sub_actions_inline,
+	pages_inline,
 )
\ No newline at end of file
@@ -3,6 +3,8 @@
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
 
 CANCEL_TEXT = "Скасувати"
+NOW_TEXT = "Світло зараз є?"
+CHECK_PAGE_PREFIX = "checkpage"
 
 def cancel_kb() -> ReplyKeyboardMarkup:
     """Single-row keyboard with a Cancel button to abort a dialog."""
@@ -17,7 +19,7 @@ def main_menu() -> ReplyKeyboardMarkup:
     return ReplyKeyboardMarkup(
         keyboard=[
             [KeyboardButton(text="Додати адресу"), KeyboardButton(text="Мої дані")],
-            [KeyboardButton(text="Перевірити зараз")],
+            [KeyboardButton(text="Перевірити зараз"), KeyboardButton(text=NOW_TEXT)],
         ],
         resize_keyboard=True,
         one_time_keyboard=False,
@@ -52,4 +54,14 @@ def sub_actions_inline(sub: dict) -> InlineKeyboardMarkup:
             InlineKeyboardButton(text="⬅ Назад", callback_data="back_subs")
         ],
     ]
-    return InlineKeyboardMarkup(inline_keyboard=rows)
\ No newline at end of file
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+def pages_inline(page: int, total: int, prefix: str) -> InlineKeyboardMarkup:
+    """Previous/next buttons for a paginated message; callback data is '<prefix>:<page>'."""
+    row: list[InlineKeyboardButton] = []
+    if page > 0:
+        row.append(InlineKeyboardButton(text="◀️", callback_data=f"{prefix}:{page - 1}"))
+    row.append(InlineKeyboardButton(text=f"{page + 1}/{total}", callback_data="noop:0"))
+    if page < total - 1:
+        row.append(InlineKeyboardButton(text="▶️", callback_data=f"{prefix}:{page + 1}"))
+    return InlineKeyboardMarkup(inline_keyboard=[row])
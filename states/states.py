@@ -1,14 +1,21 @@
 """States handlers for aiogram FSM."""
 
-import aiohttp
+import asyncio
+
 from aiogram import types, Router
 from aiogram.fsm.state import StatesGroup, State
 from aiogram.fsm.context import FSMContext
 
+from config import ACCOUNT_MAX_AGE_DAYS
 from keyboards import CANCEL_TEXT, main_menu, cancel_kb
-from utils import try_fetch_with_limits
-from database import add_subscription, check_subscription_limit, add_user
-from utils import fetch_queue
+from database import (
+    ADDED,
+    EXISTS,
+    LIMIT,
+    add_known_account_subscription,
+    add_account_subscription,
+)
+from utils import fetch_queue, fetch_status
 
 states_router = Router(name="states")
 
@@ -30,18 +37,20 @@ async def process_person_account(message: types.Message, state: FSMContext):
         await message.reply("Особовий рахунок має бути числом, спробуйте ще раз.", reply_markup=cancel_kb())
         return
     
-    # Ensure user exists before enforcing subscription limits
-    await add_user(
+    # Registers the user, checks the limit and subscribes a known account in one round-trip
+    user = message.from_user
+    outcome, _ = await add_known_account_subscription(
         message.chat.id,
-        message.from_user.username if message.from_user else None,
-        message.from_user.first_name if message.from_user else None,
-        message.from_user.last_name if message.from_user else None,
-        message.from_user.language_code if message.from_user else None,
-        message.from_user.is_bot if message.from_user else False,
+        int(person_account),
+        ACCOUNT_MAX_AGE_DAYS,
+        user.username if user else None,
+        user.first_name if user else None,
+        user.last_name if user else None,
+        user.language_code if user else None,
+        user.is_bot if user else False,
     )
 
-    allowed = await check_subscription_limit(message.chat.id)
-    if not allowed:
+    if outcome == LIMIT:
         await message.answer(
             "Досягнуто ліміту кількості підписок.\n"
             "Видаліть деякі у розділі «Підписки», щоб додати нові.",
@@ -49,31 +58,45 @@ async def process_person_account(message: types.Message, state: FSMContext):
         )
         await state.clear()
         return
-    
-    async with aiohttp.ClientSession() as session:
 
-        _, limit_msg = await try_fetch_with_limits(session, message.chat.id, int(person_account), is_poll=False)
-        if limit_msg:
-            await message.reply(limit_msg, reply_markup=cancel_kb())
-            return
+    if outcome == EXISTS:
+        await message.answer("Такий запис вже існує або не вдалося зберегти.", reply_markup=main_menu())
+        await state.clear()
+        return
+
+    if outcome == ADDED:
+        await message.answer("Збережено та сповіщення увімкнено.", reply_markup=main_menu())
+        await state.clear()
+        return
+
+    # Unknown account: look it up upstream; the status request warms the cache for the first check
+    resp_queue, _ = await asyncio.gather(
+        fetch_queue(person_account), fetch_status(person_account), return_exceptions=True
+    )
+    if not isinstance(resp_queue, dict) or not resp_queue:
+        await message.reply("Не вдалося отримати інформацію про чергу. Спробуйте ще раз.", reply_markup=cancel_kb())
+        return
     
-        resp_queue = await fetch_queue(session, person_account)
-        if not resp_queue:
-            print(resp_queue)
-            await message.reply("Не вдалося отримати інформацію про чергу. Спробуйте ще раз.", reply_markup=cancel_kb())
-            return
-        
-        street = resp_queue.get("street")
-        queues = resp_queue.get("queues")
-        if street is None or queues is None:
-            await message.reply("Некоректна відповідь від сервера. Спробуйте ще раз.", reply_markup=cancel_kb())
-            return
+    street = resp_queue.get("street")
+    queues = resp_queue.get("queues")
+    if street is None or queues is None:
+        await message.reply("Некоректна відповідь від сервера. Спробуйте ще раз.", reply_markup=cancel_kb())
+        return
+
+    outcome, _ = await add_account_subscription(street, message.chat.id, int(person_account), queues)
+    if outcome == LIMIT:
+        await message.answer(
+            "Досягнуто ліміту кількості підписок.\n"
+            "Видаліть деякі у розділі «Підписки», щоб додати нові.",
+            reply_markup=main_menu()
+        )
+        await state.clear()
+        return
 
-    sub_id = await add_subscription(street, message.chat.id, int(person_account), queues)
-    if not sub_id:
+    if outcome == EXISTS:
         await message.answer("Такий запис вже існує або не вдалося зберегти.", reply_markup=main_menu())
         await state.clear()
         return
     
     await message.answer("Збережено та сповіщення увімкнено.", reply_markup=main_menu())
-    await state.clear()
\ No newline at end of file
+    await state.clear()
@@ -1,18 +1,77 @@
 from .utils import (
     format_entries,
     cb_chat_id,
+    paginate,
     format_daily_schedule,
+    schedule_digest,
+)
+from .client import (
+    init_http,
+    close_http,
+    get_session,
+    http_stats,
+)
+from .cache import (
+    TTLCache,
+    CacheStats,
 )
 from .request import (
     fetch_status,
     fetch_queue,
     fetch_schedule,
     extract_aData,
+    SingleFlight,
+    singleflight_stats,
+    status_cache,
+    queue_cache,
+    upstream_guard,
+    upstream_state,
+)
+from .guard import (
+    UpstreamGuard,
+    UpstreamError,
+    UpstreamUnavailable,
+    GuardState,
+    AdaptiveLimiter,
+    CircuitBreaker,
+)
+from .metrics import (
+    REGISTRY,
+    instrument_router,
+    start_metrics_server,
+)
+from .broadcast import (
+    Broadcaster,
+    TokenBucket,
+)
+from .scheduler import (
+    PollScheduler,
+)
+from .slots import (
+    DaySchedule,
+    ScheduleIndex,
+    SlotStatus,
+    schedule_index,
+    queue_status,
+    describe_status,
+    IntervalChange,
+    diff_schedules,
+    format_schedule_diff,
+    format_minute,
+)
+from .reminders import (
+    ReminderScheduler,
+    reminder_scheduler,
+    reminder_loop,
 )
 from .updates import (
     try_fetch_with_limits,
+    poll_tick,
     poll_loop,
 )
 from .log import (
     setup_logger,
-)
\ No newline at end of file
+)
+from .outbox import (
+    outbox_loop,
+)
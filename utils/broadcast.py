@@ -0,0 +1,169 @@
+"""Rate-limited concurrent delivery of bot messages to many chats."""
+
+import asyncio
+import logging
+import random
+import time
+from typing import Dict
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+
+from config import (
+    BROADCAST_RATE,
+    BROADCAST_CHAT_RATE,
+    BROADCAST_CONCURRENCY,
+    BROADCAST_RETRIES,
+)
+from utils.metrics import MESSAGES
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_LIMIT = 4000
+CHAT_BUCKET_IDLE_SEC = 60.0
+
+# Outcomes of a delivery attempt
+SENT = "sent"
+REJECTED = "rejected"  # permanent: bot blocked, chat not found, bad request
+FAILED = "failed"  # transient error persisted through all retries
+
+
+class TokenBucket:
+    """Asynchronous token bucket limiting how often an action may happen.
+
+    Args:
+        rate: Tokens added per second.
+        capacity: Maximum number of tokens (burst size).
+    """
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        """Wait until one token is available and consume it."""
+        async with self._lock:
+            while True:
+                self._refill(time.monotonic())
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def drain(self) -> None:
+        """Drop all accumulated tokens, e.g. after the server asked to slow down."""
+        self._refill(time.monotonic())
+        self._tokens = 0
+
+    def idle(self, now: float, idle_sec: float) -> bool:
+        """Return True if the bucket is full and unused for at least `idle_sec`."""
+        return now - self._updated >= idle_sec and not self._lock.locked()
+
+
+class Broadcaster:
+    """Deliver messages respecting Telegram's global and per-chat limits.
+
+    A single instance should be shared by everything that sends bulk messages,
+    so the global token bucket and the in-flight limit reflect the real
+    outgoing traffic of the bot.
+
+    Args:
+        bot: The aiogram Bot instance used for sending.
+        rate: Global messages per second.
+        chat_rate: Messages per second to the same chat.
+        concurrency: Maximum number of in-flight requests across all senders.
+        max_retries: Attempts after a transient failure or flood control before giving up.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        *,
+        rate: float = BROADCAST_RATE,
+        chat_rate: float = BROADCAST_CHAT_RATE,
+        concurrency: int = BROADCAST_CONCURRENCY,
+        max_retries: int = BROADCAST_RETRIES,
+    ) -> None:
+        self.bot = bot
+        self.concurrency = max(1, concurrency)
+        self._inflight = asyncio.Semaphore(self.concurrency)
+        self.max_retries = max(0, max_retries)
+        self._chat_rate = chat_rate
+        self._global = TokenBucket(rate, max(1.0, rate))
+        self._chats: Dict[int, TokenBucket] = {}
+        self._paused_until = 0.0
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) > 10_000:
+                now = time.monotonic()
+                for cid in [c for c, b in self._chats.items() if b.idle(now, CHAT_BUCKET_IDLE_SEC)]:
+                    del self._chats[cid]
+            bucket = TokenBucket(self._chat_rate, 1.0)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    async def _wait_pause(self) -> None:
+        delay = self._paused_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def deliver(self, chat_id: int, text: str) -> str:
+        """Send one message, waiting for rate limits and retrying transient errors.
+
+        Args:
+            chat_id: Target chat ID.
+            text: Message text (truncated to the Telegram limit).
+
+        Returns:
+            SENT, REJECTED for permanent failures, or FAILED when retries ran out.
+        """
+        attempt = 0
+        while True:
+            await self._wait_pause()
+            await self._chat_bucket(chat_id).acquire()
+            await self._global.acquire()
+            try:
+                async with self._inflight:
+                    await self.bot.send_message(chat_id=chat_id, text=text[:MESSAGE_LIMIT])
+                MESSAGES.labels(SENT).inc()
+                return SENT
+            except TelegramRetryAfter as ex:
+                MESSAGES.labels("throttled").inc()
+                # Flood control applies to the whole bot, so every sender backs off
+                self._paused_until = max(self._paused_until, time.monotonic() + ex.retry_after)
+                self._global.drain()
+                logger.warning("Flood control hit, pausing sends for %ss", ex.retry_after)
+                if attempt >= self.max_retries:
+                    MESSAGES.labels(FAILED).inc()
+                    return FAILED
+            except (TelegramForbiddenError, TelegramBadRequest) as ex:
+                logger.debug("Message to %s rejected: %s", chat_id, ex)
+                MESSAGES.labels(REJECTED).inc()
+                return REJECTED
+            except (TelegramNetworkError, TelegramServerError, asyncio.TimeoutError) as ex:
+                if attempt >= self.max_retries:
+                    logger.warning("Giving up on %s after %d retries: %s", chat_id, attempt, ex)
+                    MESSAGES.labels(FAILED).inc()
+                    return FAILED
+                await asyncio.sleep(min(30.0, 2 ** attempt) * (0.5 + random.random()))
+            except Exception as ex:
+                logger.warning("Unexpected error sending to %s: %s", chat_id, ex)
+                MESSAGES.labels(FAILED).inc()
+                return FAILED
+
+            attempt += 1
@@ -0,0 +1,95 @@
+"""Bounded in-process TTL + LRU cache for upstream lookups."""
+
+import orjson
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Generic, Hashable, Optional, Tuple, TypeVar
+
+V = TypeVar("V")
+
+
+@dataclass
+class CacheStats:
+    """Counters describing cache effectiveness."""
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    entries: int = 0
+    size_bytes: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+def _estimate_size(value: Any) -> int:
+    """Approximate memory cost of a JSON-like value by its serialized length."""
+    try:
+        return len(orjson.dumps(value, default=str)) + 64
+    except Exception:
+        return 1024
+
+
+class TTLCache(Generic[V]):
+    """Least-recently-used cache whose entries expire after `ttl` seconds.
+
+    Expired entries are kept until evicted so callers can still fall back to
+    the last known value when the source is unavailable.
+
+    Args:
+        ttl: Freshness period in seconds.
+        max_entries: Maximum number of stored keys.
+        max_bytes: Approximate memory cap for all stored values.
+    """
+
+    def __init__(self, ttl: float, max_entries: int, max_bytes: int) -> None:
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self.max_bytes = max(1, max_bytes)
+        self._data: "OrderedDict[Hashable, Tuple[float, int, V]]" = OrderedDict()
+        self._stats = CacheStats()
+
+    def get(self, key: Hashable) -> Optional[V]:
+        """Return a fresh value for `key` or None, updating hit/miss counters."""
+        item = self._data.get(key)
+        if item is None or time.monotonic() - item[0] >= self.ttl:
+            self._stats.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self._stats.hits += 1
+        return item[2]
+
+    def get_stale(self, key: Hashable) -> Optional[V]:
+        """Return the stored value for `key` regardless of its age."""
+        item = self._data.get(key)
+        return item[2] if item is not None else None
+
+    def set(self, key: Hashable, value: V) -> None:
+        """Store `value` under `key`, evicting least recently used entries as needed."""
+        size = _estimate_size(value)
+        old = self._data.pop(key, None)
+        if old is not None:
+            self._stats.size_bytes -= old[1]
+        if size > self.max_bytes:
+            return
+
+        self._data[key] = (time.monotonic(), size, value)
+        self._stats.size_bytes += size
+        while len(self._data) > self.max_entries or self._stats.size_bytes > self.max_bytes:
+            _, (_, evicted_size, _) = self._data.popitem(last=False)
+            self._stats.size_bytes -= evicted_size
+            self._stats.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        """Drop `key` from the cache if present."""
+        old = self._data.pop(key, None)
+        if old is not None:
+            self._stats.size_bytes -= old[1]
+
+    def stats(self) -> CacheStats:
+        """Return a snapshot of the cache counters."""
+        self._stats.entries = len(self._data)
+        return CacheStats(**vars(self._stats))
@@ -0,0 +1,84 @@
+"""Process-wide pooled HTTP client for the upstream API."""
+
+import aiohttp
+import orjson
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Optional
+
+from config import UPSTREAM_POOL_SIZE, UPSTREAM_TIMEOUT, UPSTREAM_CONNECT_TIMEOUT
+
+
+@dataclass
+class ConnectionStats:
+    """Counters describing how well upstream connections are reused."""
+
+    requests: int = 0
+    new_connections: int = 0
+    reused_connections: int = 0
+
+    @property
+    def reuse_ratio(self) -> float:
+        """Share of requests served over an already open connection."""
+        total = self.new_connections + self.reused_connections
+        return self.reused_connections / total if total else 0.0
+
+
+_SESSION: Optional[aiohttp.ClientSession] = None
+_STATS = ConnectionStats()
+
+
+async def _on_request_start(session, ctx: SimpleNamespace, params) -> None:
+    _STATS.requests += 1
+
+
+async def _on_connection_create_end(session, ctx: SimpleNamespace, params) -> None:
+    _STATS.new_connections += 1
+
+
+async def _on_connection_reuseconn(session, ctx: SimpleNamespace, params) -> None:
+    _STATS.reused_connections += 1
+
+
+async def init_http() -> None:
+    """Create the shared upstream session. Safe to call more than once."""
+    global _SESSION
+    if _SESSION is None or _SESSION.closed:
+        trace = aiohttp.TraceConfig()
+        trace.on_request_start.append(_on_request_start)
+        trace.on_connection_create_end.append(_on_connection_create_end)
+        trace.on_connection_reuseconn.append(_on_connection_reuseconn)
+
+        connector = aiohttp.TCPConnector(
+            limit=UPSTREAM_POOL_SIZE,
+            limit_per_host=UPSTREAM_POOL_SIZE,
+            ttl_dns_cache=300,
+            keepalive_timeout=60,
+            enable_cleanup_closed=True,
+        )
+        _SESSION = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=UPSTREAM_TIMEOUT, sock_connect=UPSTREAM_CONNECT_TIMEOUT),
+            headers={"Content-Type": "application/json"},
+            trace_configs=[trace],
+            json_serialize=lambda v: orjson.dumps(v).decode("utf-8"),
+        )
+
+
+def get_session() -> aiohttp.ClientSession:
+    """Public accessor for the shared upstream session. Ensure init_http() was called."""
+    if _SESSION is None or _SESSION.closed:
+        raise RuntimeError("HTTP client is not initialized. Call init_http() first.")
+    return _SESSION
+
+
+def http_stats() -> ConnectionStats:
+    """Return the live connection-reuse counters of the shared session."""
+    return _STATS
+
+
+async def close_http() -> None:
+    global _SESSION
+    if _SESSION is not None:
+        await _SESSION.close()
+        _SESSION = None
@@ -0,0 +1,280 @@
+"""Protection of callers and of the upstream API when it degrades.
+
+`UpstreamGuard` wraps each upstream request with an adaptive concurrency
+limit (AIMD driven by latency), a circuit breaker that fails fast while the
+upstream is down, and jittered retries for idempotent calls.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional, TypeVar
+
+import aiohttp
+
+from config import (
+    UPSTREAM_POOL_SIZE,
+    UPSTREAM_TIMEOUT,
+    UPSTREAM_LATENCY_TARGET,
+    UPSTREAM_RETRIES,
+    UPSTREAM_BREAKER_FAILURES,
+    UPSTREAM_BREAKER_COOLDOWN,
+)
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Circuit breaker states
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class UpstreamError(Exception):
+    """The upstream API failed to answer (timeout, connection error, 5xx, 429)."""
+
+
+class UpstreamUnavailable(UpstreamError):
+    """The request was not sent: the circuit is open or no slot freed up in time."""
+
+
+@dataclass
+class GuardState:
+    """Snapshot of the guard for logs and metrics."""
+
+    breaker: str
+    limit: float
+    inflight: int
+    latency_ewma: float
+    calls: int
+    failures: int
+    retries: int
+    rejected: int
+
+
+class AdaptiveLimiter:
+    """Concurrency limit adjusted by additive increase / multiplicative decrease.
+
+    Every request finishing within `latency_target` raises the limit by
+    1/limit (about +1 per round of requests); a slow or failed request cuts
+    it by `backoff`, at most once per `latency_target` so one burst of slow
+    answers does not collapse it to the minimum.
+
+    Args:
+        initial: Starting limit.
+        min_limit: Lowest allowed limit.
+        max_limit: Highest allowed limit.
+        latency_target: Latency in seconds above which the upstream is considered congested.
+        backoff: Factor applied to the limit on congestion.
+    """
+
+    def __init__(
+        self,
+        initial: float,
+        min_limit: float,
+        max_limit: float,
+        latency_target: float,
+        backoff: float = 0.7,
+    ) -> None:
+        self.min_limit = max(1.0, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = min(self.max_limit, max(self.min_limit, initial))
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.inflight = 0
+        self._last_decrease = 0.0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self, timeout: float) -> None:
+        """Wait up to `timeout` seconds for a free slot.
+
+        Raises:
+            asyncio.TimeoutError: No slot became free in time.
+        """
+        async with self._cond:
+            await asyncio.wait_for(self._cond.wait_for(lambda: self.inflight < int(self.limit)), timeout)
+            self.inflight += 1
+
+    async def release(self, latency: Optional[float], ok: bool = True) -> None:
+        """Free a slot and adapt the limit; `latency=None` leaves the limit unchanged."""
+        async with self._cond:
+            self.inflight -= 1
+            if latency is not None:
+                if not ok or latency > self.latency_target:
+                    now = time.monotonic()
+                    if now - self._last_decrease >= self.latency_target:
+                        self.limit = max(self.min_limit, self.limit * self.backoff)
+                        self._last_decrease = now
+                else:
+                    self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+
+class CircuitBreaker:
+    """Stop calling the upstream after consecutive failures, probing it again later.
+
+    After `failure_threshold` failures in a row the circuit opens and calls
+    are refused for `cooldown` seconds. Then one probe request is let
+    through (half-open): success closes the circuit, failure reopens it.
+
+    Args:
+        failure_threshold: Consecutive failures that open the circuit.
+        cooldown: Seconds the circuit stays open before a probe.
+    """
+
+    def __init__(self, failure_threshold: int, cooldown: float) -> None:
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    def allow(self) -> bool:
+        """Return True if a request may be sent now."""
+        if self.state == OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+            self.state = HALF_OPEN
+            self._probing = False
+        if self.state == HALF_OPEN:
+            if self._probing:
+                return False
+            self._probing = True
+        return self.state != OPEN
+
+    def record_success(self) -> None:
+        if self.state != CLOSED:
+            logger.info("Upstream recovered, circuit closed")
+        self.state = CLOSED
+        self._failures = 0
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self.state == HALF_OPEN or (self.state == CLOSED and self._failures >= self.failure_threshold):
+            logger.warning("Upstream failing, circuit open for %.0fs", self.cooldown)
+            self.state = OPEN
+            self._opened_at = time.monotonic()
+            self._probing = False
+
+    def abandon(self) -> None:
+        """Give back a half-open probe slot that ended without an upstream answer."""
+        self._probing = False
+
+
+def _retryable(ex: BaseException) -> bool:
+    return isinstance(ex, (UpstreamError, aiohttp.ClientError, asyncio.TimeoutError))
+
+
+class UpstreamGuard:
+    """Run upstream requests through an adaptive limiter, a circuit breaker and retries.
+
+    Args:
+        max_concurrency: Upper bound of the adaptive limit.
+        latency_target: Latency in seconds treated as congestion.
+        retries: Extra attempts after a transient failure of an idempotent call.
+        failure_threshold: Consecutive failures that open the circuit.
+        cooldown: Seconds the circuit stays open before a probe.
+        deadline: No new attempt is started this many seconds after the call began.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_concurrency: int = UPSTREAM_POOL_SIZE,
+        latency_target: float = UPSTREAM_LATENCY_TARGET,
+        retries: int = UPSTREAM_RETRIES,
+        failure_threshold: int = UPSTREAM_BREAKER_FAILURES,
+        cooldown: float = UPSTREAM_BREAKER_COOLDOWN,
+        deadline: float = UPSTREAM_TIMEOUT,
+    ) -> None:
+        self.limiter = AdaptiveLimiter(max_concurrency / 2, 1, max_concurrency, latency_target)
+        self.breaker = CircuitBreaker(failure_threshold, cooldown)
+        self.retries = max(0, retries)
+        self.deadline = deadline
+        self._latency_ewma = 0.0
+        self._calls = 0
+        self._failures = 0
+        self._retries = 0
+        self._rejected = 0
+
+    async def call(self, factory: Callable[[], Awaitable[T]], *, idempotent: bool = True) -> T:
+        """Run `factory()` against the upstream under the guard.
+
+        Args:
+            factory: Zero-argument callable creating the request coroutine. It
+                should raise on transport failures and return normally for any
+                answer the upstream actually gave.
+            idempotent: Whether the request may be repeated after a failure.
+
+        Returns:
+            The result of `factory()`.
+
+        Raises:
+            UpstreamUnavailable: The circuit is open or the limiter shed the call.
+            UpstreamError: The request failed after all allowed attempts.
+        """
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            remaining = self.deadline - (time.monotonic() - started)
+            try:
+                await self.limiter.acquire(max(0.0, remaining))
+            except asyncio.TimeoutError:
+                self._rejected += 1
+                raise UpstreamUnavailable("upstream concurrency limit reached") from None
+            if not self.breaker.allow():
+                await self.limiter.release(None)
+                self._rejected += 1
+                raise UpstreamUnavailable("upstream circuit is open")
+
+            self._calls += 1
+            sent = time.monotonic()
+            try:
+                result = await factory()
+            except asyncio.CancelledError:
+                self.breaker.abandon()
+                await self.limiter.release(None)
+                raise
+            except Exception as ex:
+                latency = time.monotonic() - sent
+                await self.limiter.release(latency, ok=False)
+                self.breaker.record_failure()
+                self._failures += 1
+                backoff = random.uniform(0, min(2.0, 0.2 * 2 ** attempt))
+                elapsed = time.monotonic() - started
+                if (
+                    not idempotent
+                    or not _retryable(ex)
+                    or attempt >= self.retries
+                    or elapsed + backoff >= self.deadline
+                ):
+                    if isinstance(ex, UpstreamError):
+                        raise
+                    raise UpstreamError(f"{type(ex).__name__}: {ex}") from ex
+                logger.debug("Retrying upstream call after %s (attempt %d)", ex, attempt + 1)
+                await asyncio.sleep(backoff)
+                attempt += 1
+                self._retries += 1
+                continue
+
+            latency = time.monotonic() - sent
+            self._latency_ewma = latency if not self._latency_ewma else 0.8 * self._latency_ewma + 0.2 * latency
+            await self.limiter.release(latency)
+            self.breaker.record_success()
+            return result
+
+    def state(self) -> GuardState:
+        """Return a snapshot of the limiter, breaker and counters."""
+        return GuardState(
+            breaker=self.breaker.state,
+            limit=round(self.limiter.limit, 2),
+            inflight=self.limiter.inflight,
+            latency_ewma=round(self._latency_ewma, 3),
+            calls=self._calls,
+            failures=self._failures,
+            retries=self._retries,
+            rejected=self._rejected,
+        )
@@ -0,0 +1,359 @@
+"""In-process metrics registry exposed in the Prometheus text format.
+
+Hot paths only touch plain counters and bucket arrays; derived values
+(pool occupancy, cache and guard state) are read by collectors when
+`/metrics` is scraped.
+"""
+
+import bisect
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from aiogram import BaseMiddleware, Router
+from aiohttp import web
+
+from config import METRICS_HOST, METRICS_PORT
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, doc: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+
+    def labels(self, *values: Any) -> Any:
+        """Return the child for the given label values, creating it on first use."""
+        child = self._children.get(values)
+        if child is None:
+            key = tuple(str(v) for v in values)
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            child = self._children.get(key)
+            if child is None:
+                child = self._children[key] = self._new_child()
+        return child
+
+    def _new_child(self) -> Any:
+        raise NotImplementedError
+
+    def _samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, e.g. requests or errors."""
+
+    kind = "counter"
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Increment the unlabelled counter."""
+        self.labels().inc(amount)
+
+    def _samples(self) -> Iterable[str]:
+        for key, child in self._children.items():
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"
+
+
+class Gauge(Counter):
+    """Value that can go up and down, usually refreshed by a collector."""
+
+    kind = "gauge"
+
+    def set(self, value: float) -> None:
+        """Set the unlabelled gauge."""
+        self.labels().set(value)
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def time(self) -> "_Timer":
+        """Context manager observing the duration of its block."""
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ("_target", "_started")
+
+    def __init__(self, target: _HistogramValue) -> None:
+        self._target = target
+
+    def __enter__(self) -> "_Timer":
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._target.observe(time.perf_counter() - self._started)
+
+
+class Histogram(_Metric):
+    """Distribution of observed values (latencies) over fixed buckets."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        doc: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, doc, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self) -> _HistogramValue:
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        """Record a value in the unlabelled histogram."""
+        self.labels().observe(value)
+
+    def time(self) -> _Timer:
+        """Context manager observing the duration of its block."""
+        return self.labels().time()
+
+    def _samples(self) -> Iterable[str]:
+        for key, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(child.sum)}"
+            yield f"{self.name}_count{labels} {child.count}"
+
+
+class Registry:
+    """Set of metrics rendered together, plus collectors run before each scrape."""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+
+    def _register(self, metric: _Metric) -> Any:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, doc: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, doc, labelnames))
+
+    def gauge(self, name: str, doc: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, doc, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        doc: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, doc, labelnames, buckets))
+
+    def collector(self, func: Callable[[], None]) -> Callable[[], None]:
+        """Register `func` to refresh gauges right before rendering; usable as a decorator."""
+        self._collectors.append(func)
+        return func
+
+    def render(self) -> str:
+        """Return all metrics in the Prometheus text exposition format."""
+        for func in self._collectors:
+            try:
+                func()
+            except Exception as ex:
+                logger.warning("Metrics collector %s failed: %s", getattr(func, "__name__", func), ex)
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Hot-path metrics, updated where the work happens
+POLL_TICK_SECONDS = REGISTRY.histogram("bot_poll_tick_seconds", "Wall time of poll ticks that claimed queues.")
+POLL_QUEUES = REGISTRY.counter("bot_poll_queues_total", "Queues polled, by result.", ("result",))
+POLL_ERRORS = REGISTRY.counter("bot_poll_errors_total", "Poll ticks aborted by an exception.")
+UPSTREAM_SECONDS = REGISTRY.histogram(
+    "bot_upstream_request_seconds", "Provider API request latency.", ("endpoint",)
+)
+UPSTREAM_ERRORS = REGISTRY.counter(
+    "bot_upstream_errors_total", "Failed provider API requests, by kind.", ("endpoint", "kind")
+)
+MESSAGES = REGISTRY.counter("bot_messages_total", "Outgoing Telegram messages, by outcome.", ("outcome",))
+HANDLER_SECONDS = REGISTRY.histogram(
+    "bot_handler_seconds", "Time spent in update handlers, by router and update type.", ("router", "update")
+)
+OUTBOX_DEPTH = REGISTRY.gauge("bot_outbox_pending", "Notifications waiting in the outbox.")
+REMINDERS = REGISTRY.counter("bot_reminders_total", "Pre-outage reminders fired, by result.", ("result",))
+
+# Snapshot metrics, refreshed from component stats on scrape
+CACHE_REQUESTS = REGISTRY.counter("bot_cache_requests_total", "Cache lookups, by result.", ("cache", "result"))
+CACHE_ENTRIES = REGISTRY.gauge("bot_cache_entries", "Entries stored in a cache.", ("cache",))
+CACHE_BYTES = REGISTRY.gauge("bot_cache_bytes", "Approximate memory used by a cache.", ("cache",))
+CACHE_EVICTIONS = REGISTRY.counter("bot_cache_evictions_total", "Entries evicted from a cache.", ("cache",))
+COALESCED = REGISTRY.counter("bot_upstream_coalesced_total", "Upstream calls saved by request coalescing.")
+UPSTREAM_BREAKER = REGISTRY.gauge("bot_upstream_breaker_state", "Current circuit breaker state (1 = active).", ("state",))
+UPSTREAM_LIMIT = REGISTRY.gauge("bot_upstream_concurrency_limit", "Adaptive limit of concurrent upstream requests.")
+UPSTREAM_INFLIGHT = REGISTRY.gauge("bot_upstream_inflight", "Upstream requests in progress.")
+UPSTREAM_REJECTED = REGISTRY.counter("bot_upstream_rejected_total", "Upstream calls failed fast by the guard.")
+UPSTREAM_RETRIES = REGISTRY.counter("bot_upstream_retries_total", "Upstream requests retried after a failure.")
+HTTP_CONNECTIONS = REGISTRY.counter("bot_upstream_connections_total", "Upstream connections used, by kind.", ("kind",))
+DB_POOL_CONNECTIONS = REGISTRY.gauge("bot_db_pool_connections", "Database pool connections, by state.", ("state",))
+DB_POOL_WAITING = REGISTRY.gauge("bot_db_pool_waiting", "Callers waiting for a database connection.")
+DB_POOL_ACQUIRES = REGISTRY.counter("bot_db_pool_acquires_total", "Database connections acquired from the pool.")
+DB_POOL_WAIT = REGISTRY.counter("bot_db_pool_wait_seconds_total", "Time spent waiting for a database connection.")
+DB_QUERIES = REGISTRY.counter("bot_db_queries_total", "Queries executed on pooled database connections.")
+SUBSCRIPTION_INDEX = REGISTRY.gauge(
+    "bot_subscription_index", "In-memory subscription index: entries, approximate bytes and readiness.", ("value",)
+)
+
+
+@REGISTRY.collector
+def _collect_components() -> None:
+    # Imported here: these modules record into this one
+    from database import pool_stats, subscription_index
+    from utils.client import http_stats
+    from utils.guard import CLOSED, OPEN, HALF_OPEN
+    from utils.request import status_cache, queue_cache, singleflight_stats, upstream_state
+
+    for name, cache in (("status", status_cache), ("queue", queue_cache)):
+        stats = cache.stats()
+        CACHE_REQUESTS.labels(name, "hit").set(stats.hits)
+        CACHE_REQUESTS.labels(name, "miss").set(stats.misses)
+        CACHE_ENTRIES.labels(name).set(stats.entries)
+        CACHE_BYTES.labels(name).set(stats.size_bytes)
+        CACHE_EVICTIONS.labels(name).set(stats.evictions)
+    COALESCED.labels().set(singleflight_stats()["saved"])
+
+    guard = upstream_state()
+    for state in (CLOSED, OPEN, HALF_OPEN):
+        UPSTREAM_BREAKER.labels(state).set(1 if guard.breaker == state else 0)
+    UPSTREAM_LIMIT.set(guard.limit)
+    UPSTREAM_INFLIGHT.set(guard.inflight)
+    UPSTREAM_REJECTED.labels().set(guard.rejected)
+    UPSTREAM_RETRIES.labels().set(guard.retries)
+
+    http = http_stats()
+    HTTP_CONNECTIONS.labels("new").set(http.new_connections)
+    HTTP_CONNECTIONS.labels("reused").set(http.reused_connections)
+
+    pool = pool_stats()
+    DB_POOL_CONNECTIONS.labels("open").set(pool.size)
+    DB_POOL_CONNECTIONS.labels("idle").set(pool.idle)
+    DB_POOL_CONNECTIONS.labels("max").set(pool.max_size)
+    DB_POOL_WAITING.set(pool.waiting)
+    DB_POOL_ACQUIRES.labels().set(pool.acquires)
+    DB_POOL_WAIT.labels().set(pool.wait_seconds)
+    DB_QUERIES.labels().set(pool.queries)
+
+    SUBSCRIPTION_INDEX.labels("entries").set(len(subscription_index))
+    SUBSCRIPTION_INDEX.labels("bytes").set(subscription_index.memory_bytes())
+    SUBSCRIPTION_INDEX.labels("ready").set(1 if subscription_index.ready else 0)
+
+
+class HandlerTimingMiddleware(BaseMiddleware):
+    """Inner middleware observing handler latency for one router."""
+
+    def __init__(self, router_name: str, update_type: str) -> None:
+        self._hist = HANDLER_SECONDS.labels(router_name, update_type)
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]],
+        event: Any,
+        data: Dict[str, Any],
+    ) -> Any:
+        with self._hist.time():
+            return await handler(event, data)
+
+
+def instrument_router(router: Router, name: Optional[str] = None) -> None:
+    """Time the message and callback query handlers of `router`."""
+    label = name or router.name
+    router.message.middleware(HandlerTimingMiddleware(label, "message"))
+    router.callback_query.middleware(HandlerTimingMiddleware(label, "callback_query"))
+
+
+async def metrics_handler(request: web.Request) -> web.Response:
+    """Serve the registry in the Prometheus text format."""
+    return web.Response(
+        body=REGISTRY.render().encode("utf-8"),
+        headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+    )
+
+
+async def start_metrics_server() -> Optional[web.AppRunner]:
+    """Serve `/metrics` on METRICS_HOST:METRICS_PORT; returns None when METRICS_PORT is 0.
+
+    Returns:
+        The running AppRunner; call `cleanup()` on shutdown.
+    """
+    if not METRICS_PORT:
+        return None
+    app = web.Application()
+    app.router.add_get("/metrics", metrics_handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, METRICS_HOST, METRICS_PORT).start()
+    logger.info("Serving metrics on %s:%d/metrics", METRICS_HOST, METRICS_PORT)
+    return runner
@@ -0,0 +1,127 @@
+"""Sender workers delivering notifications from the durable outbox."""
+
+import asyncio
+import logging
+import time
+from collections import Counter
+from typing import Optional
+
+from aiogram import Bot
+
+from config import (
+    OUTBOX_WORKERS,
+    OUTBOX_BATCH,
+    OUTBOX_LEASE_SEC,
+    OUTBOX_MAX_ATTEMPTS,
+    OUTBOX_RETRY_SEC,
+    OUTBOX_KEEP_DAYS,
+)
+from database import (
+    DELIVERED,
+    REJECTED,
+    RETRY,
+    claim_outbox_batch,
+    complete_outbox_batch,
+    outbox_depth,
+    purge_outbox,
+)
+from utils.broadcast import Broadcaster, SENT, REJECTED as SEND_REJECTED
+from utils.metrics import OUTBOX_DEPTH
+from utils.updates import POLL_OWNER
+
+logger = logging.getLogger(__name__)
+
+IDLE_SLEEP_SEC = 2.0
+REPORT_EVERY_SEC = 60.0
+PURGE_EVERY_SEC = 3600.0
+
+
+async def _sender(idx: int, broadcaster: Broadcaster, stop: asyncio.Event) -> None:
+    owner = f"{POLL_OWNER}/{idx}"
+    while not stop.is_set():
+        try:
+            rows = await claim_outbox_batch(owner, OUTBOX_BATCH, OUTBOX_LEASE_SEC)
+        except Exception:
+            logger.exception("Failed to claim outbox batch")
+            rows = []
+        if not rows:
+            try:
+                await asyncio.wait_for(stop.wait(), IDLE_SLEEP_SEC)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        # The broadcaster bounds in-flight sends across all workers
+        started = time.monotonic()
+        outcomes = await asyncio.gather(*(broadcaster.deliver(r["chat_id"], r["text"]) for r in rows))
+        elapsed = time.monotonic() - started
+        results = []
+        counts = Counter()
+        for row, outcome in zip(rows, outcomes):
+            if outcome == SENT:
+                status = DELIVERED
+            elif outcome == SEND_REJECTED or row["attempts"] >= OUTBOX_MAX_ATTEMPTS:
+                status = REJECTED
+            else:
+                status = RETRY
+            results.append((row["id"], status))
+            counts[status] += 1
+        logger.info(
+            "Outbox batch %s: %d delivered, %d failed, %d to retry in %.1fs (%.1f msg/s)",
+            owner,
+            counts[DELIVERED],
+            counts[REJECTED],
+            counts[RETRY],
+            elapsed,
+            counts[DELIVERED] / elapsed if elapsed > 0 else 0.0,
+        )
+        try:
+            await complete_outbox_batch(results, OUTBOX_RETRY_SEC)
+        except Exception:
+            # Leases expire, so the batch is retried: delivery stays at-least-once
+            logger.exception("Failed to record outbox results")
+
+
+async def _maintenance(stop: asyncio.Event) -> None:
+    last_purge = 0.0
+    while not stop.is_set():
+        try:
+            depth = await outbox_depth()
+            OUTBOX_DEPTH.set(depth)
+            if depth:
+                logger.info("Outbox backlog: %d notifications pending", depth)
+            if time.monotonic() - last_purge >= PURGE_EVERY_SEC:
+                purged = await purge_outbox(OUTBOX_KEEP_DAYS)
+                last_purge = time.monotonic()
+                if purged:
+                    logger.info("Purged %d delivered notifications", purged)
+        except Exception:
+            logger.exception("Outbox maintenance failed")
+        try:
+            await asyncio.wait_for(stop.wait(), REPORT_EVERY_SEC)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def outbox_loop(bot: Bot, broadcaster: Optional[Broadcaster] = None) -> None:
+    """Run the pool of outbox sender workers until cancelled.
+
+    Each worker claims a batch of pending notifications, sends them through
+    the shared rate-limited broadcaster, which bounds the sends in flight
+    across all workers, and records and logs the outcomes. Rows are
+    leased, so batches interrupted by a crash or restart are picked up again.
+
+    Args:
+        bot: The aiogram Bot instance to send messages.
+        broadcaster: Optional shared broadcaster; created from `bot` if omitted.
+    """
+    broadcaster = broadcaster or Broadcaster(bot)
+    stop = asyncio.Event()
+    tasks = [asyncio.create_task(_sender(i, broadcaster, stop)) for i in range(max(1, OUTBOX_WORKERS))]
+    tasks.append(asyncio.create_task(_maintenance(stop)))
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        stop.set()
+        for t in tasks:
+            t.cancel()
@@ -0,0 +1,147 @@
+"""Timers firing pre-outage reminders from the stored schedule intervals.
+
+Pending reminders live in the `outage_reminders` table, which the poller
+rewrites together with a changed schedule. Each replica keeps the ones due
+soon in a min-heap ordered by fire time and sleeps until the earliest; a
+reminder is claimed in the database before it is fanned out through the
+outbox, so replicas never send it twice. After a restart only the pending
+rows due within the refresh horizon are loaded, not the schedules.
+"""
+
+import asyncio
+import heapq
+import logging
+import math
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from config import REMINDER_LEAD_MIN, REMINDER_REFRESH_SEC
+from database import fire_outage_reminder, pending_reminders, purge_outage_reminders
+from utils.metrics import REMINDERS
+
+logger = logging.getLogger(__name__)
+
+KYIV = ZoneInfo("Europe/Kyiv")
+PURGE_EVERY_SEC = 3600.0
+
+
+def reminder_text(row: Dict[str, Any], now: datetime) -> Optional[str]:
+    """Build the reminder for a claimed row, or None if the outage already started."""
+    minutes = math.ceil((row["starts_at"] - now).total_seconds() / 60)
+    if minutes <= 0:
+        return None
+    start = row["starts_at"].astimezone(KYIV).strftime("%H:%M")
+    end = row["ends_at"].astimezone(KYIV).strftime("%H:%M")
+    return f"⏰ Черга {row['queue_code']}: відключення через {minutes} хв ({start}–{end})"
+
+
+class ReminderScheduler:
+    """Min-heap of reminder timers for outages starting soon.
+
+    Entries are keyed by (queue code, outage start); a key pushed again with
+    another fire time supersedes the old heap entry, which is skipped when
+    popped. Timers of outages removed from a schedule are left in the heap;
+    claiming them in the database finds nothing and sends nothing.
+
+    Args:
+        lead_min: Minutes before an outage at which the reminder fires.
+        refresh_sec: How often pending reminders of other replicas are loaded.
+    """
+
+    def __init__(self, lead_min: int = REMINDER_LEAD_MIN, refresh_sec: float = REMINDER_REFRESH_SEC) -> None:
+        self.lead = timedelta(minutes=lead_min)
+        self.refresh_sec = refresh_sec
+        self._heap: List[Tuple[datetime, str, datetime, datetime]] = []
+        self._pending: Dict[Tuple[str, datetime], datetime] = {}
+        self._wake = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def push(self, queue_code: str, starts_at: datetime, ends_at: datetime, fire_at: datetime) -> None:
+        """Add or move the timer of one outage."""
+        key = (queue_code, starts_at)
+        if self._pending.get(key) == fire_at:
+            return
+        self._pending[key] = fire_at
+        heapq.heappush(self._heap, (fire_at, queue_code, starts_at, ends_at))
+        if self._heap[0][0] == fire_at:
+            self._wake.set()
+
+    def schedule(self, queue_code: str, outages: Iterable[Tuple[datetime, datetime]]) -> None:
+        """Add timers for the outages of a freshly stored schedule; no-op when reminders are off."""
+        if self.lead <= timedelta(0):
+            # reminder_loop does not run then, so nothing would ever drain the heap
+            return
+        for starts_at, ends_at in outages:
+            self.push(queue_code, starts_at, ends_at, starts_at - self.lead)
+
+    async def refresh(self, now: datetime) -> None:
+        """Load pending reminders due before the next refresh, including missed ones."""
+        horizon = now + timedelta(seconds=2 * self.refresh_sec)
+        for row in await pending_reminders(horizon):
+            self.push(row["queue_code"], row["starts_at"], row["ends_at"], row["fire_at"])
+
+    def _pop_due(self, now: datetime) -> List[Tuple[datetime, str, datetime, datetime]]:
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            item = heapq.heappop(self._heap)
+            fire_at, queue_code, starts_at, _ = item
+            if self._pending.get((queue_code, starts_at)) != fire_at:
+                continue  # superseded by a later push
+            del self._pending[(queue_code, starts_at)]
+            due.append(item)
+        return due
+
+    async def _fire(self, item: Tuple[datetime, str, datetime, datetime]) -> None:
+        fire_at, queue_code, starts_at, _ = item
+        try:
+            sent = await fire_outage_reminder(
+                queue_code, starts_at, fire_at, lambda row: reminder_text(row, datetime.now(KYIV))
+            )
+        except Exception:
+            # Still pending in the database; the next refresh brings it back
+            logger.exception("Failed to fire reminder for queue %s at %s", queue_code, starts_at)
+            return
+        REMINDERS.labels("sent" if sent else "skipped").inc()
+
+    async def run(self) -> None:
+        """Fire reminders as they become due until cancelled."""
+        next_refresh = 0.0
+        last_purge = 0.0
+        while True:
+            now = datetime.now(KYIV)
+            if time.monotonic() >= next_refresh:
+                try:
+                    await self.refresh(now)
+                    if time.monotonic() - last_purge >= PURGE_EVERY_SEC:
+                        await purge_outage_reminders(now - timedelta(days=1))
+                        last_purge = time.monotonic()
+                except Exception:
+                    logger.exception("Failed to load pending reminders")
+                next_refresh = time.monotonic() + self.refresh_sec
+
+            for item in self._pop_due(now):
+                await self._fire(item)
+
+            timeout = next_refresh - time.monotonic()
+            if self._heap:
+                timeout = min(timeout, (self._heap[0][0] - datetime.now(KYIV)).total_seconds())
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), max(0.0, timeout))
+            except asyncio.TimeoutError:
+                pass
+
+
+# Process-wide timers, fed by poll ticks when a schedule changes
+reminder_scheduler = ReminderScheduler()
+
+
+async def reminder_loop() -> None:
+    """Run the pre-outage reminder timers; does nothing when REMINDER_LEAD_MIN is 0."""
+    if REMINDER_LEAD_MIN <= 0:
+        return
+    await reminder_scheduler.run()
@@ -1,145 +1,252 @@
 """Low-level HTTP polling utilities for the upstream API."""
 
-import json
 import aiohttp
-from typing import Dict, Any, Optional, List
+import orjson
+import asyncio
+import logging
+import time
+from typing import Dict, Any, Optional, List, Hashable, Callable, Awaitable, TypeVar
 
-API_URL_DISABLE = "https://interruptions.energy.cn.ua/api/info_disable"
-API_URL_SCHEDULE = "https://interruptions.energy.cn.ua/api/info_schedule_part"
-API_URL_QUEUE = "https://interruptions.energy.cn.ua/api/number_queue/"
+from config import CACHE_SEC, CACHE_MAX_ENTRIES, CACHE_MAX_BYTES, UPSTREAM_BASE_URL
+from utils.client import get_session
+from utils.cache import TTLCache
+from utils.metrics import UPSTREAM_SECONDS, UPSTREAM_ERRORS
+from utils.guard import UpstreamGuard, UpstreamError, UpstreamUnavailable, GuardState
 
-async def fetch_status(session: aiohttp.ClientSession, person_accnt: str) -> Optional[List[Dict[str, Any]]]:
-    """Fetch the status (outage data) for a given personal account.
+logger = logging.getLogger(__name__)
+
+API_URL_DISABLE = f"{UPSTREAM_BASE_URL}/api/info_disable"
+API_URL_SCHEDULE = f"{UPSTREAM_BASE_URL}/api/info_schedule_part"
+API_URL_QUEUE = f"{UPSTREAM_BASE_URL}/api/number_queue/"
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one in-flight request.
+
+    Callers that arrive while a request for their key is running await the
+    same task and receive its result instead of issuing a duplicate call.
+    """
+
+    def __init__(self) -> None:
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.saved = 0
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[T]]) -> T:
+        """Run `factory()` for `key` unless an identical call is already in flight.
+
+        Args:
+            key: Identity of the request (endpoint plus arguments).
+            factory: Zero-argument callable creating the request coroutine.
+
+        Returns:
+            The result of the shared request.
+        """
+        fut = self._inflight.get(key)
+        if fut is None:
+            fut = asyncio.ensure_future(factory())
+            self._inflight[key] = fut
+            self.calls += 1
+
+            def _forget(done: asyncio.Future, key: Hashable = key) -> None:
+                if self._inflight.get(key) is done:
+                    del self._inflight[key]
+
+            fut.add_done_callback(_forget)
+        else:
+            self.saved += 1
+        # Shield so a cancelled caller does not cancel the request for the others
+        return await asyncio.shield(fut)
+
+
+_flights = SingleFlight()
+
+# Fresh answers per account; values are kept past TTL until evicted (LRU)
+status_cache: TTLCache[List[Dict[str, Any]]] = TTLCache(CACHE_SEC, CACHE_MAX_ENTRIES, CACHE_MAX_BYTES)
+queue_cache: TTLCache[Dict[str, Any]] = TTLCache(CACHE_SEC, CACHE_MAX_ENTRIES, CACHE_MAX_BYTES // 4)
+
+
+# Shared by every upstream call so limits and breaker reflect the whole process
+upstream_guard = UpstreamGuard()
+
+
+def _failure_level(ex: UpstreamError) -> int:
+    # While the circuit is open every call fails fast; do not flood the log
+    return logging.DEBUG if isinstance(ex, UpstreamUnavailable) else logging.WARNING
+
+
+def upstream_state() -> GuardState:
+    """Return the state of the upstream guard (breaker, concurrency limit, counters)."""
+    return upstream_guard.state()
+
+
+def singleflight_stats() -> Dict[str, int]:
+    """Return upstream calls made and calls saved by request coalescing."""
+    return {"calls": _flights.calls, "saved": _flights.saved, "inflight": len(_flights._inflight)}
+
+
+async def _post_json(endpoint: str, url: str, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """POST `payload` to the upstream API and return the decoded answer.
 
     Args:
-        session: Shared aiohttp client session.
-        person_accnt: Personal account identifier string.
+        endpoint: Short endpoint name used in metrics.
+        url: Endpoint URL.
+        payload: JSON request body.
 
     Returns:
-        List of dicts from 'aData' when successful and status == 'ok', otherwise None.
+        The response object when it is a dict with status 'ok', otherwise None.
+
+    Raises:
+        UpstreamError: The upstream is overloaded or failing (429, 5xx).
+        aiohttp.ClientError, asyncio.TimeoutError: Transport failures.
     """
+    started = time.perf_counter()
     try:
-        async with session.post(
-            API_URL_DISABLE,
-            json={"person_accnt": person_accnt, "token": None},
-            headers={"Content-Type": "application/json"},
-            timeout=aiohttp.ClientTimeout(total=15),
-        ) as resp:
-            
+        async with get_session().post(url, json=payload) as resp:
+            if resp.status == 429 or resp.status >= 500:
+                UPSTREAM_ERRORS.labels(endpoint, f"http_{resp.status}").inc()
+                raise UpstreamError(f"HTTP {resp.status} from {url}")
             if resp.status != 200:
-                print("Response status not 200:", resp.status)
-                return None
-            
-            data = await resp.json(content_type=None)
-            if isinstance(data, str):
-                try:
-                    data = json.loads(data)
-                except Exception:
-                    print("Failed to parse JSON string:", data)
-                    return None
-                
-            if not isinstance(data, dict):
-                print("Data is not a dict:", data)
+                UPSTREAM_ERRORS.labels(endpoint, f"http_{resp.status}").inc()
+                logger.info("Unexpected HTTP %s from %s", resp.status, url)
                 return None
-            
-            status_val = data.get("status")
-            if status_val not in ("ok", "200", 200):
-                print("Status not ok:", status_val)
-                return None
-            
-            return extract_aData(data)
-    except Exception:
+            body = await resp.read()
+    except asyncio.TimeoutError:
+        UPSTREAM_ERRORS.labels(endpoint, "timeout").inc()
+        raise
+    except aiohttp.ClientError:
+        UPSTREAM_ERRORS.labels(endpoint, "connection").inc()
+        raise
+    finally:
+        UPSTREAM_SECONDS.labels(endpoint).observe(time.perf_counter() - started)
+
+    try:
+        data = orjson.loads(body)
+        if isinstance(data, str):
+            data = orjson.loads(data)
+    except orjson.JSONDecodeError:
+        UPSTREAM_ERRORS.labels(endpoint, "decode").inc()
+        logger.warning("Undecodable answer from %s: %.200r", url, body)
         return None
 
+    if not isinstance(data, dict):
+        logger.info("Answer from %s is not an object: %.200r", url, data)
+        return None
+    if data.get("status") not in ("ok", "200", 200):
+        logger.debug("Answer from %s has status %r", url, data.get("status"))
+        return None
+    return data
 
-async def fetch_queue(session: aiohttp.ClientSession, person_accnt: str) -> Optional[Dict[str, Any]]:
+
+async def _fetch_status(person_accnt: str) -> Optional[List[Dict[str, Any]]]:
+    """Fetch the status (outage data) for a given personal account.
+
+    Args:
+        person_accnt: Personal account identifier string.
+
+    Returns:
+        List of dicts from 'aData' when successful and status == 'ok', otherwise None.
+    """
+    data = await _post_json("status", API_URL_DISABLE, {"person_accnt": person_accnt, "token": None})
+    return extract_aData(data) if data is not None else None
+
+
+async def _fetch_queue(person_accnt: str) -> Optional[Dict[str, Any]]:
     """Fetch the queue information for a given personal account.
 
     Args:
-        session: Shared aiohttp client session.
         person_accnt: Personal account identifier string.
 
     Returns:
-        Parsed JSON dict when successful and status == 'ok', otherwise None.
+        Dict with 'street' and 'queues' when successful, otherwise None.
     """
-    try:
-        async with session.post(
-            API_URL_QUEUE,
-            json={"search_param": person_accnt, "token": None},
-            headers={"Content-Type": "application/json"},
-            timeout=aiohttp.ClientTimeout(total=15),
-        ) as resp:
-            
-            if resp.status != 200:
-                return None
-            
-            data = await resp.json()
-            if isinstance(data, str):
-                try:
-                    data = json.loads(data)
-                except Exception:
-                    return None
-                
-            if not isinstance(data, dict):
-                return None
-            
-            status_val = data.get("status")
-            if status_val not in ("ok", "200", 200):
-                return None
-            
-            street = None
-            queues = None
-
-            for d in data.get("list_grp", []):
-                first = d[0] if d and isinstance(d[0], dict) else {}
-                street = first.get("adr_to") if first.get("adr_to") is not None else "Невідомо"
-                q_val = first.get("queues") if first.get("queues") is not None else first.get("queue")
-                queues = q_val if q_val is not None else "Невідомо"
-                break
-            
-            return {"street": street, "queues": queues}
-    except Exception:
+    data = await _post_json("queue", API_URL_QUEUE, {"search_param": person_accnt, "token": None})
+    if data is None:
         return None
 
+    street = None
+    queues = None
+
+    for d in data.get("list_grp", []):
+        first = d[0] if d and isinstance(d[0], dict) else {}
+        street = first.get("adr_to") if first.get("adr_to") is not None else "Невідомо"
+        q_val = first.get("queues") if first.get("queues") is not None else first.get("queue")
+        queues = q_val if q_val is not None else "Невідомо"
+        break
+
+    return {"street": street, "queues": queues}
 
-async def fetch_schedule(session: aiohttp.ClientSession, queue: str, curr_dt: str) -> Optional[Dict[str, Any]]:
+
+async def _fetch_schedule(queue: str, curr_dt: str) -> Optional[Dict[str, Any]]:
     """Fetch the interruption schedule details.
 
     Args:
-        session: Shared aiohttp client session.
         queue: Queue identifier string.
         curr_dt: Date string in 'YYYY-MM-DD' format.
 
     Returns:
         Parsed JSON dict when successful and status == 'ok', otherwise None.
     """
-    try:
-        async with session.post(
-            API_URL_SCHEDULE,
-            json={"queue": queue, "curr_dt": curr_dt},
-            headers={"Content-Type": "application/json"},
-            timeout=aiohttp.ClientTimeout(total=15),
-        ) as resp:
-            
-            if resp.status != 200:
-                return None
-            
-            data = await resp.json(content_type=None)
-            if isinstance(data, str):
-                try:
-                    data = json.loads(data)
-                except Exception:
-                    return None
-                
-            if not isinstance(data, dict):
-                return None
-            
-            status_val = data.get("status")
-            if status_val not in ("ok", "200", 200):
-                return None
-            
+    return await _post_json("schedule", API_URL_SCHEDULE, {"queue": queue, "curr_dt": curr_dt})
+
+
+async def _guarded(key: Hashable, factory: Callable[[], Awaitable[T]]) -> T:
+    """Send one upstream request through request coalescing and the upstream guard."""
+    return await _flights.do(key, lambda: upstream_guard.call(factory))
+
+
+async def fetch_status(person_accnt: str, *, checked_cache: bool = False) -> Optional[List[Dict[str, Any]]]:
+    """Fetch account status from cache or upstream, sharing concurrent identical calls.
+
+    When the upstream is failing, the last known (possibly expired) value is returned.
+
+    Args:
+        person_accnt: Personal account identifier.
+        checked_cache: True if the caller already missed the cache for this
+            account, so the lookup is not repeated (and counted) here.
+    """
+    key = str(person_accnt)
+    if not checked_cache:
+        data = status_cache.get(key)
+        if data is not None:
             return data
-    except Exception:
+    try:
+        data = await _guarded(("status", key), lambda: _fetch_status(key))
+    except UpstreamError as ex:
+        logger.log(_failure_level(ex), "Status fetch failed, serving last known data: %s", ex)
+        return status_cache.get_stale(key)
+    if data is not None:
+        status_cache.set(key, data)
+    return data
+
+
+async def fetch_queue(person_accnt: str) -> Optional[Dict[str, Any]]:
+    """Fetch account queue info from cache or upstream, sharing concurrent identical calls.
+
+    When the upstream is failing, the last known (possibly expired) value is returned.
+    """
+    key = str(person_accnt)
+    data = queue_cache.get(key)
+    if data is not None:
+        return data
+    try:
+        data = await _guarded(("queue", key), lambda: _fetch_queue(key))
+    except UpstreamError as ex:
+        logger.log(_failure_level(ex), "Queue fetch failed, serving last known data: %s", ex)
+        return queue_cache.get_stale(key)
+    if data is not None:
+        queue_cache.set(key, data)
+    return data
+
+
+async def fetch_schedule(queue: str, curr_dt: str) -> Optional[Dict[str, Any]]:
+    """Fetch a queue schedule, sharing the result with concurrent identical calls."""
+    try:
+        return await _guarded(("schedule", queue, curr_dt), lambda: _fetch_schedule(queue, curr_dt))
+    except UpstreamError as ex:
+        logger.log(_failure_level(ex), "Schedule fetch for queue %s failed: %s", queue, ex)
         return None
 
 
@@ -0,0 +1,147 @@
+"""Drift-free poll ticks and per-queue adaptive poll intervals."""
+
+import asyncio
+import logging
+import random
+from datetime import datetime, timedelta, tzinfo
+from typing import AsyncIterator, FrozenSet, Iterable, Optional, Tuple
+
+from config import (
+    POLL_TICK_SEC,
+    POLL_BASE_SEC,
+    POLL_MIN_SEC,
+    POLL_MAX_SEC,
+    POLL_HOT_HOURS,
+    POLL_JITTER,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def parse_hours(spec: str) -> FrozenSet[int]:
+    """Parse an hour set such as "7-9,16-23" (end exclusive) into hours of the day.
+
+    Args:
+        spec: Comma-separated single hours or half-open "start-end" ranges.
+
+    Returns:
+        Frozen set of hours in the range 0..23.
+    """
+    hours: set[int] = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            start, end = (int(x) for x in part.split("-", 1))
+            hours.update(h % 24 for h in range(start, end if end > start else end + 24))
+        else:
+            hours.add(int(part) % 24)
+    return frozenset(hours)
+
+
+class PollScheduler:
+    """Decide when each queue should be polled.
+
+    Queues are polled every `min_interval` inside the hot hours, when the
+    utility usually publishes or edits schedules, and right after a change.
+    Outside of them the interval doubles while a queue stays unchanged, up to
+    `max_interval`, but never runs past the start of the next hot window.
+    Intervals are jittered so queues do not align into bursts.
+
+    The scheduler only computes timings; the per-queue state lives in the
+    `poll_queue` table so several replicas can share it.
+
+    Args:
+        tz: Timezone the hot hours refer to.
+        tick: Fixed period of scheduler ticks in seconds.
+        base: Interval of a queue with no history, in seconds.
+        min_interval: Shortest interval, used in hot hours and after changes.
+        max_interval: Longest back-off interval for a stable queue.
+        hot_hours: Hours of the day treated as publishing windows.
+        jitter: Relative jitter applied to every interval (0.1 = ±10%).
+    """
+
+    def __init__(
+        self,
+        tz: tzinfo,
+        *,
+        tick: float = POLL_TICK_SEC,
+        base: float = POLL_BASE_SEC,
+        min_interval: float = POLL_MIN_SEC,
+        max_interval: float = POLL_MAX_SEC,
+        hot_hours: Optional[Iterable[int]] = None,
+        jitter: float = POLL_JITTER,
+    ) -> None:
+        self.tz = tz
+        self.tick = tick
+        self.base = base
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.hot_hours = frozenset(hot_hours) if hot_hours is not None else parse_hours(POLL_HOT_HOURS)
+        self.jitter = jitter
+
+    def now(self) -> datetime:
+        return datetime.now(self.tz)
+
+    async def ticks(self) -> AsyncIterator[datetime]:
+        """Yield on fixed-rate deadlines; ticks missed by an overrunning body are skipped."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time()
+        while True:
+            yield self.now()
+            deadline += self.tick
+            now = loop.time()
+            if now > deadline:
+                missed = int((now - deadline) // self.tick) + 1
+                logger.warning("Poll tick overran by %.1fs, skipping %d tick(s)", now - deadline, missed)
+                deadline += missed * self.tick
+            await asyncio.sleep(deadline - now)
+
+    def is_hot(self, at: datetime) -> bool:
+        return at.astimezone(self.tz).hour in self.hot_hours
+
+    def _next_hot_start(self, at: datetime) -> Optional[datetime]:
+        if not self.hot_hours:
+            return None
+        local = at.astimezone(self.tz).replace(minute=0, second=0, microsecond=0)
+        for step in range(1, 25):
+            candidate = local + timedelta(hours=step)
+            if candidate.hour in self.hot_hours:
+                return candidate
+        return None
+
+    def plan(
+        self,
+        prev_interval: Optional[float],
+        *,
+        changed: bool,
+        ok: bool = True,
+        at: Optional[datetime] = None,
+    ) -> Tuple[float, datetime]:
+        """Compute the next poll of a queue after a fetch attempt.
+
+        Args:
+            prev_interval: Interval used before this attempt, None for a new queue.
+            changed: Whether the schedule content changed.
+            ok: Whether the fetch succeeded; failures retry at the short interval.
+            at: Time of the attempt (defaults to now).
+
+        Returns:
+            A tuple of (new interval in seconds, time the queue is due again).
+        """
+        at = at or self.now()
+
+        if not ok or changed or self.is_hot(at):
+            interval = self.min_interval
+        elif prev_interval is None:
+            interval = self.base
+        else:
+            interval = min(self.max_interval, max(self.base, prev_interval * 2))
+
+        delay = interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+        next_due = at + timedelta(seconds=delay)
+        hot_start = self._next_hot_start(at)
+        if hot_start is not None and next_due > hot_start:
+            next_due = hot_start + timedelta(seconds=random.uniform(0, self.tick))
+        return interval, next_due
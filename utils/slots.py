@@ -0,0 +1,313 @@
+"""Compact per-minute outage index of daily queue schedules.
+
+A day's schedule is parsed once into an integer bitmask with one bit per
+minute (bit set = outage, upstream states 2 and 3 merged as in
+`format_daily_schedule`). Current state is a single bit test and the next
+transition is found with bit arithmetic instead of scanning interval lists.
+"""
+
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from config import SLOT_INDEX_TTL
+from database import get_queue_schedules
+
+MINUTES_PER_DAY = 24 * 60
+_FULL_DAY = (1 << MINUTES_PER_DAY) - 1
+OUTAGE_STATES = {"2", "3"}
+
+
+def _minute(value: Any) -> Optional[int]:
+    """Parse 'HH:MM' into minutes since midnight; '24:00' is the end of the day."""
+    try:
+        hh, mm = str(value).strip().split(":")[:2]
+        minute = int(hh) * 60 + int(mm)
+    except (TypeError, ValueError):
+        return None
+    return minute if 0 <= minute <= MINUTES_PER_DAY else None
+
+
+def _lowest_bit(x: int) -> int:
+    return (x & -x).bit_length() - 1
+
+
+def format_minute(minute: int) -> str:
+    """Render minutes since midnight as 'HH:MM' ('24:00' for the end of the day)."""
+    return f"{minute // 60:02d}:{minute % 60:02d}"
+
+
+@dataclass(frozen=True)
+class DaySchedule:
+    """Outage minutes of one queue on one date."""
+
+    mask: int
+    digest: Optional[str] = None
+
+    @classmethod
+    def from_payload(cls, sched: Dict[str, Any], digest: Optional[str] = None) -> "DaySchedule":
+        """Build the bitmask from an upstream schedule payload ('aData' intervals)."""
+        mask = 0
+        rows = sched.get("aData") if isinstance(sched, dict) else None
+        for r in rows if isinstance(rows, list) else []:
+            if not isinstance(r, dict) or str(r.get("queue")) not in OUTAGE_STATES:
+                continue
+            start, end = _minute(r.get("time_from")), _minute(r.get("time_to"))
+            if start is None or end is None:
+                continue
+            if end <= start:
+                end = MINUTES_PER_DAY  # "23:30" - "00:00" runs to midnight
+            mask |= ((1 << (end - start)) - 1) << start
+        return cls(mask & _FULL_DAY, digest)
+
+    def is_off(self, minute: int) -> bool:
+        """Return True if there is an outage at `minute` since midnight."""
+        return bool((self.mask >> minute) & 1)
+
+    def next_change(self, minute: int) -> Optional[int]:
+        """Return the first minute after `minute` whose state differs, or None if none today."""
+        # Minutes from now on that are in the opposite state
+        rest = ((~self.mask & _FULL_DAY) if self.is_off(minute) else self.mask) >> minute
+        if not rest:
+            return None
+        return minute + _lowest_bit(rest)
+
+    def intervals(self) -> List[Tuple[int, int]]:
+        """Return outage intervals as (start, end) minutes, end exclusive."""
+        out = []
+        mask, base = self.mask, 0
+        while mask:
+            start = _lowest_bit(mask)
+            mask >>= start
+            length = _lowest_bit(~mask)
+            out.append((base + start, base + start + length))
+            mask >>= length
+            base += start + length
+        return out
+
+
+@dataclass(frozen=True)
+class IntervalChange:
+    """One difference between two days' outage intervals.
+
+    `kind` is "added", "removed", "extended", "shortened" or "changed"
+    (moved, split or merged); `old` and `new` hold the intervals involved.
+    """
+
+    kind: str
+    old: Tuple[Tuple[int, int], ...] = ()
+    new: Tuple[Tuple[int, int], ...] = ()
+
+
+def diff_schedules(old: DaySchedule, new: DaySchedule) -> List[IntervalChange]:
+    """Return the interval-level differences between two schedules of one day.
+
+    Overlapping outages of the old and new schedule are grouped; a group with
+    only new intervals is an added outage, only old ones a removed outage, and
+    a one-to-one pair is extended, shortened or changed. Identical outage
+    minutes give an empty list.
+    """
+    if old.mask == new.mask:
+        return []
+    tagged = sorted([(s, e, 0) for s, e in old.intervals()] + [(s, e, 1) for s, e in new.intervals()])
+    groups: List[Tuple[List[Tuple[int, int]], List[Tuple[int, int]]]] = []
+    group_end = -1
+    for start, end, side in tagged:
+        if not groups or start >= group_end:
+            groups.append(([], []))
+            group_end = end
+        group_end = max(group_end, end)
+        groups[-1][side].append((start, end))
+
+    changes = []
+    for olds, news in groups:
+        if olds == news:
+            continue
+        if not olds:
+            kind = "added"
+        elif not news:
+            kind = "removed"
+        elif len(olds) == len(news) == 1:
+            (os_, oe), (ns, ne) = olds[0], news[0]
+            if ns <= os_ and ne >= oe:
+                kind = "extended"
+            elif ns >= os_ and ne <= oe:
+                kind = "shortened"
+            else:
+                kind = "changed"
+        else:
+            kind = "changed"
+        changes.append(IntervalChange(kind, tuple(olds), tuple(news)))
+    return changes
+
+
+def _spans(intervals: Iterable[Tuple[int, int]]) -> str:
+    return ", ".join(f"{format_minute(s)}–{format_minute(e)}" for s, e in intervals)
+
+
+_CHANGE_LABELS = {
+    "added": "➕ Нове відключення",
+    "removed": "➖ Скасовано",
+    "extended": "⏫ Подовжено",
+    "shortened": "⏬ Скорочено",
+    "changed": "🔄 Змінено",
+}
+
+
+def format_schedule_diff(changes: List[IntervalChange], new: DaySchedule) -> str:
+    """Render schedule changes compactly, followed by the resulting outages."""
+    lines = []
+    for c in changes:
+        if c.kind == "added":
+            lines.append(f"{_CHANGE_LABELS[c.kind]}: {_spans(c.new)}")
+        elif c.kind == "removed":
+            lines.append(f"{_CHANGE_LABELS[c.kind]}: {_spans(c.old)}")
+        else:
+            lines.append(f"{_CHANGE_LABELS[c.kind]}: {_spans(c.old)} → {_spans(c.new)}")
+    current = new.intervals()
+    lines.append(f"\nВідключення за графіком: {_spans(current)}" if current else "\nВідключень за графіком немає")
+    return "\n".join(lines)
+
+
+@dataclass
+class SlotStatus:
+    """Answer to "is the light on now" for one queue."""
+
+    known: bool
+    off: bool = False
+    until: Optional[datetime] = None  # next state change, if the schedule shows one
+    next_outage: Optional[Tuple[datetime, datetime]] = None  # next outage after now when on
+
+
+class ScheduleIndex:
+    """In-memory (queue, date) -> DaySchedule map, refreshed on upsert.
+
+    Entries older than `ttl` seconds are reported as missing by `missing()`
+    so callers can reload them from the database; other replicas may have
+    stored a newer schedule in the meantime.
+
+    Args:
+        ttl: Seconds an entry is trusted without reloading.
+    """
+
+    def __init__(self, ttl: float = SLOT_INDEX_TTL) -> None:
+        self.ttl = ttl
+        self._days: Dict[Tuple[str, date], Tuple[float, DaySchedule]] = {}
+
+    def update(self, queue_code: str, sched_date: date, sched: Dict[str, Any], digest: Optional[str] = None) -> DaySchedule:
+        """Store the parsed schedule, reusing the previous parse when the digest is unchanged."""
+        key = (queue_code, sched_date)
+        cur = self._days.get(key)
+        if cur is not None and digest is not None and cur[1].digest == digest:
+            day = cur[1]
+        else:
+            day = DaySchedule.from_payload(sched, digest)
+        self._days[key] = (time.monotonic(), day)
+        return day
+
+    def get(self, queue_code: str, sched_date: date) -> Optional[DaySchedule]:
+        item = self._days.get((queue_code, sched_date))
+        return item[1] if item is not None else None
+
+    def missing(self, keys: Iterable[Tuple[str, date]]) -> List[Tuple[str, date]]:
+        """Return the keys that are not indexed or whose entry is older than the TTL."""
+        now = time.monotonic()
+        out = []
+        for key in keys:
+            item = self._days.get(key)
+            if item is None or now - item[0] >= self.ttl:
+                out.append(key)
+        return out
+
+    def prune(self, before: date) -> None:
+        """Drop schedules of dates earlier than `before`."""
+        for key in [k for k in self._days if k[1] < before]:
+            del self._days[key]
+
+    def status(self, queue_code: str, now: datetime) -> SlotStatus:
+        """Return the current state of a queue and its next transition.
+
+        Args:
+            queue_code: Queue identifier.
+            now: Current local (Kyiv) time.
+        """
+        today = self.get(queue_code, now.date())
+        if today is None:
+            return SlotStatus(known=False)
+        minute = now.hour * 60 + now.minute
+        midnight = datetime.combine(now.date(), datetime.min.time(), tzinfo=now.tzinfo)
+        tomorrow = self.get(queue_code, now.date() + timedelta(days=1))
+
+        def at(day_offset: int, m: int) -> datetime:
+            return midnight + timedelta(days=day_offset, minutes=m)
+
+        off = today.is_off(minute)
+        change = today.next_change(minute)
+        if change is None and tomorrow is not None and tomorrow.is_off(0) != off:
+            until: Optional[datetime] = at(1, 0)
+        elif change is None and tomorrow is not None:
+            nxt = tomorrow.next_change(0)
+            until = at(1, nxt) if nxt is not None else None
+        else:
+            until = at(0, change) if change is not None else None
+
+        next_outage = None
+        if not off:
+            upcoming = [(s, e) for s, e in today.intervals() if s > minute]
+            later = tomorrow.intervals() if tomorrow is not None else []
+            if upcoming:
+                start, end = upcoming[0]
+                # An outage running to midnight continues into tomorrow's one from 00:00
+                if end == MINUTES_PER_DAY and later and later[0][0] == 0:
+                    next_outage = (at(0, start), at(1, later[0][1]))
+                else:
+                    next_outage = (at(0, start), at(0, end))
+            elif later:
+                next_outage = (at(1, later[0][0]), at(1, later[0][1]))
+        return SlotStatus(known=True, off=off, until=until, next_outage=next_outage)
+
+
+def describe_status(status: SlotStatus, now: datetime) -> str:
+    """Render a queue status as a short Ukrainian sentence for the bot."""
+
+    def when(moment: datetime) -> str:
+        hhmm = moment.strftime("%H:%M")
+        if moment.date() == now.date():
+            return hhmm
+        if moment.date() == now.date() + timedelta(days=1):
+            return f"завтра {hhmm}" if hhmm != "00:00" else "кінця доби"
+        return moment.strftime("%d.%m %H:%M")
+
+    if not status.known:
+        return "❓ Графік ще невідомий"
+    if status.off:
+        return f"🔌 Відключення до {when(status.until)}" if status.until else "🔌 Відключення до кінця графіка"
+    if status.next_outage:
+        start, end = status.next_outage
+        return f"💡 Світло є. Наступне відключення: {when(start)}–{when(end)}"
+    return "💡 Світло є, відключень за графіком немає"
+
+
+# Process-wide index, refreshed by poll ticks and by lookups of stale entries
+schedule_index = ScheduleIndex()
+
+
+async def queue_status(queue_codes: Iterable[str], now: datetime) -> Dict[str, SlotStatus]:
+    """Return the current state of each queue, loading stale schedules in one query.
+
+    Args:
+        queue_codes: Queue identifiers to look up.
+        now: Current local (Kyiv) time.
+
+    Returns:
+        Mapping of queue code to its status.
+    """
+    codes = list(dict.fromkeys(c for c in queue_codes if c))
+    days = (now.date(), now.date() + timedelta(days=1))
+    stale = schedule_index.missing((code, d) for code in codes for d in days)
+    if stale:
+        for row in await get_queue_schedules(stale):
+            schedule_index.update(row["queue_code"], row["sched_date"], row["payload"] or {}, row["digest"])
+        schedule_index.prune(now.date() - timedelta(days=1))
+    return {code: schedule_index.status(code, now) for code in codes}
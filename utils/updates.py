@@ -1,24 +1,39 @@
 """Utility helpers for handling updates and polling logic."""
 
-import aiohttp
-import json
 import asyncio
-from aiogram import Bot
-from datetime import datetime, timezone, timedelta
+import logging
+import os
+import time
+import socket
+import uuid
+from datetime import date, datetime, timezone, timedelta
 from zoneinfo import ZoneInfo
 from typing import Optional, Tuple, Dict, Any
 
-from config import CACHE_SEC
-from utils import format_daily_schedule
-from utils.request import fetch_status, fetch_schedule
+from config import CACHE_SEC, HOURLY_CHECK_LIMIT, POLL_FETCH_CONCURRENCY, POLL_CLAIM_LIMIT, POLL_LEASE_SEC, POLL_DAYS_AHEAD
+from utils import format_daily_schedule, schedule_digest
+from utils.request import fetch_status, fetch_schedule, status_cache
+from utils.scheduler import PollScheduler
+from utils.slots import DaySchedule, MINUTES_PER_DAY, schedule_index, diff_schedules, format_schedule_diff
+from utils.reminders import reminder_scheduler
+from utils.metrics import POLL_TICK_SECONDS, POLL_QUEUES, POLL_ERRORS
 from database import (
-    get_subscription_by_details,
+    consume_fetch_quota,
     update_subscription_payload,
     upsert_fetch_schedule,
-    list_queues_with_payload_for_date,
-    list_chat_ids_by_queue,
+    set_schedule_digest,
+    claim_due_queues,
+    complete_queues,
 )
 
+logger = logging.getLogger(__name__)
+
+# Identifies this process when leasing queues shared with other replicas
+POLL_OWNER = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+# References to fire-and-forget writes so they are not garbage collected
+_background: set[asyncio.Task] = set()
+
 def _kyiv_tz():
     try:
         return ZoneInfo("Europe/Kyiv")
@@ -50,7 +65,6 @@ def _build_limit_message(person_accnt: int, hour_reset_at: Optional[str]) -> str
 
 
 async def try_fetch_with_limits(
-    session: aiohttp.ClientSession,
     chat_id: int,
     person_accnt: int,
     *,
@@ -59,7 +73,6 @@ async def try_fetch_with_limits(
     """Try to fetch status for a personal account, respecting subscription limits and cache.
 
     Args:
-        session: Shared aiohttp client session.
         chat_id: Chat ID of the requesting user.
         person_accnt: Personal account identifier.
         is_poll: Whether this fetch is part of the polling loop (no limit checks).
@@ -67,114 +80,239 @@ async def try_fetch_with_limits(
     Returns:
         A tuple of (data payload dict when successful, otherwise None, limit message when limit exceeded, otherwise None).
     """
-    kyiv = _kyiv_tz()
-    now_kyiv = datetime.now(kyiv)
+    # A fresh in-memory answer needs neither the DB nor the upstream API
+    cached = status_cache.get(str(person_accnt))
+    if cached is not None:
+        return cached, None
 
-    sub = await get_subscription_by_details(chat_id, person_accnt)
-    if sub is None:
+    quota = await consume_fetch_quota(chat_id, person_accnt, HOURLY_CHECK_LIMIT, CACHE_SEC)
+    if quota is None:
         
         if not is_poll:
-            data_direct = await fetch_status(session, str(person_accnt))
+            data_direct = await fetch_status(str(person_accnt), checked_cache=True)
             return data_direct, None
         return None, None
-    
-    cached_payload: Optional[Dict[str, Any]] = sub.get("last_payload") if sub.get("last_payload") else None
-    updated_at: Optional[datetime] = sub.get("updated_at")
 
-    if updated_at is not None:
-        if (now_kyiv - updated_at).total_seconds() < CACHE_SEC and cached_payload is not None:
-            return cached_payload, None
-        
-    count: Optional[int] = sub.get("hour_count")
-    reset_at: Optional[datetime] = sub.get("hour_reset_at")
-
-    if reset_at is None or now_kyiv >= reset_at:
-        count = 0
-        reset_at = now_kyiv + timedelta(hours=1)
+    if quota["last_payload"] is not None:
+        return quota["last_payload"], None
 
-    if (count or 0) >= 10:
+    if not quota["allowed"]:
+        reset_at: Optional[datetime] = quota["hour_reset_at"]
         limit_msg = _build_limit_message(person_accnt, reset_at.isoformat() if reset_at else None)
         return None, limit_msg
 
-    data = await fetch_status(session, str(person_accnt))
+    data = await fetch_status(str(person_accnt), checked_cache=True)
     if data:
-        await update_subscription_payload(
-            sub_id=sub["id"],
-            hour_count=(count or 0) + 1,
-            hour_reset_at=reset_at,
-            payload=data,
-        )
+        # Persisting the payload for other replicas is off the user's critical path
+        task = asyncio.create_task(update_subscription_payload(quota["id"], data))
+        _background.add(task)
+        task.add_done_callback(_background.discard)
     return data, None
 
 
-async def poll_loop(bot: Bot) -> None:
-    """Background polling loop to check for schedule updates and notify users.
+async def _fetch_queue_schedule(
+    sem: asyncio.Semaphore,
+    row: Dict[str, Any],
+) -> Tuple[str, date, Optional[str], bool, Optional[Dict[str, Any]]]:
+    """Fetch the fresh schedule for one queue/date row, bounded by the semaphore.
 
     Args:
-        bot: The aiogram Bot instance to send messages.
+        sem: Semaphore limiting concurrent upstream requests.
+        row: Queue row with 'queue_code', 'sched_date', the stored 'digest' and 'legacy_payload'.
 
     Returns:
-        None
+        A tuple of (queue code, date, stored digest, whether that digest was
+        derived from a legacy payload, fetched schedule or None).
     """
-    BASE_SLEEP = 600  # 10 minutes tick to catch updates without spamming
-    kyiv = _kyiv_tz()
+    queue_code = row["queue_code"]
+    sched_date = row["sched_date"]
+    digest = row.get("digest")
+    legacy = row.get("legacy_payload")
+    derived = False
+    if digest is None and legacy is not None:
+        try:
+            digest = schedule_digest(legacy)
+            derived = True
+        except Exception:
+            pass
+
+    async with sem:
+        try:
+            sched = await fetch_schedule(queue_code, sched_date.strftime("%Y-%m-%d"))
+        except Exception as ex:
+            logger.warning("Failed to fetch schedule for queue %s on %s: %s", queue_code, sched_date, ex)
+            sched = None
+    return queue_code, sched_date, digest, derived, sched
+
+
+def _day_label(sched_date: date, today: date) -> str:
+    """Name the day of a schedule relative to `today`, e.g. 'завтра (18.10)'."""
+    names = {0: "сьогодні", 1: "завтра", 2: "післязавтра"}
+    name = names.get((sched_date - today).days)
+    short = sched_date.strftime("%d.%m")
+    return f"{name} ({short})" if name else sched_date.strftime("%d.%m.%Y")
+
+
+def _schedule_message(queue_code: str, day_label: str, sched: Dict[str, Any]) -> Optional[str]:
+    """Build the notification text for a schedule, or None if it has no intervals."""
+    aData_list: list[Dict[str, Any]] = sched.get("aData", [])
+    aState_map: Dict[str, Dict[str, Any]] = sched.get("aState", {})
+    if not aData_list:
+        return None
+
+    body_core = format_daily_schedule(aData_list, aState_map)
+    header = f"Графік на {day_label} для черги {queue_code}"
+    return f"{header}\n\n{body_core}"
+
+
+def _change_message(
+    queue_code: str,
+    day_label: str,
+    sched: Dict[str, Any],
+    day: DaySchedule,
+    previous: Optional[Dict[str, Any]],
+) -> Optional[str]:
+    """Build the notification for a changed schedule, or None if its outages are the same.
+
+    The first schedule of a queue/date is sent in full; later ones only as the
+    difference of their outage intervals to the previous payload.
+    """
+    if not isinstance(previous, dict) or not previous.get("aData"):
+        return _schedule_message(queue_code, day_label, sched)
+
+    changes = diff_schedules(DaySchedule.from_payload(previous), day)
+    if not changes:
+        return None
+    header = f"Зміни в графіку на {day_label} для черги {queue_code}"
+    return f"{header}\n\n{format_schedule_diff(changes, day)}"
+
+
+def _outage_times(queue_code: str, sched_date, day: DaySchedule, tz) -> list[Tuple[datetime, datetime]]:
+    """Return (start, end) of the day's outages as local datetimes.
 
-    while True:
+    An outage at midnight that continues one from the previous day (as far
+    as the index knows it) is not a new start and is left out.
+    """
+    midnight = datetime.combine(sched_date, datetime.min.time(), tzinfo=tz)
+    prev = schedule_index.get(queue_code, sched_date - timedelta(days=1))
+    out = []
+    for start, end in day.intervals():
+        if start == 0 and prev is not None and prev.is_off(MINUTES_PER_DAY - 1):
+            continue
+        out.append((midnight + timedelta(minutes=start), midnight + timedelta(minutes=end)))
+    return out
+
+
+async def poll_tick(
+    scheduler: PollScheduler,
+    now_kyiv: datetime,
+    *,
+    owner: str = POLL_OWNER,
+    limit: int = POLL_CLAIM_LIMIT,
+) -> int:
+    """Poll the queues that are due at `now_kyiv` and enqueue notifications for changes.
+
+    Every claimed queue is fetched for each date of the window (today and the
+    next POLL_DAYS_AHEAD days) concurrently; each date is stored and notified
+    separately.
+
+    Args:
+        scheduler: Scheduler planning the next poll of each queue.
+        now_kyiv: Current Kyiv time of the tick.
+        owner: Lease owner identifying this replica.
+        limit: Maximum number of queues claimed in this tick.
+
+    Returns:
+        Number of queues claimed.
+    """
+    today = now_kyiv.date()
+    window = [today + timedelta(days=i) for i in range(max(0, POLL_DAYS_AHEAD) + 1)]
+    rows = await claim_due_queues(owner, window, limit, POLL_LEASE_SEC)
+
+    if not rows:
+        return 0
+
+    tick_started = time.perf_counter()
+    intervals = {row["queue_code"]: row.get("interval_sec") for row in rows}
+    remaining = {code: 0 for code in intervals}
+    for row in rows:
+        remaining[row["queue_code"]] += 1
+    any_changed: Dict[str, bool] = {}
+    today_ok: Dict[str, bool] = {}
+    completed: Dict[str, Tuple[str, float, datetime]] = {}
+    sem = asyncio.Semaphore(POLL_FETCH_CONCURRENCY)
+    fetches = [
+        asyncio.create_task(_fetch_queue_schedule(sem, row))
+        for row in rows
+    ]
+    try:
+        # Handle each (queue, date) as soon as its fetch finishes; a slow one only delays itself
+        for done in asyncio.as_completed(fetches):
+            queue_code, schedule_date, stored_digest, derived, sched = await done
+            changed = False
+            if not isinstance(sched, dict) or not sched:
+                POLL_QUEUES.labels("failed").inc()
+                if schedule_date == today:
+                    today_ok[queue_code] = False
+            else:
+                digest = schedule_digest(sched)
+                day = schedule_index.update(queue_code, schedule_date, sched, digest)
+                if digest != stored_digest:
+                    label = _day_label(schedule_date, today)
+                    outages = _outage_times(queue_code, schedule_date, day, now_kyiv.tzinfo)
+                    changed = await upsert_fetch_schedule(
+                        queue_code,
+                        schedule_date,
+                        sched,
+                        digest,
+                        lambda previous: _change_message(queue_code, label, sched, day, previous),
+                        outages,
+                    )
+                    if changed:
+                        reminder_scheduler.schedule(queue_code, outages)
+                elif derived:
+                    # Unchanged legacy row: store its digest so later claims skip the payload
+                    await set_schedule_digest(queue_code, schedule_date, digest)
+                POLL_QUEUES.labels("changed" if changed else "unchanged").inc()
 
-        now_kyiv = datetime.now(kyiv)
+            any_changed[queue_code] = any_changed.get(queue_code, False) or changed
+            remaining[queue_code] -= 1
+            if remaining[queue_code] == 0:
+                # Later dates are often not published yet, so only today's failure retries early
+                completed[queue_code] = (
+                    queue_code,
+                    *scheduler.plan(
+                        intervals.get(queue_code),
+                        changed=any_changed[queue_code],
+                        ok=today_ok.get(queue_code, True),
+                    ),
+                )
+    finally:
+        for t in fetches:
+            t.cancel()
+        # Queues left unfinished keep their lease and are retried once it expires
+        await complete_queues(owner, today, list(completed.values()))
+        POLL_TICK_SECONDS.observe(time.perf_counter() - tick_started)
+    return len(intervals)
 
+
+async def poll_loop() -> None:
+    """Background polling loop to check for schedule updates and notify users.
+
+    Ticks run at a fixed rate; on each tick the replica leases the queues that
+    are due in the shared `poll_queue` table, so several bot processes split
+    the polling work without duplicates. Changed schedules are written together
+    with their notifications to the outbox, which `outbox_loop` delivers.
+
+    Returns:
+        None
+    """
+    kyiv = _kyiv_tz()
+    scheduler = PollScheduler(kyiv)
+
+    async for now_kyiv in scheduler.ticks():
         try:
-            if now_kyiv.hour >= 21:
-                now_kyiv += timedelta(days=1)
-            schedule_date = now_kyiv.date()
-            today_str = schedule_date.strftime("%Y-%m-%d")
-            queues = await list_queues_with_payload_for_date(schedule_date)
-            
-            if not queues:
-                await asyncio.sleep(BASE_SLEEP)
-                continue
-
-            async with aiohttp.ClientSession() as session:
-                for row in queues:
-                    queue_code = row.get("queue_code")
-                    payload = row.get("payload")
-
-                    if isinstance(payload, str):
-                        try:
-                            payload = json.loads(payload)
-                        except Exception:
-                            pass
-
-                    if queue_code is None:
-                        continue
-
-                    sched = await fetch_schedule(session, queue_code, today_str)
-                    if not isinstance(sched, dict) or not sched:
-                        continue
-
-                    if payload != sched:
-                        await upsert_fetch_schedule(queue_code, schedule_date, sched)
-                        try:
-                            aData_list: list[Dict[str, Any]] = sched.get("aData", [])
-                            aState_map: Dict[str, Dict[str, Any]] = sched.get("aState", {})
-
-                            if aData_list:
-                                body_core = format_daily_schedule(aData_list, aState_map)
-                            else:
-                                continue                                
-
-                            header = f"Графік на {today_str} для черги {queue_code}"
-                            text = f"{header}\n\n{body_core}"
-                            chat_ids = await list_chat_ids_by_queue(queue_code)
-                            for cid in chat_ids:
-                                try:
-                                    await bot.send_message(chat_id=cid, text=text[:4000])
-                                except Exception:
-                                    pass
-                        except Exception:
-                            pass
-        except Exception as ex:
-            print(f"Exception in poll loop: {ex}")
-            
-        finally:
-            await asyncio.sleep(BASE_SLEEP)
\ No newline at end of file
+            await poll_tick(scheduler, now_kyiv)
+        except Exception:
+            POLL_ERRORS.inc()
+            logger.exception("Exception in poll loop")
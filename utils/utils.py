@@ -2,7 +2,9 @@
 
 from aiogram import types
 from typing import List, Dict, Any, Optional
+import hashlib
 import json
+import orjson
 
 
 def cb_chat_id(call: types.CallbackQuery) -> int:
@@ -20,6 +22,35 @@ def cb_chat_id(call: types.CallbackQuery) -> int:
     return call.from_user.id if call.from_user else 0
 
 
+def paginate(blocks: List[str], limit: int = 4096, sep: str = "\n\n") -> List[str]:
+    """Pack text blocks into as few pages of at most `limit` characters as possible.
+
+    Blocks are kept whole unless a single block is longer than a page, in
+    which case it is cut into page-sized pieces.
+
+    Args:
+        blocks: Texts in display order.
+        limit: Maximum page length (Telegram allows 4096 characters).
+        sep: Separator placed between blocks on the same page.
+
+    Returns:
+        The pages; at least one, possibly empty, page.
+    """
+    pages: List[str] = []
+    cur = ""
+    for block in blocks:
+        pieces = [block[i:i + limit] for i in range(0, len(block), limit)] or [""]
+        for piece in pieces:
+            if cur and len(cur) + len(sep) + len(piece) <= limit:
+                cur = f"{cur}{sep}{piece}"
+            else:
+                if cur:
+                    pages.append(cur)
+                cur = piece
+    pages.append(cur)
+    return pages
+
+
 def format_entries(a: Any) -> str:
     """Format entries from 'aData' or similar structure into a human-readable string.
     
@@ -135,3 +166,27 @@ def format_daily_schedule(aData: List[Dict[str, Any]], aState: Dict[str, Dict[st
     if not parts:
         return "Відключень немає"
     return "\n".join(parts)
+
+
+def schedule_digest(sched: Dict[str, Any]) -> str:
+    """Return a stable hash of the meaningful content of a schedule payload.
+
+    Only the 'aData' intervals are hashed, normalized and sorted, so key order
+    or unrelated upstream fields do not register as a change.
+
+    Args:
+        sched: Schedule payload as returned by the upstream API.
+
+    Returns:
+        Hex SHA-256 digest of the canonical interval list.
+    """
+    def norm_str(x: Any) -> str:
+        return (str(x) if x is not None else "").strip()
+
+    raw = sched.get("aData") if isinstance(sched, dict) else None
+    rows = sorted(
+        (norm_str(r.get("time_from")), norm_str(r.get("time_to")), norm_str(r.get("queue")))
+        for r in (raw if isinstance(raw, list) else [])
+        if isinstance(r, dict)
+    )
+    return hashlib.sha256(orjson.dumps(rows)).hexdigest()
@@ -0,0 +1,65 @@
+"""Webhook delivery of Telegram updates through an aiohttp web application."""
+
+import hashlib
+from typing import Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from config import API_TOKEN, WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_SECRET
+
+
+def webhook_secret() -> str:
+    """Return the configured secret token, or one derived from the bot token.
+
+    Deriving keeps the secret stable across restarts and replicas without
+    extra configuration while still being unguessable.
+    """
+    if WEBHOOK_SECRET:
+        return WEBHOOK_SECRET
+    return hashlib.sha256(f"webhook:{API_TOKEN}".encode("utf-8")).hexdigest()
+
+
+def build_webhook_app(dp: Dispatcher, bot: Bot, *, secret: Optional[str] = None) -> web.Application:
+    """Create the aiohttp application serving updates for the dispatcher.
+
+    Args:
+        dp: Dispatcher with all routers included.
+        bot: Bot instance the updates belong to.
+        secret: Expected X-Telegram-Bot-Api-Secret-Token header value.
+
+    Returns:
+        Configured aiohttp application.
+    """
+    app = web.Application()
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        secret_token=secret if secret is not None else webhook_secret(),
+    ).register(app, path=WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+async def start_webhook(dp: Dispatcher, bot: Bot) -> web.AppRunner:
+    """Start the webhook server and point Telegram at it.
+
+    Args:
+        dp: Dispatcher with all routers included.
+        bot: Bot instance to register the webhook for.
+
+    Returns:
+        The running AppRunner; call `cleanup()` on shutdown.
+    """
+    secret = webhook_secret()
+    runner = web.AppRunner(build_webhook_app(dp, bot, secret=secret))
+    await runner.setup()
+    await web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT).start()
+
+    await bot.set_webhook(
+        url=WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+        secret_token=secret,
+        allowed_updates=dp.resolve_used_update_types(),
+    )
+    return runner